@@ -0,0 +1,116 @@
+"""
+Line Grouping Benchmark
+Checks that cluster_lines produces exactly the grouping of the original
+OCRSemanticChunker._group_into_lines and compares their run time
+
+Usage (from Answer_sheet_service/):
+    python benchmarks/line_grouping_benchmark.py --words 2500 --pages 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.line_clustering import cluster_lines
+
+def legacy_group_into_lines(items, y_tolerance):
+    """Original O(n^2 * k) grouping, kept here as the reference implementation"""
+    line_groups = []
+    
+    for item in items:
+        best_group = None
+        best_distance = float('inf')
+        
+        for group in line_groups:
+            if group:
+                group_y_values = [g['center_y'] for g in group]
+                group_y_median = np.median(group_y_values)
+                
+                distance = abs(item['center_y'] - group_y_median)
+                if distance <= y_tolerance and distance < best_distance:
+                    best_group = group
+                    best_distance = distance
+        
+        if best_group is not None:
+            best_group.append(item)
+        else:
+            line_groups.append([item])
+    
+    line_groups.sort(key=lambda group: np.median([item['center_y'] for item in group]))
+    return line_groups
+
+def make_page(word_count, rng):
+    """Synthetic handwritten page: wavy, skewed lines of word boxes with jittered heights"""
+    items = []
+    words_per_line = rng.randint(8, 14)
+    line_count = max(1, word_count // words_per_line)
+    line_spacing = rng.uniform(28, 45)
+    skew = rng.uniform(-0.03, 0.03)
+    
+    for line in range(line_count):
+        baseline = 60 + line * line_spacing
+        x = rng.uniform(40, 80)
+        for _ in range(words_per_line):
+            width = rng.uniform(20, 120)
+            height = rng.uniform(14, 32)
+            center_y = baseline + skew * x + rng.gauss(0, 4)
+            items.append({
+                'id': len(items),
+                'x1': x, 'x2': x + width,
+                'center_x': x + width / 2,
+                'center_y': round(center_y, rng.choice([0, 1, 3])),
+                'height': height
+            })
+            x += width + rng.uniform(4, 30)
+    
+    # Same ordering and tolerance as OCRSemanticChunker
+    items.sort(key=lambda item: (item['center_y'], item['center_x']))
+    avg_height = np.mean([item['height'] for item in items])
+    return items, max(avg_height * 0.6, 15)
+
+def group_ids(groups):
+    return [[item['id'] for item in group] for group in groups]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=2500, help='Word boxes per page')
+    parser.add_argument('--pages', type=int, default=5, help='Number of synthetic pages')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    legacy_total = 0.0
+    sweep_total = 0.0
+    
+    for page in range(1, args.pages + 1):
+        items, y_tolerance = make_page(args.words, rng)
+        
+        start = time.perf_counter()
+        expected = legacy_group_into_lines([dict(item) for item in items], y_tolerance)
+        legacy_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        actual = cluster_lines([dict(item) for item in items], y_tolerance)
+        sweep_time = time.perf_counter() - start
+        
+        if group_ids(expected) != group_ids(actual):
+            print(f"Page {page}: MISMATCH between legacy and sweep grouping")
+            sys.exit(1)
+        
+        legacy_total += legacy_time
+        sweep_total += sweep_time
+        print(f"Page {page}: {len(items)} boxes, {len(actual)} lines, "
+              f"legacy {legacy_time * 1000:.1f} ms, sweep {sweep_time * 1000:.1f} ms, "
+              f"{legacy_time / sweep_time:.0f}x")
+    
+    print(f"All {args.pages} pages identical. Total: legacy {legacy_total:.2f}s, "
+          f"sweep {sweep_total:.3f}s, {legacy_total / sweep_total:.0f}x faster")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+OCR Resize Benchmark
+Runs a folder of scans through the original quality/dimension search of
+OCRService.resize_image_for_ocr and through fit_image_for_ocr, and compares
+JPEG encodes, run time and output size per page
+
+Most real scans already fit Azure's 4MB limit, so --max-file-size can be
+lowered to exercise the re-encoding path on an ordinary corpus.
+
+Usage (from Answer_sheet_service/):
+    python benchmarks/ocr_resize_benchmark.py scans/
+    python benchmarks/ocr_resize_benchmark.py scans/ --max-file-size 1048576
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.image_sizing import fit_image_for_ocr, to_rgb
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp')
+
+def legacy_resize(image_data, min_dimension, max_dimension, max_file_size):
+    """Original search (7 qualities, then up to 10 downscales), kept as the reference"""
+    encodes = 0
+    image = Image.open(io.BytesIO(image_data))
+    width, height = image.size
+
+    resized = False
+    if width < min_dimension or height < min_dimension:
+        scale = max(min_dimension / width, min_dimension / height)
+        width, height, resized = int(width * scale), int(height * scale), True
+    elif width > max_dimension or height > max_dimension:
+        scale = min(max_dimension / width, max_dimension / height)
+        width, height, resized = int(width * scale), int(height * scale), True
+
+    if not resized and len(image_data) <= max_file_size:
+        return image_data, width, height, encodes
+
+    processed = to_rgb(image.resize((width, height), Image.Resampling.LANCZOS) if resized else image)
+    for quality in [95, 85, 75, 65, 55, 45, 35]:
+        output = io.BytesIO()
+        processed.save(output, format='JPEG', quality=quality, optimize=True)
+        encodes += 1
+        if len(output.getvalue()) <= max_file_size:
+            return output.getvalue(), width, height, encodes
+
+    data = output.getvalue()
+    for _ in range(10):
+        if len(data) <= max_file_size:
+            break
+        width, height = int(width * 0.9), int(height * 0.9)
+        if width < min_dimension or height < min_dimension:
+            break
+        output = io.BytesIO()
+        to_rgb(image.resize((width, height), Image.Resampling.LANCZOS)).save(output, format='JPEG', quality=75, optimize=True)
+        encodes += 1
+        data = output.getvalue()
+    return data, width, height, encodes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='Folder of scanned pages')
+    parser.add_argument('--max-file-size', type=int, default=Config.MAX_FILE_SIZE)
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        print("No images found")
+        sys.exit(1)
+
+    limits = dict(min_dimension=Config.MIN_DIMENSION, max_dimension=Config.MAX_DIMENSION,
+                  max_file_size=args.max_file_size)
+    totals = {'legacy_time': 0.0, 'new_time': 0.0, 'legacy_encodes': 0, 'new_encodes': 0, 'failures': 0}
+
+    print(f"{'page':<32}{'legacy':>22}{'single-pass':>22}")
+    for path in paths:
+        with open(path, 'rb') as f:
+            image_data = f.read()
+        name = os.path.basename(path)
+
+        start = time.perf_counter()
+        legacy_data, _, _, legacy_encodes = legacy_resize(image_data, **limits)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sized = fit_image_for_ocr(image_data, **limits)
+        except Exception as e:
+            totals['failures'] += 1
+            print(f"{name:<32}  single-pass failed: {e}")
+            continue
+        new_time = time.perf_counter() - start
+
+        totals['legacy_time'] += legacy_time
+        totals['new_time'] += new_time
+        totals['legacy_encodes'] += legacy_encodes
+        totals['new_encodes'] += sized.encodes
+        print(f"{name:<32}"
+              f"{legacy_encodes:>3} enc {legacy_time * 1000:>6.0f} ms {len(legacy_data) / 1024:>5.0f} KB"
+              f"{sized.encodes:>3} enc {new_time * 1000:>6.0f} ms {len(sized.data) / 1024:>5.0f} KB")
+
+    print(f"\n{len(paths)} pages, {totals['failures']} single-pass failures")
+    print(f"Legacy: {totals['legacy_encodes']} encodes, {totals['legacy_time']:.2f}s")
+    print(f"Single-pass: {totals['new_encodes']} encodes, {totals['new_time']:.2f}s")
+    if totals['new_time']:
+        print(f"Speedup: {totals['legacy_time'] / totals['new_time']:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+VLM Image Preparation Benchmark
+Runs a folder of labeled roll-number crops through the VLM with several
+image preparation settings and reports payload size against extraction
+accuracy, to pick the cheapest setting that keeps accuracy
+
+The folder holds the crop images and a labels.csv with the header
+"filename,roll_number". The first row of the report is the original
+behavior (full-size PNG) and serves as the accuracy baseline.
+
+Usage (from Answer_sheet_service/, OPENAI_API_KEY set):
+    python benchmarks/vlm_image_prep_benchmark.py crops/ --max-sides 512,768,1024 --qualities 60,80
+    python benchmarks/vlm_image_prep_benchmark.py crops/ --dry-run   # payload sizes only
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.stamp_service import StampService, ROLL_NUMBER_PROMPT
+
+def load_labeled_crops(folder):
+    """Read labels.csv and decode every listed crop"""
+    crops = []
+    with open(os.path.join(folder, 'labels.csv'), newline='') as f:
+        for row in csv.DictReader(f):
+            image = cv2.imread(os.path.join(folder, row['filename']))
+            if image is None:
+                print(f"Skipping unreadable crop {row['filename']}")
+                continue
+            crops.append((row['filename'], row['roll_number'].strip(), image))
+    return crops
+
+def build_settings(args):
+    """Baseline first, then every combination from the command line"""
+    settings = [{'label': 'png/original', 'image_format': 'PNG', 'max_side': 100000}]
+    grayscale_options = [False, True] if args.grayscale else [False]
+    for max_side, quality, grayscale in itertools.product(args.max_sides, args.qualities, grayscale_options):
+        settings.append({
+            'label': f"jpeg/{max_side}px/q{quality}" + ("/gray" if grayscale else ""),
+            'image_format': 'JPEG',
+            'max_side': max_side,
+            'quality': quality,
+            'grayscale': grayscale
+        })
+    return settings
+
+def run_setting(service, crops, setting, dry_run):
+    options = {key: value for key, value in setting.items() if key != 'label'}
+    payload_bytes = 0
+    correct = 0
+    latency = 0.0
+
+    for filename, expected, image in crops:
+        image_url = service.encode_vlm_image(image, **options)
+        payload_bytes += len(image_url)
+        if dry_run:
+            continue
+
+        content = [{"type": "text", "text": ROLL_NUMBER_PROMPT}, service._image_content(image_url)]
+        start = time.perf_counter()
+        raw = service._call_vlm(content, filename)
+        latency += time.perf_counter() - start
+
+        if service._clean_roll_number_response(raw, filename) == expected:
+            correct += 1
+
+    return {
+        'label': setting['label'],
+        'avg_payload_kb': payload_bytes / len(crops) / 1024,
+        'accuracy': None if dry_run else correct / len(crops),
+        'avg_latency': None if dry_run else latency / len(crops)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help='Folder with crops and labels.csv')
+    parser.add_argument('--max-sides', type=lambda v: [int(x) for x in v.split(',')], default=[512, 768, 1024])
+    parser.add_argument('--qualities', type=lambda v: [int(x) for x in v.split(',')], default=[60, 80, 90])
+    parser.add_argument('--grayscale', action='store_true', help='Also try grayscale variants')
+    parser.add_argument('--tolerance', type=float, default=0.0, help='Accuracy drop allowed vs. the baseline')
+    parser.add_argument('--dry-run', action='store_true', help='Only measure payload sizes, no API calls')
+    args = parser.parse_args()
+
+    crops = load_labeled_crops(args.folder)
+    if not crops:
+        print("No labeled crops found")
+        sys.exit(1)
+
+    service = StampService(use_s3=False)
+    if not args.dry_run and not service.is_openai_configured():
+        print("OPENAI_API_KEY is not set; use --dry-run to measure payload sizes only")
+        sys.exit(1)
+
+    print(f"{len(crops)} labeled crops")
+    print(f"{'setting':<28}{'avg payload':>14}{'accuracy':>10}{'latency':>10}")
+    results = []
+    for setting in build_settings(args):
+        result = run_setting(service, crops, setting, args.dry_run)
+        results.append(result)
+        accuracy = '-' if result['accuracy'] is None else f"{result['accuracy']:.1%}"
+        latency = '-' if result['avg_latency'] is None else f"{result['avg_latency']:.2f}s"
+        print(f"{result['label']:<28}{result['avg_payload_kb']:>11.1f} KB{accuracy:>10}{latency:>10}")
+
+    if args.dry_run:
+        return
+
+    baseline = results[0]['accuracy']
+    acceptable = [r for r in results if r['accuracy'] >= baseline - args.tolerance]
+    cheapest = min(acceptable, key=lambda r: r['avg_payload_kb'])
+    print(f"\nCheapest setting within {args.tolerance:.1%} of baseline accuracy ({baseline:.1%}): "
+          f"{cheapest['label']} at {cheapest['avg_payload_kb']:.1f} KB per crop "
+          f"({results[0]['avg_payload_kb'] / cheapest['avg_payload_kb']:.1f}x smaller than the baseline)")
+
+if __name__ == '__main__':
+    main()
@@ -15,8 +15,53 @@ class Config:
     DEFAULT_FORMAT = os.environ.get('DEFAULT_FORMAT', 'JPEG')
     DEFAULT_QUALITY = int(os.environ.get('DEFAULT_QUALITY', 85))
     BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 5))
-    THREAD_COUNT = int(os.environ.get('THREAD_COUNT', 2))
-   
+
+    # Parallel Conversion Settings
+    CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', max(1, (os.cpu_count() or 2) - 1)))  # Rasterization processes per PDF
+
+    # S3 Upload Settings
+    S3_UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS', 8))  # Concurrent uploads per job
+    S3_UPLOAD_QUEUE_SIZE = int(os.environ.get('S3_UPLOAD_QUEUE_SIZE', 32))  # Pages buffered in memory awaiting upload
+    S3_UPLOAD_MAX_RETRIES = int(os.environ.get('S3_UPLOAD_MAX_RETRIES', 4))
+    S3_UPLOAD_BACKOFF = float(os.environ.get('S3_UPLOAD_BACKOFF', 0.5))  # Base backoff in seconds
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+    S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE = int(os.environ.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    S3_MULTIPART_CONCURRENCY = int(os.environ.get('S3_MULTIPART_CONCURRENCY', 4))
+
+    # Job Scheduler Settings
+    MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', 2))  # Conversions running at once
+    MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 200))  # Further /convert calls get 503
+    CONVERSION_MEMORY_BUDGET_MB = int(os.environ.get('CONVERSION_MEMORY_BUDGET_MB', 2048))  # Estimated decoded-page memory across running jobs
+
+    # Archive Settings
+    ARCHIVE_MODE = os.environ.get('ARCHIVE_MODE', 'stream')  # 'stream' builds the ZIP during conversion, 'lazy' on download
+    ARCHIVE_PART_SIZE = int(os.environ.get('ARCHIVE_PART_SIZE', 8 * 1024 * 1024))  # S3 multipart part size
+    ARCHIVE_FETCH_WORKERS = int(os.environ.get('ARCHIVE_FETCH_WORKERS', 4))  # Pages fetched ahead when building a lazy ZIP
+
+    # Job Store Settings
+    JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'memory')  # memory, sqlite or redis
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join('temp', 'jobs.sqlite3'))
+    JOB_STORE_REDIS_URL = os.environ.get('JOB_STORE_REDIS_URL', 'redis://localhost:6379/0')
+    JOB_STORE_PREFIX = os.environ.get('JOB_STORE_PREFIX', 'answer-sheet')
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 24 * 60 * 60))  # Jobs are evicted this long after their last update
+
+    # Result Cache Settings (LLM and OCR results)
+    RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'sqlite')  # sqlite, redis or none
+    RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', os.path.join('temp', 'result_cache.sqlite3'))
+    RESULT_CACHE_REDIS_URL = os.environ.get('RESULT_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    RESULT_CACHE_PREFIX = os.environ.get('RESULT_CACHE_PREFIX', 'answer-sheet-cache')
+    RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 30 * 24 * 60 * 60))
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 100000))  # LRU limit for the SQLite backend
+
+    # Outbound HTTP (shared keep-alive client for Azure, Django, webhooks and image downloads)
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 20))  # Hosts with a kept-alive pool
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))  # Kept-alive connections per host
+    HTTP_MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST', 16))  # Concurrent requests per host
+    HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 30))  # Default when a caller sets none
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))  # Connection errors and 502/503/504 on idempotent calls
+    HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.5))
+
     # Directory Settings
     TEMP_DIR = os.environ.get('TEMP_DIR', 'temp')
    
@@ -38,6 +83,24 @@ class Config:
     MAX_DIMENSION = int(os.environ.get('MAX_DIMENSION', 10000))
     MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', 4 * 1024 * 1024))  # 4MB in bytes
     
+    # Azure Read concurrency (shared by every OCR request in the process)
+    OCR_MAX_IN_FLIGHT = int(os.environ.get('OCR_MAX_IN_FLIGHT', 16))  # Submitted but unfinished Read operations
+    OCR_SUBMIT_WORKERS = int(os.environ.get('OCR_SUBMIT_WORKERS', 8))  # Pages downloaded/resized/submitted at once per request
+    OCR_POLL_INITIAL_INTERVAL = float(os.environ.get('OCR_POLL_INITIAL_INTERVAL', 0.5))
+    OCR_POLL_MAX_INTERVAL = float(os.environ.get('OCR_POLL_MAX_INTERVAL', 3.0))
+    OCR_POLL_TIMEOUT = float(os.environ.get('OCR_POLL_TIMEOUT', 120))  # Seconds before a Read operation is abandoned
+    OCR_MAX_RETRIES = int(os.environ.get('OCR_MAX_RETRIES', 10))  # Submission attempts on 429
+    OCR_RETRY_BACKOFF = float(os.environ.get('OCR_RETRY_BACKOFF', 1.0))  # Base 429 backoff in seconds
+    OCR_FETCH_WORKERS = int(os.environ.get('OCR_FETCH_WORKERS', 8))  # Concurrent page downloads per request
+    OCR_PREFETCH_DEPTH = int(os.environ.get('OCR_PREFETCH_DEPTH', 8))  # Pages downloaded ahead of the OCR submitters
+    OCR_S3_RANGE_THRESHOLD = int(os.environ.get('OCR_S3_RANGE_THRESHOLD', 4 * 1024 * 1024))  # Objects this large use ranged GETs
+    OCR_S3_RANGE_PART_SIZE = int(os.environ.get('OCR_S3_RANGE_PART_SIZE', 1024 * 1024))
+    OCR_S3_RANGE_WORKERS = int(os.environ.get('OCR_S3_RANGE_WORKERS', 8))  # Concurrent ranged GETs across all pages
+    
+    # OCR result cache (stored in the result cache backend under the 'ocr' namespace)
+    OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+    OCR_CACHE_TTL_SECONDS = int(os.environ.get('OCR_CACHE_TTL_SECONDS', 0)) or None  # 0 = RESULT_CACHE_TTL_SECONDS
+    
     # Stamp Detection Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     STAMP_WEBHOOK_URL = os.environ.get('STAMP_WEBHOOK_URL', 'https://transback.transpoze.ai/api/answer-scripts/process-extraction/')
@@ -50,10 +113,65 @@ class Config:
     STAMP_MIN_CONTOUR_AREA_RATIO = float(os.environ.get('STAMP_MIN_CONTOUR_AREA_RATIO', 0.001))
     STAMP_MAX_CONTOUR_AREA_RATIO = float(os.environ.get('STAMP_MAX_CONTOUR_AREA_RATIO', 0.15))
     
+    # Low-resolution pre-screen; pages below the red ratio skip full detection
+    STAMP_PRESCREEN_ENABLED = os.environ.get('STAMP_PRESCREEN_ENABLED', 'true').lower() == 'true'
+    STAMP_PRESCREEN_WIDTH = int(os.environ.get('STAMP_PRESCREEN_WIDTH', 200))
+    STAMP_PRESCREEN_MIN_RED_RATIO = float(os.environ.get('STAMP_PRESCREEN_MIN_RED_RATIO', 0.0002))  # Smallest stamp (0.1% of the page) at ~20% red ink
+    
+    # Parallel stamp detection (OpenCV work in processes, VLM calls in threads)
+    STAMP_DETECTION_WORKERS = int(os.environ.get('STAMP_DETECTION_WORKERS', os.cpu_count() or 1))
+    STAMP_VLM_WORKERS = int(os.environ.get('STAMP_VLM_WORKERS', 4))
+    
+    # Stamp VLM HTTP client (keep-alive pool, rate limit, retries)
+    STAMP_VLM_MAX_CONCURRENCY = int(os.environ.get('STAMP_VLM_MAX_CONCURRENCY', 8))  # Requests in flight across all jobs
+    STAMP_VLM_REQUESTS_PER_MINUTE = int(os.environ.get('STAMP_VLM_REQUESTS_PER_MINUTE', 300))
+    STAMP_VLM_TIMEOUT = float(os.environ.get('STAMP_VLM_TIMEOUT', 60))
+    STAMP_VLM_MAX_RETRIES = int(os.environ.get('STAMP_VLM_MAX_RETRIES', 4))  # Per request, on 429/5xx and connection errors
+    STAMP_VLM_BACKOFF = float(os.environ.get('STAMP_VLM_BACKOFF', 1.0))  # Base backoff in seconds
+    STAMP_VLM_RETRY_BUDGET = int(os.environ.get('STAMP_VLM_RETRY_BUDGET', 50))  # Retries allowed per job
+    
+    # Stamp VLM image preparation (see benchmarks/vlm_image_prep_benchmark.py)
+    STAMP_VLM_MAX_SIDE = int(os.environ.get('STAMP_VLM_MAX_SIDE', 1024))  # Longer edge in pixels
+    STAMP_VLM_IMAGE_FORMAT = os.environ.get('STAMP_VLM_IMAGE_FORMAT', 'JPEG')  # JPEG or PNG
+    STAMP_VLM_JPEG_QUALITY = int(os.environ.get('STAMP_VLM_JPEG_QUALITY', 80))
+    STAMP_VLM_GRAYSCALE = os.environ.get('STAMP_VLM_GRAYSCALE', 'false').lower() == 'true'
+    STAMP_VLM_IMAGE_DETAIL = os.environ.get('STAMP_VLM_IMAGE_DETAIL', 'high')  # OpenAI image detail: low, high or auto
+    STAMP_FETCH_WORKERS = int(os.environ.get('STAMP_FETCH_WORKERS', 8))  # Concurrent S3 image downloads
+    STAMP_FETCH_WINDOW = int(os.environ.get('STAMP_FETCH_WINDOW', 32))  # Downloaded pages held in memory ahead of detection
+    
+    # Background stamp jobs
+    STAMP_MAX_CONCURRENT_JOBS = int(os.environ.get('STAMP_MAX_CONCURRENT_JOBS', 1))  # Each job already fans out over all cores
+    STAMP_EVENTS_POLL_INTERVAL = float(os.environ.get('STAMP_EVENTS_POLL_INTERVAL', 1.0))  # Seconds between progress events
+    
+    # Stamp templates (per institution, matched with ORB + FLANN/LSH)
+    STAMP_TEMPLATE_DIR = os.environ.get('STAMP_TEMPLATE_DIR', os.path.join('temp', 'stamp_templates'))
+    STAMP_TEMPLATE_ORB_FEATURES = int(os.environ.get('STAMP_TEMPLATE_ORB_FEATURES', 500))
+    
+    # Per-page stamp checkpoints (re-runs only process new or changed pages)
+    STAMP_CHECKPOINT_ENABLED = os.environ.get('STAMP_CHECKPOINT_ENABLED', 'true').lower() == 'true'
+    STAMP_CHECKPOINT_PATH = os.environ.get('STAMP_CHECKPOINT_PATH', os.path.join('temp', 'stamp_checkpoints.sqlite3'))
+    STAMP_CHECKPOINT_TTL_SECONDS = int(os.environ.get('STAMP_CHECKPOINT_TTL_SECONDS', 7 * 24 * 60 * 60))
+    
     # Chunker Configuration
     CHUNKER_WEBHOOK_URL = os.environ.get('CHUNKER_WEBHOOK_URL', 'https://transback.transpoze.ai/api/chunk-data/process-chunk-json/')
     CHUNKER_DEFAULT_MAX_CHUNK_SIZE = int(os.environ.get('CHUNKER_DEFAULT_MAX_CHUNK_SIZE', 1500))
     
     # OpenAI Configuration for Chunker
     CHUNKER_OPENAI_MODEL = os.environ.get('CHUNKER_OPENAI_MODEL', 'gpt-3.5-turbo')
-    CHUNKER_CONFIDENCE_THRESHOLD = float(os.environ.get('CHUNKER_CONFIDENCE_THRESHOLD', 0.6))
\ No newline at end of file
+    CHUNKER_CONFIDENCE_THRESHOLD = float(os.environ.get('CHUNKER_CONFIDENCE_THRESHOLD', 0.6))
+    
+    # Multi-page boundary detection (several pages per LLM request)
+    CHUNKER_BATCH_PAGES = os.environ.get('CHUNKER_BATCH_PAGES', 'true').lower() == 'true'
+    CHUNKER_BATCH_TOKEN_BUDGET = int(os.environ.get('CHUNKER_BATCH_TOKEN_BUDGET', 6000))  # Estimated prompt tokens per request
+    CHUNKER_BATCH_MAX_PAGES = int(os.environ.get('CHUNKER_BATCH_MAX_PAGES', 8))
+    CHUNKER_BATCH_MAX_OUTPUT_TOKENS = int(os.environ.get('CHUNKER_BATCH_MAX_OUTPUT_TOKENS', 4000))
+    
+    # Concurrent boundary detection, paced by process-wide OpenAI rate limits
+    CHUNKER_MAX_CONCURRENCY = int(os.environ.get('CHUNKER_MAX_CONCURRENCY', 4))
+    CHUNKER_REQUESTS_PER_MINUTE = int(os.environ.get('CHUNKER_REQUESTS_PER_MINUTE', 500))
+    CHUNKER_TOKENS_PER_MINUTE = int(os.environ.get('CHUNKER_TOKENS_PER_MINUTE', 160000))    
+    # Rule-based boundary pre-pass (LLM is only asked about pages the rules cannot resolve)
+    CHUNKER_RULES_ENABLED = os.environ.get('CHUNKER_RULES_ENABLED', 'true').lower() == 'true'
+    CHUNKER_RULES_MIN_CONFIDENCE = float(os.environ.get('CHUNKER_RULES_MIN_CONFIDENCE', 0.8))  # Mean confidence of rule boundaries
+    CHUNKER_RULES_MIN_COVERAGE = float(os.environ.get('CHUNKER_RULES_MIN_COVERAGE', 0.85))  # Share of text in short enough segments
+    CHUNKER_RULES_MAX_SEGMENT_CHARS = int(os.environ.get('CHUNKER_RULES_MAX_SEGMENT_CHARS', 1200))
@@ -28,7 +28,7 @@ def print_startup_info():
     print("PDF Conversion Endpoints:")
     print("  POST /convert - Convert PDF to images")
     print("  GET /status/<job_id> - Check conversion status")
-    print("  GET /download/<job_id> - Download images ZIP (local)")
+    print("  GET /download/<job_id> - Download images ZIP (local or streamed from S3)")
     print("  GET /s3-info/<job_id> - Get S3 URLs and info")
     print("  DELETE /cleanup/<job_id> - Clean up local job files")
     print("  DELETE /cleanup-s3/<job_id> - Clean up S3 job files")
@@ -37,17 +37,24 @@ def print_startup_info():
     print("\nOCR Endpoints:")
     print("  POST /ocr/roll/<roll_no>/uuid/<uuid> - Perform OCR on answer sheets")
     print("  GET /ocr/test-django - Test Django API connection")
+    print("  GET /ocr/cache-stats - OCR result cache hit/miss counters")
     
     print("\nSemantic Chunker Endpoints:")
     print("  GET /chunker - Chunker service health check")
     print("  POST /chunker/process-ocr-chunks - Process OCR data into semantic chunks")
+    print("  GET /chunker/cache-stats - Boundary detection cache hit/miss counters")
     print("  GET /chunker/test-django-connection - Test Django API connection")
     print("  GET /chunker/test-openai?api_key=... - Test OpenAI API connection")
     print("  GET /chunker/debug/webhook-config - Check webhook configuration")
     print("  POST /chunker/debug/test-webhook - Test webhook notification")
     
     print("\nStamp Detection Endpoints:")
-    print("  POST /stamp/process-stamps/<job_id> - Process images from S3 for stamp detection")
+    print("  POST /stamp/process-stamps/<job_id> - Process images from S3 for stamp detection (\"async\": true queues it)")
+    print("  GET /stamp/jobs/<task_id> - Background stamp job status")
+    print("  GET /stamp/jobs/<task_id>/events - Background stamp job progress (server-sent events)")
+    print("  POST /stamp/templates/<institution_id> - Register a stamp template")
+    print("  GET /stamp/templates/<institution_id> - List stamp templates")
+    print("  DELETE /stamp/templates/<institution_id>/<name> - Remove a stamp template")
     print("  GET /stamp/health - Stamp detection service health check")
     print("  GET /stamp/config - Stamp detection service configuration")
     print("  POST /stamp/test-vlm - Test VLM extraction with sample image")
@@ -55,6 +62,7 @@ def print_startup_info():
     print("\nSystem Endpoints:")
     print("  GET /health - Health check")
     print("  GET /s3-config - S3 configuration status")
+    print("  GET /http-stats - Outbound HTTP connection reuse per host")
     
     print("\nConfiguration:")
     print(f"  S3 Bucket: {Config.S3_BUCKET}")
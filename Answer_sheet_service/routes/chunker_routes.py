@@ -8,6 +8,7 @@ from functools import wraps
 import logging
 import time
 from services.chunker_service import ChunkerService
+from services.result_cache import get_result_cache
 from config import Config
 
 # Configure logging
@@ -109,6 +110,15 @@ def process_ocr_chunks(data):
             'error': str(e)
         }), 500
 
+@chunker_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the boundary detection cache"""
+    return jsonify({
+        "status": "success",
+        "cache_backend": Config.RESULT_CACHE_BACKEND,
+        "boundary_cache": get_result_cache('chunk_boundaries').stats()
+    })
+
 @chunker_bp.route('/test-django-connection', methods=['GET'])
 def test_django_connection():
     """Test connection to Django API"""
@@ -1,10 +1,12 @@
 import os
 import uuid
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from config import Config
 from services.converter_service import ConverterService
+from services.job_scheduler import QueueFullError
 from services.s3_service import S3Service
+from services.http_client import get_http_stats
 
 # Create blueprint
 converter_bp = Blueprint('converter', __name__)
@@ -25,6 +27,7 @@ def convert_pdf():
     - format: (optional) Image format JPEG/PNG (default: JPEG)
     - quality: (optional) JPEG quality 1-100 (default: 85)
     - upload_to_s3: (optional) Whether to upload to S3 (default: true)
+    - priority: (optional) Higher priority jobs start first (default: 0)
     """
     
     # Check if file is present
@@ -47,6 +50,7 @@ def convert_pdf():
         img_format = request.form.get('format', Config.DEFAULT_FORMAT).upper()
         quality = int(request.form.get('quality', Config.DEFAULT_QUALITY))
         upload_to_s3 = request.form.get('upload_to_s3', 'true').lower() == 'true'
+        priority = int(request.form.get('priority', 0))
     except ValueError:
         return jsonify({'error': 'Invalid parameter values'}), 400
     
@@ -67,15 +71,20 @@ def convert_pdf():
     pdf_path = os.path.join(Config.TEMP_DIR, filename)
     file.save(pdf_path)
     
-    # Start conversion
-    converter_service.start_conversion(
-        pdf_path, job_uuid, dpi, img_format, quality, upload_to_s3
-    )
+    # Queue conversion
+    try:
+        queue_position = converter_service.start_conversion(
+            pdf_path, job_uuid, dpi, img_format, quality, upload_to_s3, priority
+        )
+    except QueueFullError as e:
+        os.remove(pdf_path)
+        return jsonify({'error': str(e)}), 503
     
     response_data = {
         'message': 'Conversion started',
         'job_id': job_uuid,
         'status': 'queued',
+        'queue_position': queue_position,
         'upload_to_s3': upload_to_s3
     }
     
@@ -96,7 +105,7 @@ def get_status(job_id):
 
 @converter_bp.route('/download/<job_id>', methods=['GET'])
 def download_images(job_id):
-    """Download converted images as ZIP (local backup)"""
+    """Download converted images as ZIP (local archive, or streamed from S3)"""
     job = converter_service.get_job(job_id)
     
     if job is None:
@@ -107,7 +116,15 @@ def download_images(job_id):
     
     zip_path = job.get('zip_path')
     if not zip_path or not os.path.exists(zip_path):
-        return jsonify({'error': 'Download file not found'}), 404
+        stream = converter_service.iter_download(job_id)
+        if stream is None:
+            return jsonify({'error': 'Download file not found'}), 404
+        
+        return Response(
+            stream_with_context(stream),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={job_id}_images.zip'}
+        )
     
     return send_file(
         zip_path,
@@ -168,10 +185,19 @@ def health_check():
     return jsonify({
         'status': 'healthy', 
         'active_jobs': len(jobs_summary),
+        'scheduler': converter_service.scheduler.stats(),
         's3_configured': s3_service.is_configured(),
         's3_bucket': Config.S3_BUCKET if s3_service.is_configured() else None
     })
 
+@converter_bp.route('/http-stats', methods=['GET'])
+def http_stats():
+    """Outbound HTTP requests and keep-alive connection reuse per host"""
+    return jsonify({
+        'status': 'success',
+        'clients': get_http_stats()
+    })
+
 @converter_bp.route('/s3-config', methods=['GET'])
 def s3_config():
     """Get S3 configuration status"""
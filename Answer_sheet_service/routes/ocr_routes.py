@@ -57,11 +57,11 @@ def test_django_connection():
     """Test connection to Django API"""
     try:
         from config import Config
-        import requests
         from datetime import datetime
+        from services.http_client import get_http_client
         
         url = f"{Config.DJANGO_API_BASE}/"
-        response = requests.get(url, timeout=10)
+        response = get_http_client().get(url, timeout=10)
         
         return jsonify({
             'success': True,
@@ -78,6 +78,18 @@ def test_django_connection():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@ocr_bp.route('/ocr/cache-stats', methods=['GET'])
+def ocr_cache_stats():
+    """Hit/miss counters of the OCR result cache"""
+    from config import Config
+    
+    return jsonify({
+        'success': True,
+        'cache_enabled': Config.OCR_CACHE_ENABLED,
+        'cache_backend': Config.RESULT_CACHE_BACKEND,
+        'ocr_cache': ocr_service.cache.stats() if ocr_service.cache else None
+    })
+
 @ocr_bp.route('/ocr/health', methods=['GET'])
 def ocr_health_check():
     """OCR service health check"""
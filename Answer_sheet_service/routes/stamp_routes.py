@@ -1,6 +1,11 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from datetime import datetime
+from config import Config
 from services.stamp_service import StampService
+from services.stamp_job_service import StampJobService
+from services.job_scheduler import QueueFullError
+import json
+import time
 import traceback
 
 # Create blueprint
@@ -8,6 +13,7 @@ stamp_bp = Blueprint('stamp', __name__)
 
 # Initialize stamp service
 stamp_service = StampService()
+stamp_job_service = StampJobService(stamp_service)
 
 @stamp_bp.route('/health', methods=['GET'])
 def health_check():
@@ -17,27 +23,65 @@ def health_check():
         'service': 'stamp_detection',
         'timestamp': datetime.now().isoformat(),
         'api_key_configured': stamp_service.is_openai_configured(),
+        'scheduler': stamp_job_service.scheduler.stats(),
         's3_client_available': stamp_service.is_s3_configured(),
         'bucket_name': stamp_service.get_s3_bucket_name()
     })
 
 @stamp_bp.route('/process-stamps/<job_id>', methods=['POST'])
 def process_stamps_from_s3(job_id: str):
-    """Main endpoint to process images from S3 for stamp detection and roll number extraction"""
+    """
+    Main endpoint to process images from S3 for stamp detection and roll number extraction
+    
+    With "async": true in the JSON body (or ?async=true) the job is queued and
+    202 is returned at once with a task_id to poll or stream; the webhook is
+    still sent when the job finishes.
+    """
+    
+    # Get optional parameters from request
+    request_data = request.get_json() if request.is_json else {}
+    webhook_url = request_data.get('webhook_url')
+    crop_percentage = request_data.get('crop_percentage', 0.2)
+    institution_id = request_data.get('institution_id')
+    run_async = str(request_data.get('async', request.args.get('async', 'false'))).lower() == 'true'
+    
+    if run_async:
+        try:
+            priority = int(request_data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid priority'}), 400
+        
+        try:
+            task = stamp_job_service.start_job(
+                job_id=job_id,
+                webhook_url=webhook_url,
+                crop_percentage=crop_percentage,
+                institution_id=institution_id,
+                priority=priority
+            )
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+        
+        print(f"📥 Queued background processing for job: {job_id} (task {task['task_id']})")
+        return jsonify({
+            'message': 'Stamp processing queued',
+            'task_id': task['task_id'],
+            'job_id': job_id,
+            'status': 'queued',
+            'queue_position': task['queue_position'],
+            'status_url': f"/stamp/jobs/{task['task_id']}",
+            'events_url': f"/stamp/jobs/{task['task_id']}/events"
+        }), 202
     
     try:
         print(f"🚀 Starting processing for job: {job_id}")
         
-        # Get optional parameters from request
-        request_data = request.get_json() if request.is_json else {}
-        webhook_url = request_data.get('webhook_url')
-        crop_percentage = request_data.get('crop_percentage', 0.2)
-        
         # Process the job
         result = stamp_service.process_job(
             job_id=job_id,
             webhook_url=webhook_url,
-            crop_percentage=crop_percentage
+            crop_percentage=crop_percentage,
+            institution_id=institution_id
         )
         
         print(f"🎉 Processing completed for job: {job_id}")
@@ -52,6 +96,100 @@ def process_stamps_from_s3(job_id: str):
         
         return jsonify(error_response), 500
 
+@stamp_bp.route('/jobs/<task_id>', methods=['GET'])
+def get_stamp_job(task_id: str):
+    """Status of a background stamp job (?include_result=false omits the result)"""
+    include_result = request.args.get('include_result', 'true').lower() == 'true'
+    task = stamp_job_service.get_task(task_id, include_result=include_result)
+    
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    return jsonify(task)
+
+@stamp_bp.route('/jobs/<task_id>/events', methods=['GET'])
+def stream_stamp_job_events(task_id: str):
+    """Server-sent events with pages done, stamps found and ETA until the job finishes"""
+    if stamp_job_service.get_task(task_id, include_result=False) is None:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    def generate():
+        last_event = None
+        while True:
+            event = stamp_job_service.progress_event(task_id)
+            if event is None:
+                yield "event: error\ndata: {\"error\": \"Task not found\"}\n\n"
+                return
+            
+            if event != last_event:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                last_event = event
+            else:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            
+            if event['status'] in ('completed', 'failed'):
+                yield f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
+                return
+            
+            time.sleep(Config.STAMP_EVENTS_POLL_INTERVAL)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@stamp_bp.route('/templates/<institution_id>', methods=['POST'])
+def upload_stamp_template(institution_id: str):
+    """
+    Register a stamp template for an institution
+    
+    Form data:
+    - template: Stamp image file
+    - name: (optional) Template name (default: uploaded file name)
+    """
+    if 'template' not in request.files:
+        return jsonify({'error': 'No template file provided'}), 400
+    
+    file = request.files['template']
+    if file.filename == '' or not stamp_service.allowed_file(file.filename):
+        return jsonify({'error': 'Template must be an image file'}), 400
+    
+    name = request.form.get('name') or file.filename.rsplit('.', 1)[0]
+    
+    try:
+        template = stamp_service.template_registry.register(institution_id, name, file.read())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'message': 'Template registered',
+        'institution_id': institution_id,
+        'template': template
+    }), 201
+
+@stamp_bp.route('/templates/<institution_id>', methods=['GET'])
+def list_stamp_templates(institution_id: str):
+    """List the stamp templates registered for an institution"""
+    return jsonify({
+        'institution_id': institution_id,
+        'templates': stamp_service.template_registry.list_templates(institution_id)
+    })
+
+@stamp_bp.route('/templates/<institution_id>/<name>', methods=['DELETE'])
+def delete_stamp_template(institution_id: str, name: str):
+    """Remove a stamp template"""
+    try:
+        removed = stamp_service.template_registry.remove(institution_id, name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not removed:
+        return jsonify({'error': 'Template not found'}), 404
+    
+    return jsonify({'message': f'Template {name} removed', 'institution_id': institution_id})
+
 @stamp_bp.route('/config', methods=['GET'])
 def get_stamp_config():
     """Get stamp detection service configuration"""
@@ -0,0 +1,237 @@
+"""
+Azure Read Engine
+Concurrent Azure Read submissions with one shared polling loop
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional
+from config import Config
+from services.http_client import get_http_client
+
+POLL_REQUEST_TIMEOUT = 30  # Seconds for a single poll GET
+
+class AzureReadError(Exception):
+    """Azure Read rejected a request or did not finish in time"""
+
+    def __init__(self, message, status_code=None, details=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+class _RateLimitGate:
+    """
+    Process-wide 429 backoff
+
+    Any 429, from a submission or a poll, pauses every Azure call until the
+    backoff has passed, instead of each request backing off on its own
+    while the others keep hitting the limit.
+    """
+
+    def __init__(self, base_delay: float, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._paused_until = 0.0
+        self._consecutive = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def throttled(self, retry_after: Optional[str]) -> float:
+        with self._lock:
+            self._consecutive += 1
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(self.max_delay, self.base_delay * (2 ** (self._consecutive - 1)))
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            return delay
+
+    def succeeded(self):
+        with self._lock:
+            self._consecutive = 0
+
+class _Operation:
+    def __init__(self, url: str, future: Future, deadline: float):
+        self.url = url
+        self.future = future
+        self.deadline = deadline
+        self.interval = Config.OCR_POLL_INITIAL_INTERVAL
+
+class AzureReadEngine:
+    """
+    Submits images to Azure Read and polls all operations from one thread
+
+    submit() posts an image (waiting for a free in-flight slot and for any
+    global 429 backoff) and returns a Future for the final Read result.
+    A single poller thread checks every pending Operation-Location, backing
+    each one off from OCR_POLL_INITIAL_INTERVAL to OCR_POLL_MAX_INTERVAL
+    while it is still running.
+    """
+
+    def __init__(self, read_url: str, subscription_key: str, max_in_flight: Optional[int] = None):
+        self.read_url = read_url
+        self.subscription_key = subscription_key
+        self.max_in_flight = max_in_flight or Config.OCR_MAX_IN_FLIGHT
+
+        self.http = get_http_client()
+
+        self.gate = _RateLimitGate(Config.OCR_RETRY_BACKOFF)
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+
+        self._pending = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        poller = threading.Thread(target=self._poll_loop, name="azure-read-poller")
+        poller.daemon = True
+        poller.start()
+
+    def submit(self, image_data: bytes) -> Future:
+        """
+        Post an image to Azure Read
+
+        Returns:
+            Future resolving to the Read result JSON (status succeeded or
+            failed), or raising AzureReadError
+
+        Raises:
+            AzureReadError: If the submission itself is rejected
+        """
+        self.slots.acquire()
+        future = Future()
+        future.add_done_callback(lambda _f: self.slots.release())
+
+        try:
+            operation_url = self._post(image_data)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+
+        with self._cond:
+            operation = _Operation(operation_url, future, time.monotonic() + Config.OCR_POLL_TIMEOUT)
+            heapq.heappush(self._pending, (time.monotonic() + operation.interval, next(self._seq), operation))
+            self._cond.notify()
+        return future
+
+    def read(self, image_data: bytes) -> Dict:
+        """
+        Submit an image and wait for its Read result
+
+        Raises:
+            AzureReadError: If the Read fails or no result arrives in time
+        """
+        future = self.submit(image_data)
+        try:
+            # The poller gives up after OCR_POLL_TIMEOUT; allow for the poll in progress
+            return future.result(timeout=Config.OCR_POLL_TIMEOUT + POLL_REQUEST_TIMEOUT)
+        except FutureTimeoutError:
+            # Cancelling frees the in-flight slot; the poller drops the operation
+            future.cancel()
+            raise AzureReadError("Azure OCR did not return a result in time")
+
+    def _post(self, image_data: bytes) -> str:
+        headers = {
+            "Ocp-Apim-Subscription-Key": self.subscription_key,
+            "Content-Type": "application/octet-stream"
+        }
+
+        for attempt in range(Config.OCR_MAX_RETRIES):
+            self.gate.wait()
+            response = self.http.post(self.read_url, headers=headers, data=image_data, timeout=60)
+
+            if response.status_code == 429:
+                wait_time = self.gate.throttled(response.headers.get('Retry-After'))
+                print(f"Rate limited (429) on initial request. Pausing Azure calls for {wait_time:.1f} seconds...")
+                continue
+            if response.status_code == 202:
+                self.gate.succeeded()
+                return response.headers["Operation-Location"]
+
+            raise AzureReadError('Azure OCR failed', status_code=response.status_code, details=response.text)
+
+        raise AzureReadError('Azure OCR failed after multiple retries', details='Rate limit exceeded')
+
+    def _poll_loop(self):
+        headers = {"Ocp-Apim-Subscription-Key": self.subscription_key}
+
+        while True:
+            with self._cond:
+                while not self._pending or self._pending[0][0] > time.monotonic():
+                    timeout = self._pending[0][0] - time.monotonic() if self._pending else None
+                    self._cond.wait(timeout)
+                _, _, operation = heapq.heappop(self._pending)
+
+            try:
+                next_poll = self._poll(operation, headers)
+            except Exception as e:
+                # Fail only this operation; the loop serves every OCR request in the process
+                if not operation.future.done():
+                    operation.future.set_exception(AzureReadError(f"Azure OCR polling failed: {e}"))
+                continue
+
+            if next_poll is not None:
+                with self._cond:
+                    heapq.heappush(self._pending, (next_poll, next(self._seq), operation))
+
+    def _poll(self, operation: _Operation, headers: Dict) -> Optional[float]:
+        """Poll one operation; returns when to poll it next, or None once it is resolved"""
+        if operation.future.done():
+            # Cancelled by a caller that stopped waiting
+            return None
+
+        if time.monotonic() > operation.deadline:
+            operation.future.set_exception(
+                AzureReadError("Azure OCR polling timed out or failed after multiple retries.")
+            )
+            return None
+
+        try:
+            self.gate.wait()
+            response = self.http.get(operation.url, headers=headers, timeout=POLL_REQUEST_TIMEOUT)
+
+            if response.status_code == 429:
+                wait_time = self.gate.throttled(response.headers.get('Retry-After'))
+                print(f"Rate limited (429) while polling. Pausing Azure calls for {wait_time:.1f} seconds...")
+                return time.monotonic() + wait_time
+            if response.status_code != 200:
+                raise AzureReadError('Azure OCR polling failed', status_code=response.status_code,
+                                     details=response.text)
+
+            try:
+                result = response.json()
+            except Exception as e:
+                raise AzureReadError(f"Failed to parse OCR response JSON: {e}")
+            if not isinstance(result, dict):
+                raise AzureReadError("Unexpected OCR response", details=response.text)
+        except Exception as e:
+            operation.future.set_exception(e)
+            return None
+
+        self.gate.succeeded()
+        if result.get("status") in ["succeeded", "failed"]:
+            operation.future.set_result(result)
+            return None
+
+        # Still running: poll less often the longer it takes
+        operation.interval = min(Config.OCR_POLL_MAX_INTERVAL, operation.interval * 1.5)
+        return time.monotonic() + operation.interval
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_read_engine(read_url: str, subscription_key: str) -> AzureReadEngine:
+    """Process-wide engine, so every OCR request shares the in-flight limit and 429 backoff"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AzureReadEngine(read_url, subscription_key)
+        return _engine
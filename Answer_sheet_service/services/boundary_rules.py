@@ -0,0 +1,137 @@
+"""
+Boundary Rules
+Deterministic, regex and layout based boundary detection for OCR pages
+"""
+
+import re
+from dataclasses import dataclass, field
+from statistics import median
+from typing import List, Dict, Optional, Pattern
+from config import Config
+
+@dataclass
+class BoundaryRule:
+    name: str
+    pattern: Pattern
+    boundary_type: str
+    confidence: float
+    # Numbered markers are only trusted near the left margin
+    needs_margin: bool = False
+
+# Same patterns the LLM prompt lists under DETECTION PATTERNS, most specific first
+BOUNDARY_RULES = [
+    BoundaryRule('section', re.compile(r'^\s*(?:PART|SECTION|UNIT|CHAPTER)\s*[-:]?\s*(?:[A-Z]|[IVX]+|\d+)\b', re.IGNORECASE),
+                 'SECTION_HEADER', 0.85),
+    BoundaryRule('question', re.compile(r'^\s*Q(?:ue?s?t?i?o?n?)?\s*\.?\s*(?:No\.?\s*)?\d{1,2}[a-z]?\b', re.IGNORECASE),
+                 'QUESTION_START', 0.9),
+    BoundaryRule('answer', re.compile(r'^\s*(?:Ans(?:wer)?|Sol(?:ution)?)\s*(?:\d{1,2}\s*)?[\.:\-)]', re.IGNORECASE),
+                 'ANSWER_START', 0.9),
+    BoundaryRule('lettered_number', re.compile(r'^\s*[A-Z]\s*\.\s*\d{1,2}\s*[\.\)]'),
+                 'ANSWER_START', 0.85, needs_margin=True),
+    BoundaryRule('number', re.compile(r'^\s*\d{1,2}\s*[\.\)](?!\d)\s*\S'),
+                 'ANSWER_START', 0.8, needs_margin=True),
+    BoundaryRule('subpart', re.compile(r'^\s*\(?(?:[a-h]|i{1,3}|iv|vi{0,3}|ix|x)\)\s*\S'),
+                 'SUBSECTION_START', 0.65, needs_margin=True),
+]
+
+@dataclass
+class RuleDetection:
+    boundaries: List[Dict] = field(default_factory=list)
+    confidence: float = 0.0
+    coverage: float = 0.0
+    accepted: bool = False
+
+class RuleBoundaryDetector:
+    """
+    Finds answer/question/section starts from line text and geometry
+    
+    Layout cues: a marker at the left margin is trusted more than one
+    indented into the text, and a larger than usual vertical gap above a
+    marker raises its confidence. The page is only considered resolved when
+    the boundaries are confident enough and split the page finely enough;
+    otherwise the caller should ask the LLM.
+    """
+    
+    def __init__(self, min_confidence: Optional[float] = None, min_coverage: Optional[float] = None,
+                 max_segment_chars: Optional[int] = None):
+        self.min_confidence = min_confidence if min_confidence is not None else Config.CHUNKER_RULES_MIN_CONFIDENCE
+        self.min_coverage = min_coverage if min_coverage is not None else Config.CHUNKER_RULES_MIN_COVERAGE
+        self.max_segment_chars = max_segment_chars or Config.CHUNKER_RULES_MAX_SEGMENT_CHARS
+    
+    def detect(self, lines: List[Dict]) -> RuleDetection:
+        """
+        Detect boundaries on one page
+        
+        Args:
+            lines: Line dicts from OCRSemanticChunker.process_ocr_data_with_layout
+                   ('text', 'x1', 'y1', 'y2', 'height')
+            
+        Returns:
+            RuleDetection with boundary dicts (ChunkBoundary fields), the mean
+            boundary confidence, the coverage and whether the page is resolved
+        """
+        if len(lines) < 2:
+            return RuleDetection(accepted=True, confidence=1.0, coverage=1.0)
+        
+        left_margin = min(line['x1'] for line in lines)
+        line_height = median([line['height'] for line in lines if line['height'] > 0] or [20])
+        gaps = [max(0.0, lines[i]['y1'] - lines[i - 1]['y2']) for i in range(1, len(lines))]
+        typical_gap = median(gaps) if gaps else 0.0
+        
+        boundaries = []
+        for index, line in enumerate(lines):
+            rule = self._match(line['text'])
+            if rule is None:
+                continue
+            
+            confidence = rule.confidence
+            indent = line['x1'] - left_margin
+            if rule.needs_margin and indent > 2 * line_height:
+                confidence -= 0.2
+            if index > 0 and gaps[index - 1] > max(1.5 * typical_gap, 0.5 * line_height):
+                confidence += 0.05
+            confidence = round(min(confidence, 1.0), 2)
+            
+            boundaries.append({
+                'line_index': index,
+                'confidence': confidence,
+                'reason': f"Line matches the {rule.name} pattern" + (" at the left margin" if indent <= 2 * line_height else ""),
+                'boundary_type': rule.boundary_type,
+                'text_before': lines[index - 1]['text'][-15:] if index > 0 else '',
+                'text_after': line['text'][:15]
+            })
+        
+        used = [b for b in boundaries if b['confidence'] >= Config.CHUNKER_CONFIDENCE_THRESHOLD]
+        confidence = sum(b['confidence'] for b in used) / len(used) if used else 0.0
+        coverage = self._coverage(lines, used)
+        
+        return RuleDetection(
+            boundaries=boundaries,
+            confidence=round(confidence, 3),
+            coverage=round(coverage, 3),
+            accepted=bool(used) and confidence >= self.min_confidence and coverage >= self.min_coverage
+        )
+    
+    @staticmethod
+    def _match(text: str) -> Optional[BoundaryRule]:
+        for rule in BOUNDARY_RULES:
+            if rule.pattern.match(text):
+                return rule
+        return None
+    
+    def _coverage(self, lines: List[Dict], boundaries: List[Dict]) -> float:
+        """
+        Share of the page's text in segments short enough to need no
+        further semantic splitting
+        """
+        starts = sorted({0} | {b['line_index'] for b in boundaries})
+        ends = starts[1:] + [len(lines)]
+        total = sum(len(line['text']) for line in lines) or 1
+        
+        covered = 0
+        for start, end in zip(starts, ends):
+            segment_chars = sum(len(lines[i]['text']) for i in range(start, end))
+            if segment_chars <= self.max_segment_chars:
+                covered += segment_chars
+        
+        return covered / total
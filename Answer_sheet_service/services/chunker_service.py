@@ -7,15 +7,92 @@ import requests
 import json
 import logging
 import time
-import openai
 import numpy as np
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
+from services.line_clustering import cluster_lines
+from services.boundary_rules import RuleBoundaryDetector
+from services.rate_limiter import OPENAI_REQUEST_LIMITER, OPENAI_TOKEN_LIMITER
+from services.result_cache import get_result_cache, make_cache_key
+from services.http_client import get_http_client, get_openai_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Bump whenever the boundary prompts change so cached results are not reused
+BOUNDARY_PROMPT_VERSION = 'v2'
+
+BOUNDARY_SYSTEM_PROMPT = "You are an expert at analyzing educational documents and identifying semantic boundaries for intelligent text chunking. Return only valid JSON."
+
+# Shared by single-page and multi-page boundary requests; the placeholders
+# carry the parts that differ between the two
+BOUNDARY_PROMPT_TEMPLATE = """Analyze this OCR-extracted text and identify semantic boundaries for intelligent chunking.
+
+{scope_note}Text to analyze:
+{text_to_analyze}
+
+Identify natural breaking points where content could be meaningfully separated. Focus on:
+
+## PRIMARY BOUNDARIES (High Priority - Confidence 0.8-1.0):
+- **ANSWER_START**: Beginning of numbered answers (e.g., "1.", "A.1.", "Q1:", "Answer:")  
+- **QUESTION_START**: Beginning of new questions or prompts
+- **SECTION_HEADER**: Major sections (e.g., "PART A", "Section I", subject names)
+- **TOPIC_CHANGE**: Clear subject matter changes
+
+## SECONDARY BOUNDARIES (Medium Priority - Confidence 0.5-0.7):
+- **SUBSECTION_START**: Sub-parts within answers (e.g., "(i)", "(a)", bullet points)
+- **PARAGRAPH_BREAK**: Logical paragraph divisions in long text
+- **DEFINITION_START**: Beginning of definitions or key concepts
+- **EXAMPLE_START**: Beginning of examples or illustrations
+
+## DETECTION PATTERNS:
+1. **Numbering**: "1.", "2)", "(a)", "(i)", "Q1", etc.
+2. **Keywords**: "Answer", "Solution", "Definition", "Example", "Explanation"
+3. **Section markers**: "PART", "SECTION", "CHAPTER", "UNIT"
+4. **Question indicators**: "What", "How", "Why", "Define", "Explain"
+5. **Answer patterns**: "A:", "Ans:", "Solution:", direct responses
+
+## IGNORE:
+- Headers with school names, dates, student info
+- Page numbers, administrative text
+- Minor line breaks within sentences
+- Signature lines
+
+Return a JSON array with boundary objects containing:
+{location_fields}- "boundary_type": Exact type from categories above  
+- "confidence": 0.0-1.0 confidence score
+- "reason": Specific explanation of why this is a boundary
+- "text_before": Last 15 chars before boundary (or empty if line 1)
+- "text_after": First 15 chars at boundary
+
+Focus on educational content structure. Return empty array [] if no clear boundaries found.
+
+Example: {example}"""
+
+SINGLE_PAGE_LOCATION_FIELDS = '''- "line_number": 1-based line number where boundary occurs
+'''
+
+MULTI_PAGE_SCOPE_NOTE = """The text below comes from several pages of one answer script. Every line is prefixed with "Page P, Line N". Treat each page on its own: report boundaries per page and never across a page break.
+
+"""
+
+MULTI_PAGE_LOCATION_FIELDS = '''- "page": Page number P from the line prefix
+- "line_number": Line number N within that page, from the line prefix
+'''
+
+SINGLE_PAGE_EXAMPLE = '''[{"line_number": 3, "boundary_type": "ANSWER_START", "confidence": 0.9, "reason": "Line starts with '1. A)' indicating numbered answer", "text_before": "examination", "text_after": "1. A) Everything"}]'''
+
+MULTI_PAGE_EXAMPLE = '''[{"page": 1, "line_number": 3, "boundary_type": "ANSWER_START", "confidence": 0.9, "reason": "Line starts with '1. A)' indicating numbered answer", "text_before": "examination", "text_after": "1. A) Everything"}, {"page": 2, "line_number": 1, "boundary_type": "QUESTION_START", "confidence": 0.8, "reason": "Line starts with 'Q2' indicating a new question", "text_before": "", "text_after": "Q2. Explain the"}]'''
+
+# Rough prompt size of everything but the numbered lines, in tokens
+BOUNDARY_PROMPT_OVERHEAD_TOKENS = 700
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about 4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
 @dataclass
 class ChunkBoundary:
     line_index: int
@@ -33,7 +110,9 @@ class OCRSemanticChunker:
         Args:
             api_key: Your OpenAI API key
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_openai_client(api_key)
+        self.cache = get_result_cache('chunk_boundaries')
+        self.rule_detector = RuleBoundaryDetector()
 
     def process_ocr_data(self, ocr_data: List[Dict]) -> List[str]:
         """
@@ -45,6 +124,18 @@ class OCRSemanticChunker:
         Returns:
             List of text lines in reading order
         """
+        return [line['text'] for line in self.process_ocr_data_with_layout(ocr_data)]
+
+    def process_ocr_data_with_layout(self, ocr_data: List[Dict]) -> List[Dict]:
+        """
+        Convert OCR bounding box data into ordered text lines with their geometry
+        
+        Args:
+            ocr_data: List of OCR objects with 'text', 'confidence', and 'boundingBox'
+            
+        Returns:
+            List of line dicts ('text', 'x1', 'y1', 'y2', 'height') in reading order
+        """
         print(f"Processing {len(ocr_data)} OCR items...")
         
         # Filter out low confidence items (optional - adjust threshold as needed)
@@ -84,7 +175,7 @@ class OCRSemanticChunker:
         print(f"Organized into {len(lines)} text lines")
         return lines
 
-    def _group_into_lines(self, items: List[Dict]) -> List[str]:
+    def _group_into_lines(self, items: List[Dict]) -> List[Dict]:
         """Group OCR items into text lines based on Y-coordinate proximity"""
         if not items:
             return []
@@ -98,32 +189,8 @@ class OCRSemanticChunker:
         
         print(f"Using Y-tolerance of {Y_TOLERANCE:.1f} pixels (avg height: {avg_height:.1f})")
         
-        # Group items by similar Y coordinates
-        line_groups = []
-        
-        for item in items:
-            # Find best matching line group
-            best_group = None
-            best_distance = float('inf')
-            
-            for group in line_groups:
-                if group:
-                    # Calculate median Y of current group
-                    group_y_values = [g['center_y'] for g in group]
-                    group_y_median = np.median(group_y_values)
-                    
-                    distance = abs(item['center_y'] - group_y_median)
-                    if distance <= Y_TOLERANCE and distance < best_distance:
-                        best_group = group
-                        best_distance = distance
-            
-            if best_group is not None:
-                best_group.append(item)
-            else:
-                line_groups.append([item])
-        
-        # Sort line groups by Y position (top to bottom)
-        line_groups.sort(key=lambda group: np.median([item['center_y'] for item in group]))
+        # Group items by similar Y coordinates, sorted top to bottom
+        line_groups = cluster_lines(items, Y_TOLERANCE)
         
         # Convert each line group to text
         lines = []
@@ -134,7 +201,15 @@ class OCRSemanticChunker:
             # Join text with intelligent spacing
             line_text = self._join_line_text(group)
             if line_text:
-                lines.append(line_text)
+                y1 = min(item['y1'] for item in group)
+                y2 = max(item['y2'] for item in group)
+                lines.append({
+                    'text': line_text,
+                    'x1': min(item['x1'] for item in group),
+                    'y1': y1,
+                    'y2': y2,
+                    'height': y2 - y1
+                })
         
         return lines
 
@@ -178,12 +253,13 @@ class OCRSemanticChunker:
         
         return ''.join(result_parts).strip()
 
-    def identify_semantic_boundaries(self, lines: List[str]) -> List[ChunkBoundary]:
+    def identify_semantic_boundaries(self, lines: List[str], use_cache: bool = True) -> List[ChunkBoundary]:
         """
         Use LLM to identify semantic boundaries for intelligent chunking
         
         Args:
             lines: List of text lines from OCR processing
+            use_cache: Look the lines up in the boundary cache first
             
         Returns:
             List of ChunkBoundary objects indicating where to split content
@@ -191,74 +267,23 @@ class OCRSemanticChunker:
         if not lines or len(lines) < 2:
             return []
         
+        if use_cache:
+            cached = self.get_cached_boundaries(lines)
+            if cached is not None:
+                print(f"Using {len(cached)} cached semantic boundaries")
+                return cached
+        
         # Prepare numbered lines for analysis
         numbered_lines = [f"Line {i+1}: {line}" for i, line in enumerate(lines)]
-        text_to_analyze = '\n'.join(numbered_lines)
+        prompt = BOUNDARY_PROMPT_TEMPLATE.format(
+            scope_note='',
+            text_to_analyze='\n'.join(numbered_lines),
+            location_fields=SINGLE_PAGE_LOCATION_FIELDS,
+            example=SINGLE_PAGE_EXAMPLE
+        )
         
-        prompt = f"""Analyze this OCR-extracted text and identify semantic boundaries for intelligent chunking.
-
-Text to analyze:
-{text_to_analyze}
-
-Identify natural breaking points where content could be meaningfully separated. Focus on:
-
-## PRIMARY BOUNDARIES (High Priority - Confidence 0.8-1.0):
-- **ANSWER_START**: Beginning of numbered answers (e.g., "1.", "A.1.", "Q1:", "Answer:")  
-- **QUESTION_START**: Beginning of new questions or prompts
-- **SECTION_HEADER**: Major sections (e.g., "PART A", "Section I", subject names)
-- **TOPIC_CHANGE**: Clear subject matter changes
-
-## SECONDARY BOUNDARIES (Medium Priority - Confidence 0.5-0.7):
-- **SUBSECTION_START**: Sub-parts within answers (e.g., "(i)", "(a)", bullet points)
-- **PARAGRAPH_BREAK**: Logical paragraph divisions in long text
-- **DEFINITION_START**: Beginning of definitions or key concepts
-- **EXAMPLE_START**: Beginning of examples or illustrations
-
-## DETECTION PATTERNS:
-1. **Numbering**: "1.", "2)", "(a)", "(i)", "Q1", etc.
-2. **Keywords**: "Answer", "Solution", "Definition", "Example", "Explanation"
-3. **Section markers**: "PART", "SECTION", "CHAPTER", "UNIT"
-4. **Question indicators**: "What", "How", "Why", "Define", "Explain"
-5. **Answer patterns**: "A:", "Ans:", "Solution:", direct responses
-
-## IGNORE:
-- Headers with school names, dates, student info
-- Page numbers, administrative text
-- Minor line breaks within sentences
-- Signature lines
-
-Return a JSON array with boundary objects containing:
-- "line_number": 1-based line number where boundary occurs
-- "boundary_type": Exact type from categories above  
-- "confidence": 0.0-1.0 confidence score
-- "reason": Specific explanation of why this is a boundary
-- "text_before": Last 15 chars before boundary (or empty if line 1)
-- "text_after": First 15 chars at boundary
-
-Focus on educational content structure. Return empty array [] if no clear boundaries found.
-
-Example: [{{"line_number": 3, "boundary_type": "ANSWER_START", "confidence": 0.9, "reason": "Line starts with '1. A)' indicating numbered answer", "text_before": "examination", "text_after": "1. A) Everything"}}]"""
-
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert at analyzing educational documents and identifying semantic boundaries for intelligent text chunking. Return only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            response_text = response.choices[0].message.content.strip()
-            
-            # Clean JSON response
-            if response_text.startswith('```json'):
-                response_text = response_text.split('\n', 1)[1].rsplit('\n```', 1)[0]
-            elif response_text.startswith('```'):
-                response_text = response_text.split('\n', 1)[1].rsplit('\n', 1)[0]
-            
-            boundaries_data = json.loads(response_text)
+            boundaries_data = self._request_boundaries(prompt, max_tokens=2000)
             
             # Convert to ChunkBoundary objects
             boundaries = []
@@ -266,26 +291,161 @@ Example: [{{"line_number": 3, "boundary_type": "ANSWER_START", "confidence": 0.9
                 # Validate line number
                 line_num = int(b['line_number'])
                 if 1 <= line_num <= len(lines):
-                    boundary = ChunkBoundary(
-                        line_index=line_num - 1,  # Convert to 0-based
-                        confidence=float(b['confidence']),
-                        reason=b['reason'],
-                        boundary_type=b['boundary_type'],
-                        text_before=b.get('text_before', ''),
-                        text_after=b.get('text_after', '')
-                    )
-                    boundaries.append(boundary)
+                    boundaries.append(self._to_boundary(b, line_num))
             
             # Sort by line index
             boundaries.sort(key=lambda x: x.line_index)
             print(f"Identified {len(boundaries)} semantic boundaries")
             
+            self._store_boundaries(lines, boundaries)
             return boundaries
             
         except Exception as e:
             print(f"LLM boundary detection failed: {e}")
             return []
 
+    def identify_semantic_boundaries_batch(self, pages: List[List[str]]) -> List[List[ChunkBoundary]]:
+        """
+        Identify semantic boundaries for several pages with one LLM request
+        
+        Lines are numbered "Page P, Line N" so the model can report each
+        boundary against its page. If the combined request fails, every page
+        is retried on its own, and so is any page the combined answer left
+        out, since an omitted page cannot be told apart from one without
+        boundaries. Callers look pages up in the cache first.
+        
+        Args:
+            pages: Text lines of each page, in page order
+            
+        Returns:
+            List of boundary lists, one per input page
+        """
+        results: List[List[ChunkBoundary]] = [[] for _ in pages]
+        
+        # Pages with fewer than two lines have no boundaries to find
+        analyzable = [i for i, lines in enumerate(pages) if len(lines) >= 2]
+        if not analyzable:
+            return results
+        if len(analyzable) == 1:
+            results[analyzable[0]] = self.identify_semantic_boundaries(pages[analyzable[0]], use_cache=False)
+            return results
+        
+        numbered_lines = []
+        for page_pos, page_index in enumerate(analyzable, 1):
+            numbered_lines.extend(
+                f"Page {page_pos}, Line {i+1}: {line}" for i, line in enumerate(pages[page_index])
+            )
+        prompt = BOUNDARY_PROMPT_TEMPLATE.format(
+            scope_note=MULTI_PAGE_SCOPE_NOTE,
+            text_to_analyze='\n'.join(numbered_lines),
+            location_fields=MULTI_PAGE_LOCATION_FIELDS,
+            example=MULTI_PAGE_EXAMPLE
+        )
+        
+        try:
+            boundaries_data = self._request_boundaries(prompt, max_tokens=Config.CHUNKER_BATCH_MAX_OUTPUT_TOKENS)
+        except Exception as e:
+            print(f"Batched LLM boundary detection failed, retrying {len(analyzable)} pages one by one: {e}")
+            for page_index in analyzable:
+                results[page_index] = self.identify_semantic_boundaries(pages[page_index], use_cache=False)
+            return results
+        
+        # Map each boundary back to the page it belongs to
+        answered = set()
+        for b in boundaries_data:
+            try:
+                page_pos = int(b['page'])
+                line_num = int(b['line_number'])
+                if not 1 <= page_pos <= len(analyzable):
+                    continue
+                page_index = analyzable[page_pos - 1]
+                answered.add(page_index)
+                if 1 <= line_num <= len(pages[page_index]):
+                    results[page_index].append(self._to_boundary(b, line_num))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping malformed boundary {b}: {e}")
+        
+        for page_index in analyzable:
+            if page_index not in answered:
+                print(f"Batched answer omitted page {analyzable.index(page_index) + 1}, retrying it on its own")
+                results[page_index] = self.identify_semantic_boundaries(pages[page_index], use_cache=False)
+                continue
+            results[page_index].sort(key=lambda x: x.line_index)
+            self._store_boundaries(pages[page_index], results[page_index])
+        
+        print(f"Identified {sum(len(b) for b in results)} semantic boundaries across {len(analyzable)} pages")
+        return results
+
+    def detect_boundaries_locally(self, layout_lines: List[Dict]) -> Optional[List[ChunkBoundary]]:
+        """
+        Rule-based boundary detection, without the LLM
+        
+        Args:
+            layout_lines: Lines from process_ocr_data_with_layout
+            
+        Returns:
+            Boundaries when the rules resolve the page confidently, else None
+        """
+        detection = self.rule_detector.detect(layout_lines)
+        if not detection.accepted:
+            print(f"Rule boundaries not trusted (confidence {detection.confidence}, coverage {detection.coverage})")
+            return None
+        return [ChunkBoundary(**b) for b in detection.boundaries]
+
+    def boundary_cache_key(self, lines: List[str]) -> str:
+        """Content address of a page's boundary result: model, prompt version and numbered lines"""
+        numbered_lines = [f"Line {i+1}: {line}" for i, line in enumerate(lines)]
+        return make_cache_key(Config.CHUNKER_OPENAI_MODEL, BOUNDARY_PROMPT_VERSION, numbered_lines)
+
+    def get_cached_boundaries(self, lines: List[str]) -> Optional[List[ChunkBoundary]]:
+        """Return previously detected boundaries for these exact lines, or None"""
+        cached = self.cache.get(self.boundary_cache_key(lines))
+        if cached is None:
+            return None
+        return [ChunkBoundary(**b) for b in cached]
+
+    def _store_boundaries(self, lines: List[str], boundaries: List[ChunkBoundary]):
+        """Cache a successful boundary result (failed requests are never cached)"""
+        self.cache.set(self.boundary_cache_key(lines), [asdict(b) for b in boundaries])
+
+    def _request_boundaries(self, prompt: str, max_tokens: int) -> List[Dict]:
+        """Send a boundary prompt to the LLM and parse the JSON array it returns"""
+        # OpenAI counts prompt tokens plus max_tokens against the TPM limit
+        OPENAI_REQUEST_LIMITER.acquire()
+        OPENAI_TOKEN_LIMITER.acquire(estimate_tokens(BOUNDARY_SYSTEM_PROMPT + prompt) + max_tokens)
+        
+        response = self.client.chat.completions.create(
+            model=Config.CHUNKER_OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": BOUNDARY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens
+        )
+        
+        response_text = response.choices[0].message.content.strip()
+        
+        # Clean JSON response
+        if response_text.startswith('```json'):
+            response_text = response_text.split('\n', 1)[1].rsplit('\n```', 1)[0]
+        elif response_text.startswith('```'):
+            response_text = response_text.split('\n', 1)[1].rsplit('\n', 1)[0]
+        
+        return json.loads(response_text)
+
+    @staticmethod
+    def _to_boundary(data: Dict, line_num: int) -> ChunkBoundary:
+        """Build a ChunkBoundary from one LLM boundary object"""
+        return ChunkBoundary(
+            line_index=line_num - 1,  # Convert to 0-based
+            confidence=float(data['confidence']),
+            reason=data['reason'],
+            boundary_type=data['boundary_type'],
+            text_before=data.get('text_before', ''),
+            text_after=data.get('text_after', '')
+        )
+
     def create_semantic_chunks(self, lines: List[str], boundaries: List[ChunkBoundary], 
                              max_chunk_size: int = 1500) -> List[Dict[str, Any]]:
         """
@@ -509,7 +669,7 @@ class ChunkerService:
                 return False
             
             # Test basic connectivity with HEAD request
-            response = requests.head(url, timeout=10)
+            response = get_http_client().head(url, timeout=10)
             logger.debug(f"HEAD request status: {response.status_code}")
             return True
             
@@ -540,7 +700,7 @@ class ChunkerService:
                 logger.info(f"Sending webhook notification (attempt {attempt + 1}/{max_retries})")
                 logger.info(f"Webhook URL: {webhook_url}")
                 
-                response = requests.post(
+                response = get_http_client().post(
                     webhook_url, 
                     json=data, 
                     headers=headers,
@@ -575,6 +735,77 @@ class ChunkerService:
         logger.error("Failed to send webhook notification after all retries")
         return False
 
+    def _plan_boundary_batches(self, page_lines: List[List[str]]) -> List[List[int]]:
+        """
+        Pack pages into boundary-detection work units
+        
+        Pages are taken in order and added to the current unit while its
+        estimated prompt stays within CHUNKER_BATCH_TOKEN_BUDGET and it holds
+        at most CHUNKER_BATCH_MAX_PAGES pages. A page too large for the
+        budget gets a unit of its own. Pages with fewer than two lines need
+        no request and are left out.
+        
+        Args:
+            page_lines: Text lines of each page, in page order
+            
+        Returns:
+            List of work units, each a list of page indexes
+        """
+        candidates = [i for i, lines in enumerate(page_lines) if len(lines) >= 2]
+        if not Config.CHUNKER_BATCH_PAGES:
+            return [[i] for i in candidates]
+        
+        budget = max(Config.CHUNKER_BATCH_TOKEN_BUDGET - BOUNDARY_PROMPT_OVERHEAD_TOKENS, 1)
+        units = []
+        current = []
+        current_tokens = 0
+        
+        for i in candidates:
+            # "Page P, Line N: " prefix is roughly 4 tokens per line
+            page_tokens = estimate_tokens('\n'.join(page_lines[i])) + 4 * len(page_lines[i])
+            
+            if current and (current_tokens + page_tokens > budget or len(current) >= Config.CHUNKER_BATCH_MAX_PAGES):
+                units.append(current)
+                current = []
+                current_tokens = 0
+            
+            current.append(i)
+            current_tokens += page_tokens
+        
+        if current:
+            units.append(current)
+        
+        return units
+
+    def _identify_boundaries(self, chunker: OCRSemanticChunker, pages: List[Dict],
+                             work_units: List[List[int]]) -> List[List[ChunkBoundary]]:
+        """
+        Run boundary detection for all work units concurrently
+        
+        Returns:
+            List of boundary lists aligned with pages
+        """
+        page_boundaries: List[List[ChunkBoundary]] = [[] for _ in pages]
+        if not work_units:
+            return page_boundaries
+        
+        def run_unit(unit: List[int]) -> List[List[ChunkBoundary]]:
+            page_numbers = [pages[i]['page_number'] for i in unit]
+            logger.info(f"Identifying boundaries for pages {page_numbers} with LLM semantic analysis...")
+            
+            if len(unit) == 1:
+                return [chunker.identify_semantic_boundaries(pages[unit[0]]['lines'], use_cache=False)]
+            return chunker.identify_semantic_boundaries_batch([pages[i]['lines'] for i in unit])
+        
+        # Work units are independent; the shared rate limiters pace the requests
+        max_workers = max(1, min(Config.CHUNKER_MAX_CONCURRENCY, len(work_units)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for unit, unit_boundaries in zip(work_units, executor.map(run_unit, work_units)):
+                for i, boundaries in zip(unit, unit_boundaries):
+                    page_boundaries[i] = boundaries
+        
+        return page_boundaries
+
     def process_ocr_chunks(self, question_paper_uuid: str, roll_no: str, 
                           openai_api_key: str, max_chunk_size: int = 1500) -> Dict:
         """
@@ -610,7 +841,7 @@ class ChunkerService:
         logger.info(f"Fetching data from Django API: {django_url}")
         
         try:
-            response = requests.get(django_url, timeout=30)
+            response = get_http_client().get(django_url, timeout=30)
             response.raise_for_status()
             django_data = response.json()
         except requests.RequestException as e:
@@ -670,60 +901,109 @@ class ChunkerService:
                 'page_info': []
             }
         
-        # Step 3: Process each page and collect chunks
-        all_chunks = []
-        page_info = []
-        
+        # Step 3: Extract ordered text lines for every page
+        pages = []
         for ocr_record in ocr_records:
             page_number = ocr_record.get('page_number')
             ocr_json_data = ocr_record.get('ocr_json_dump', {})
             
-            logger.info(f"Processing page {page_number} with LLM semantic analysis...")
-            
             # Extract OCR data from the JSON structure
             page_ocr_data = self.extract_ocr_data(ocr_json_data)
             
             if not page_ocr_data:
                 logger.warning(f"No valid OCR data found for page {page_number}")
+                pages.append({'page_number': page_number, 'lines': [], 'layout': [], 'status': 'No valid OCR data'})
+                continue
+            
+            logger.info(f"Found {len(page_ocr_data)} OCR items on page {page_number}")
+            
+            try:
+                layout = chunker.process_ocr_data_with_layout(page_ocr_data)
+                lines = [line['text'] for line in layout]
+                pages.append({'page_number': page_number, 'lines': lines, 'layout': layout, 'status': None})
+            except Exception as e:
+                logger.error(f"Error processing page {page_number}: {e}")
+                pages.append({'page_number': page_number, 'lines': [], 'layout': [], 'status': f'Error: {str(e)}'})
+        
+        # Step 4: Identify semantic boundaries; pages the rules resolve
+        # confidently skip the LLM, pages seen before come from the cache and
+        # the rest are packed several pages per LLM request
+        page_boundaries = [None] * len(pages)
+        boundary_sources = [None] * len(pages)
+        for i, page in enumerate(pages):
+            if len(page['lines']) < 2:
+                continue
+            if Config.CHUNKER_RULES_ENABLED:
+                page_boundaries[i] = chunker.detect_boundaries_locally(page['layout'])
+                if page_boundaries[i] is not None:
+                    boundary_sources[i] = 'rules'
+                    continue
+            page_boundaries[i] = chunker.get_cached_boundaries(page['lines'])
+            if page_boundaries[i] is not None:
+                boundary_sources[i] = 'cache'
+        
+        unresolved_lines = [page['lines'] if page_boundaries[i] is None else [] for i, page in enumerate(pages)]
+        work_units = self._plan_boundary_batches(unresolved_lines)
+        detected = self._identify_boundaries(chunker, pages, work_units)
+        for unit in work_units:
+            for i in unit:
+                boundary_sources[i] = 'llm'
+        page_boundaries = [
+            resolved if resolved is not None else boundaries
+            for resolved, boundaries in zip(page_boundaries, detected)
+        ]
+        
+        resolved_locally = boundary_sources.count('rules')
+        cache_hits = boundary_sources.count('cache')
+        logger.info(f"Boundaries: {resolved_locally} pages resolved by rules, {cache_hits} from cache, "
+                    f"{len(work_units)} LLM requests")
+        
+        # Step 5: Create chunks page by page, keeping chunk IDs in page order
+        all_chunks = []
+        page_info = []
+        
+        for page, boundaries, boundary_source in zip(pages, page_boundaries, boundary_sources):
+            page_number = page['page_number']
+            
+            if page['status']:
                 page_info.append({
                     'page_number': page_number,
                     'chunks_count': 0,
-                    'status': 'No valid OCR data',
+                    'status': page['status'],
                     'chunk_ids': []
                 })
                 continue
             
-            logger.info(f"Found {len(page_ocr_data)} OCR items on page {page_number}")
-            
-            # Process page through semantic chunker with LLM analysis
             try:
-                page_chunks = chunker.chunk_ocr_document(page_ocr_data, max_chunk_size)
+                page_chunks = chunker.create_semantic_chunks(page['lines'], boundaries, max_chunk_size)
                 
                 if page_chunks:
-                    # Adjust chunk IDs to be globally unique
-                    current_chunk_count = len(all_chunks)
+                    # Assign globally unique chunk IDs
                     chunk_ids = []
-                    
-                    for i, chunk in enumerate(page_chunks):
-                        new_chunk_id = f"C{current_chunk_count + i + 1}"
-                        chunk['chunk_id'] = new_chunk_id
+                    for chunk in page_chunks:
+                        new_chunk_id = f"C{len(all_chunks) + 1}"
                         chunk_ids.append(new_chunk_id)
-                        all_chunks.append(chunk)
+                        all_chunks.append({
+                            "chunk_id": new_chunk_id,
+                            "chunk_text": chunk['text']
+                        })
                     
                     page_info.append({
                         'page_number': page_number,
                         'chunks_count': len(page_chunks),
-                        'status': 'Success - LLM Analyzed',
+                        'status': 'Success - Rule Analyzed' if boundary_source == 'rules' else 'Success - LLM Analyzed',
+                        'boundary_source': boundary_source,
                         'chunk_ids': chunk_ids
                     })
                     
-                    logger.info(f"Created {len(page_chunks)} LLM-analyzed chunks for page {page_number}")
+                    logger.info(f"Created {len(page_chunks)} chunks for page {page_number} (boundaries: {boundary_source})")
                 else:
                     logger.warning(f"No chunks created for page {page_number}")
                     page_info.append({
                         'page_number': page_number,
                         'chunks_count': 0,
                         'status': 'No chunks created',
+                        'boundary_source': boundary_source,
                         'chunk_ids': []
                     })
                     
@@ -752,7 +1032,17 @@ class ChunkerService:
                 'llm_analysis': True,
                 'semantic_chunking': True,
                 'total_chunks_created': len(all_chunks),
-                'pages_processed': len(ocr_records)
+                'pages_processed': len(ocr_records),
+                'boundary_requests': len(work_units),
+                'max_concurrency': Config.CHUNKER_MAX_CONCURRENCY,
+                'batched_pages': Config.CHUNKER_BATCH_PAGES,
+                'rule_prepass': Config.CHUNKER_RULES_ENABLED,
+                'pages_resolved_locally': resolved_locally,
+                'boundary_cache': {
+                    'pages_from_cache': cache_hits,
+                    'pages_from_llm': sum(len(unit) for unit in work_units),
+                    'cache_stats': chunker.cache.stats()
+                }
             }
         }
 
@@ -793,7 +1083,7 @@ class ChunkerService:
         
         try:
             test_url = f"{self.django_base_url}/ocr_data/"
-            response = requests.get(test_url, timeout=10)
+            response = get_http_client().get(test_url, timeout=10)
             response.raise_for_status()
             return {
                 "status": "success",
@@ -812,7 +1102,7 @@ class ChunkerService:
     def test_openai_connection(self, api_key: str) -> Dict:
         """Test OpenAI API connection"""
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = get_openai_client(api_key)
             response = client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": "Hello, this is a test."}],
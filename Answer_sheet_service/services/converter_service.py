@@ -1,23 +1,60 @@
 import os
-import zipfile
+import io
 import threading
 import shutil
 import time
-import gc
-from pdf2image import convert_from_path
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 from PyPDF2 import PdfReader
 from config import Config
 from services.s3_service import S3Service
+from services.upload_queue import S3UploadQueue
+from services.archive_service import StreamingArchive, iter_zip_stream
+from services.job_store import get_job_store
+from services.job_scheduler import JobScheduler, QueueFullError, estimate_render_memory
+
+def _render_page_range(pdf_path, first_page, last_page, dpi, img_format, quality):
+    """
+    Rasterize and encode a range of PDF pages (runs in a worker process)
+    
+    Pages are rendered as raw PPM so poppler does not produce an intermediate
+    JPEG, and only the encoded bytes are sent back to the parent process.
+    
+    Returns:
+        list: (page_num, encoded_bytes) tuples in page order
+    """
+    pages = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        thread_count=1
+    )
+    
+    rendered = []
+    for i, page in enumerate(pages):
+        buffer = io.BytesIO()
+        if img_format == 'JPEG':
+            page.save(buffer, 'JPEG', quality=quality, optimize=True)
+        else:
+            page.save(buffer, img_format, optimize=True)
+        page.close()
+        rendered.append((first_page + i, buffer.getvalue()))
+    
+    return rendered
 
 class ConverterService:
     def __init__(self):
-        self.conversion_jobs = {}
+        self.job_store = get_job_store('conversion')
         self.s3_service = S3Service()
+        self._progress_lock = threading.Lock()
+        self.scheduler = JobScheduler(on_queue_change=self._publish_queue_positions)
     
-    def start_conversion(self, pdf_path, job_id, dpi=None, img_format=None, quality=None, upload_to_s3=True):
+    def start_conversion(self, pdf_path, job_id, dpi=None, img_format=None, quality=None, upload_to_s3=True, priority=0):
         """
-        Start PDF to images conversion in background
+        Queue PDF to images conversion on the job scheduler
         
         Args:
             pdf_path (str): Path to PDF file
@@ -26,169 +63,242 @@ class ConverterService:
             img_format (str): Output image format (JPEG/PNG)
             quality (int): JPEG quality (1-100)
             upload_to_s3 (bool): Whether to upload to S3
+            priority (int): Higher priority jobs start first
+            
+        Returns:
+            int: Position in the conversion queue
+            
+        Raises:
+            QueueFullError: If the conversion queue is full
         """
         # Use default values if not provided
         dpi = dpi or Config.DEFAULT_DPI
         img_format = img_format or Config.DEFAULT_FORMAT
         quality = quality or Config.DEFAULT_QUALITY
         
+        # Each render worker holds one batch of decoded pages at a time
+        page_count = self._get_page_count(pdf_path) or Config.BATCH_SIZE
+        resident_pages = min(page_count, Config.BATCH_SIZE * Config.CONVERSION_WORKERS)
+        memory_cost = estimate_render_memory(resident_pages, dpi)
+        
         # Initialize job
-        self.conversion_jobs[job_id] = {
+        self.job_store.evict_expired()
+        self.job_store.create(job_id, {
             'status': 'queued',
             'progress': 0,
             'pdf_path': pdf_path,
             'created_at': time.time(),
+            'priority': priority,
+            'queue_position': None,
             'upload_to_s3': upload_to_s3,
             's3_folder': f"s3://{Config.S3_BUCKET}/{job_id}/" if upload_to_s3 else None
-        }
+        })
         
-        # Start conversion in background
-        thread = threading.Thread(
-            target=self._convert_pdf_to_images,
-            args=(pdf_path, job_id, dpi, img_format, quality, upload_to_s3)
-        )
-        thread.daemon = True
-        thread.start()
+        try:
+            return self.scheduler.submit(
+                job_id,
+                self._convert_pdf_to_images,
+                args=(pdf_path, job_id, dpi, img_format, quality, upload_to_s3),
+                cost=memory_cost,
+                priority=priority
+            )
+        except QueueFullError:
+            self.job_store.delete(job_id)
+            raise
+    
+    def _publish_queue_positions(self, positions):
+        """Record the queue position of every waiting job"""
+        for job_id, position in positions.items():
+            self.job_store.update(job_id, {'queue_position': position})
     
     def _convert_pdf_to_images(self, pdf_path, job_id, dpi, img_format, quality, upload_to_s3):
         """
         Convert PDF to images efficiently in background and upload to S3
+
+        Page ranges are rasterized and encoded in a process pool. Encoded
+        pages are handed to a bounded upload queue straight from memory, so
+        rendering of one range overlaps with the upload of the previous ones
+        and pages never touch disk. Depending on ARCHIVE_MODE the ZIP_STORED
+        archive streams into an S3 multipart upload as pages arrive, or is
+        left to be built on download.
         """
         try:
-            self.conversion_jobs[job_id]['status'] = 'processing'
-            self.conversion_jobs[job_id]['progress'] = 0
-            
-            output_folder = os.path.join(Config.TEMP_DIR, f"{job_id}_images")
-            os.makedirs(output_folder, exist_ok=True)
+            self.job_store.update(job_id, {
+                'status': 'processing',
+                'progress': 0,
+                'processed_pages': 0,
+                'failed_pages': 0,
+                'queue_position': None,
+                'started_at': time.time()
+            })
             
-            # Get total page count
-            try:
-                reader = PdfReader(pdf_path)
-                total_pages = len(reader.pages)
-                self.conversion_jobs[job_id]['total_pages'] = total_pages
-            except:
-                total_pages = None
+            # Get total page count (needed to split the page range)
+            total_pages = self._get_page_count(pdf_path)
+            if not total_pages:
+                raise Exception("Could not determine PDF page count")
+            self.job_store.update(job_id, {'total_pages': total_pages})
                 
             start_time = time.time()
-            processed_pages = 0
-            page_start = 1
             s3_urls = []
             
-            while True:
-                try:
-                    # Convert batch
-                    pages = convert_from_path(
-                        pdf_path,
-                        dpi=dpi,
-                        first_page=page_start,
-                        last_page=page_start + Config.BATCH_SIZE - 1,
-                        fmt=img_format,
-                        thread_count=Config.THREAD_COUNT
-                    )
-                    
-                    if not pages:
-                        break
-                        
-                    # Save images and upload to S3
-                    for i, page in enumerate(pages):
-                        page_num = page_start + i
-                        filename = f"page_{page_num:04d}.{img_format.lower()}"
-                        filepath = os.path.join(output_folder, filename)
-                        
-                        if img_format == 'JPEG':
-                            page.save(filepath, 'JPEG', quality=quality, optimize=True)
-                            content_type = 'image/jpeg'
-                        else:
-                            page.save(filepath, img_format, optimize=True)
-                            content_type = 'image/png'
+            page_ranges = [
+                (first, min(first + Config.BATCH_SIZE - 1, total_pages))
+                for first in range(1, total_pages + 1, Config.BATCH_SIZE)
+            ]
+            render_workers = max(1, min(Config.CONVERSION_WORKERS, len(page_ranges)))
+            upload = upload_to_s3 and self.s3_service.is_configured()
+            content_type = 'image/jpeg' if img_format == 'JPEG' else 'image/png'
+            
+            archive_mode = Config.ARCHIVE_MODE
+            zip_path = None
+            zip_s3_key = None
+            archive = None
+            
+            # The ZIP (for backup/alternative download) is built as pages arrive;
+            # in lazy mode it is only built from S3 when it is downloaded
+            if upload and archive_mode == 'stream':
+                zip_s3_key = f"{job_id}/{job_id}_images.zip"
+                archive = StreamingArchive(self.s3_service, s3_key=zip_s3_key)
+            elif not upload:
+                archive_mode = 'stream'
+                zip_path = os.path.join(Config.TEMP_DIR, f"{job_id}_images.zip")
+                archive = StreamingArchive(local_path=zip_path)
+            self.job_store.update(job_id, {'archive_mode': archive_mode})
+            
+            pending_uploads = []
+            try:
+                with S3UploadQueue(self.s3_service) as upload_queue:
+                    with ProcessPoolExecutor(max_workers=render_workers) as render_pool:
+                        remaining_ranges = iter(page_ranges)
+                        in_flight = set()
                         
-                        # Upload to S3 if enabled
-                        if upload_to_s3 and self.s3_service.is_configured():
-                            try:
-                                s3_key = f"{job_id}/{filename}"
-                                s3_url = self.s3_service.upload_file(filepath, s3_key, content_type)
-                                s3_urls.append({
-                                    'page': page_num,
-                                    'filename': filename,
-                                    'url': s3_url,
-                                    's3_key': s3_key
-                                })
-                            except Exception as s3_error:
-                                print(f"S3 upload failed for {filename}: {s3_error}")
-                                # Continue processing even if S3 upload fails
+                        def submit_next_range():
+                            page_range = next(remaining_ranges, None)
+                            if page_range:
+                                first, last = page_range
+                                in_flight.add(render_pool.submit(
+                                    _render_page_range, pdf_path, first, last, dpi, img_format, quality
+                                ))
                         
-                        processed_pages += 1
+                        # One range per worker in flight, so rendering never runs further
+                        # ahead of the uploads than the admission estimate allows
+                        for _ in range(render_workers):
+                            submit_next_range()
                         
-                        if total_pages:
-                            progress = int((processed_pages / total_pages) * 90)  # 90% for processing, 10% for zip
-                            self.conversion_jobs[job_id]['progress'] = progress
-                    
-                    # Clear memory
-                    for page in pages:
-                        page.close()
-                    del pages
-                    gc.collect()
-                    
-                    page_start += Config.BATCH_SIZE
-                    
-                except Exception as e:
-                    if "Image list is empty" in str(e) or not pages:
-                        break
-                    else:
-                        raise e
+                        # Hand each rendered range to the upload stage as soon as it is ready
+                        while in_flight:
+                            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for render_future in done:
+                                in_flight.discard(render_future)
+                                for page_num, image_data in render_future.result():
+                                    filename = f"page_{page_num:04d}.{img_format.lower()}"
+                                    if archive:
+                                        archive.add(filename, image_data)
+                                    
+                                    if not upload:
+                                        self._mark_page_done(job_id, total_pages)
+                                        continue
+                                    
+                                    s3_key = f"{job_id}/{filename}"
+                                    upload_future = upload_queue.submit(image_data, s3_key, content_type)
+                                    upload_future.add_done_callback(
+                                        lambda f: self._mark_page_done(job_id, total_pages, failed=f.exception() is not None)
+                                    )
+                                    pending_uploads.append((page_num, filename, s3_key, upload_future))
+                                
+                                # The range's pages are queued now; start the next one
+                                submit_next_range()
+                            # Drop the rendered pages before waiting on the next range
+                            del done, render_future
+            except Exception:
+                if archive:
+                    archive.abort()
+                raise
+            
+            # Leaving the upload queue waits for every page upload to finish
+            for page_num, filename, s3_key, upload_future in pending_uploads:
+                try:
+                    s3_urls.append({
+                        'page': page_num,
+                        'filename': filename,
+                        'url': upload_future.result(),
+                        's3_key': s3_key
+                    })
+                except Exception as s3_error:
+                    print(f"S3 upload failed for {filename}: {s3_error}")
+                    # Continue processing even if S3 upload fails
             
-            # Update progress to 95% before creating ZIP
-            self.conversion_jobs[job_id]['progress'] = 95
+            s3_urls.sort(key=lambda entry: entry['page'])
+            processed_pages = self.job_store.get(job_id)['processed_pages']
             
-            # Create ZIP file (for backup/alternative download)
-            zip_path = os.path.join(Config.TEMP_DIR, f"{job_id}_images.zip")
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(output_folder):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        zipf.write(file_path, file)
+            # Update progress to 95% before finishing the ZIP
+            self.job_store.update(job_id, {'progress': 95})
             
-            # Upload ZIP to S3 if enabled
             zip_s3_url = None
-            if upload_to_s3 and self.s3_service.is_configured():
+            if archive:
                 try:
-                    zip_s3_key = f"{job_id}/{job_id}_images.zip"
-                    zip_s3_url = self.s3_service.upload_file(zip_path, zip_s3_key, 'application/zip')
+                    archive.close()
+                    if zip_s3_key:
+                        zip_s3_url = f"https://{self.s3_service.bucket}.s3.{self.s3_service.region}.amazonaws.com/{zip_s3_key}"
                 except Exception as s3_error:
                     print(f"S3 upload failed for ZIP: {s3_error}")
+                    archive.abort()
+                    zip_s3_key = None
             
             # Update job status
             elapsed_time = time.time() - start_time
-            self.conversion_jobs[job_id].update({
+            self.job_store.update(job_id, {
                 'status': 'completed',
                 'progress': 100,
                 'processed_pages': processed_pages,
                 'elapsed_time': round(elapsed_time, 2),
                 'zip_path': zip_path,
-                'output_folder': output_folder,
+                'zip_s3_key': zip_s3_key,
                 's3_uploaded': upload_to_s3 and len(s3_urls) > 0,
                 's3_images': s3_urls,
                 'zip_s3_url': zip_s3_url,
                 's3_folder': f"s3://{Config.S3_BUCKET}/{job_id}/" if upload_to_s3 else None
             })
             
-            # Clean up local folder (keep ZIP for local download option)
-            if os.path.exists(output_folder):
-                shutil.rmtree(output_folder)
-            
         except Exception as e:
-            self.conversion_jobs[job_id].update({
+            self.job_store.update(job_id, {
                 'status': 'error',
                 'error': str(e)
             })
-    
+
+    def _get_page_count(self, pdf_path):
+        """Get total number of pages in PDF"""
+        try:
+            reader = PdfReader(pdf_path)
+            return len(reader.pages)
+        except Exception:
+            pass
+
+        # Fall back to poppler if PyPDF2 cannot parse the file
+        try:
+            return int(pdfinfo_from_path(pdf_path)['Pages'])
+        except Exception as e:
+            print(f"Could not get page count for {pdf_path}: {e}")
+            return None
+
+    def _mark_page_done(self, job_id, total_pages, failed=False):
+        """Count a converted page (failed uploads separately); 90% of progress is for processing, 10% for the zip"""
+        if failed:
+            self.job_store.increment(job_id, 'failed_pages')
+            return
+        
+        # The lock keeps progress writes in the same order as the counter
+        with self._progress_lock:
+            processed_pages = self.job_store.increment(job_id, 'processed_pages')
+            if processed_pages is not None:
+                self.job_store.update(job_id, {'progress': int((processed_pages / total_pages) * 90)})
+
     def get_job_status(self, job_id):
         """Get job status by ID"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
         
-        job = self.conversion_jobs[job_id].copy()
-        
         # Remove sensitive file paths from response
         job.pop('pdf_path', None)
         job.pop('zip_path', None)
@@ -196,17 +306,42 @@ class ConverterService:
         
         return job
     
+    def iter_download(self, job_id):
+        """
+        Stream the images ZIP of a completed job that has no local archive
+        
+        Returns:
+            generator: ZIP bytes in chunks, or None if nothing can be served
+        """
+        job = self.job_store.get(job_id)
+        if not job or not self.s3_service.is_configured():
+            return None
+        
+        # Archive streamed to S3 during conversion
+        if job.get('zip_s3_key'):
+            return self.s3_service.iter_object(job['zip_s3_key'])
+        
+        # Lazy mode: build the archive from the uploaded pages
+        s3_images = job.get('s3_images')
+        if s3_images:
+            entries = [
+                (image['filename'], partial(self.s3_service.get_object_bytes, image['s3_key']))
+                for image in s3_images
+            ]
+            return iter_zip_stream(entries)
+        
+        return None
+    
     def get_job(self, job_id):
         """Get complete job data by ID"""
-        return self.conversion_jobs.get(job_id)
+        return self.job_store.get(job_id)
     
     def cleanup_local_files(self, job_id):
         """Clean up local files for a job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return {'success': False, 'error': 'Job not found'}
         
-        job = self.conversion_jobs[job_id]
-        
         # Clean up local files only
         pdf_path = job.get('pdf_path')
         zip_path = job.get('zip_path')
@@ -221,7 +356,7 @@ class ConverterService:
                 shutil.rmtree(output_folder)
             
             # Remove from jobs
-            del self.conversion_jobs[job_id]
+            self.job_store.delete(job_id)
             
             return {
                 'success': True,
@@ -234,11 +369,10 @@ class ConverterService:
     
     def cleanup_s3_files(self, job_id):
         """Clean up S3 files for a job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return {'success': False, 'error': 'Job not found'}
         
-        job = self.conversion_jobs[job_id]
-        
         if not job.get('s3_uploaded') or not self.s3_service.is_configured():
             return {'success': False, 'error': 'No S3 files to clean up'}
         
@@ -255,12 +389,14 @@ class ConverterService:
     def get_all_jobs_summary(self):
         """Get summary of all jobs"""
         jobs_summary = {}
-        for job_id, job in self.conversion_jobs.items():
+        for job_id, job in self.job_store.list().items():
             jobs_summary[job_id] = {
                 'status': job['status'],
                 'progress': job.get('progress', 0),
+                'queue_position': job.get('queue_position'),
                 'created_at': job.get('created_at'),
                 'processed_pages': job.get('processed_pages', 0),
+                'failed_pages': job.get('failed_pages', 0),
                 'upload_to_s3': job.get('upload_to_s3', False),
                 's3_uploaded': job.get('s3_uploaded', False),
                 's3_folder': job.get('s3_folder')
@@ -270,11 +406,10 @@ class ConverterService:
     
     def get_s3_info(self, job_id):
         """Get S3 information for a job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
         
-        job = self.conversion_jobs[job_id]
-        
         if job['status'] != 'completed':
             return {'error': 'Conversion not completed'}
         
@@ -0,0 +1,285 @@
+"""
+HTTP Client
+Shared keep-alive HTTP clients for every outbound call (Azure, Django,
+webhooks, OpenAI), with per-host concurrency limits and connection reuse stats
+"""
+
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+from config import Config
+from services.rate_limiter import per_minute
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Retried by the transport adapter for idempotent methods. 429 is left to
+# callers, which know whether to back off globally (Azure) or per job (VLM).
+ADAPTER_RETRY_STATUS_CODES = (502, 503, 504)
+
+class HostStats:
+    """
+    Per-host request counters
+
+    Combined with the urllib3 pools' connection counts they show how many
+    requests reused a kept-alive connection instead of opening a new one.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, error: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'errors': 0})
+            stats['requests'] += 1
+            if error:
+                stats['errors'] += 1
+
+    def report(self, adapter: HTTPAdapter) -> Dict[str, Dict]:
+        opened: Dict[str, int] = {}
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened[pool.host] = opened.get(pool.host, 0) + pool.num_connections
+
+        with self._lock:
+            snapshot = {host: dict(stats) for host, stats in self._stats.items()}
+
+        report = {}
+        for host, stats in snapshot.items():
+            connections = opened.get(urlsplit(f"//{host}").hostname, 0)
+            reused = max(0, stats['requests'] - connections)
+            report[host] = {
+                **stats,
+                'connections_opened': connections,
+                'connections_reused': reused,
+                'reuse_rate': round(reused / stats['requests'], 3) if stats['requests'] else 0.0
+            }
+        return report
+
+class HttpClient:
+    """
+    Keep-alive requests.Session shared by every service in the process
+
+    Connections are pooled per host and reused across requests. Each host
+    gets its own concurrency limit, so a slow endpoint cannot use up every
+    connection. The adapter retries connection errors and 502/503/504 on
+    idempotent methods with exponential backoff (honoring Retry-After).
+    POST requests are only retried when the connection could not be
+    established. Callers keep their own timeouts; the client default
+    applies when they pass none.
+    """
+
+    def __init__(self, pool_connections: int, pool_maxsize: int, max_per_host: int,
+                 max_retries: int, backoff: float, timeout: float):
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=ADAPTER_RETRY_STATUS_CODES,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.host_stats = HostStats()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        with self._slots(host):
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                self.host_stats.record(host, error=True)
+                raise
+        self.host_stats.record(host)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request('HEAD', url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.host_stats.report(self.adapter)
+
+class RetryBudget:
+    """
+    Caps the total number of retries across every request of one job
+
+    Individual requests may retry a few times, but once a job has spent its
+    budget further failures are returned immediately, so a provider outage
+    cannot stretch a large batch indefinitely.
+    """
+
+    def __init__(self, max_retries: int):
+        self.max_retries = max_retries
+        self._spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._spent >= self.max_retries:
+                return False
+            self._spent += 1
+            return True
+
+    @property
+    def spent(self) -> int:
+        return self._spent
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_retries - self._spent)
+
+class PooledHttpClient:
+    """
+    Shared requests.Session with keep-alive pooling and bounded concurrency
+
+    Every call waits for the token bucket and a concurrency slot, and 429/5xx
+    responses and connection errors are retried with exponential backoff
+    (honoring Retry-After) while the per-request and per-job budgets allow.
+    """
+
+    def __init__(self, pool_size: int, max_concurrency: int, requests_per_minute: int,
+                 max_retries: int, backoff: float, timeout: float):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.host_stats = HostStats()
+
+        self.limiter = per_minute(requests_per_minute)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def post(self, url: str, retry_budget: Optional[RetryBudget] = None,
+             timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        POST with rate limiting, pooling and retries
+
+        Returns the last response once it succeeds or retries run out.
+
+        Raises:
+            requests.exceptions.RequestException: If the final attempt fails
+                                                  without a response
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            response = None
+            error = None
+            with self.slots:
+                try:
+                    response = self.session.post(url, timeout=timeout or self.timeout, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+            self.host_stats.record(urlsplit(url).netloc, error=error is not None)
+
+            if error is None and response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+
+            if attempt >= self.max_retries or (retry_budget is not None and not retry_budget.try_spend()):
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            reason = error or f"HTTP {response.status_code}"
+            print(f"Retrying {url} in {delay:.1f}s after {reason} (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.host_stats.report(self.adapter)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Process-wide client for Azure, Django, webhook and image download calls"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                max_per_host=Config.HTTP_MAX_PER_HOST,
+                max_retries=Config.HTTP_MAX_RETRIES,
+                backoff=Config.HTTP_BACKOFF,
+                timeout=Config.HTTP_TIMEOUT
+            )
+        return _http_client
+
+_vlm_client = None
+_vlm_client_lock = threading.Lock()
+
+_openai_clients: Dict[str, object] = {}
+_openai_clients_lock = threading.Lock()
+
+def get_openai_client(api_key: str):
+    """Shared OpenAI SDK client per API key, so its connection pool outlives a single request"""
+    import openai
+
+    with _openai_clients_lock:
+        if api_key not in _openai_clients:
+            _openai_clients[api_key] = openai.OpenAI(api_key=api_key)
+        return _openai_clients[api_key]
+
+def get_vlm_client() -> PooledHttpClient:
+    """Process-wide client for the stamp VLM (OpenAI vision) calls"""
+    global _vlm_client
+    with _vlm_client_lock:
+        if _vlm_client is None:
+            _vlm_client = PooledHttpClient(
+                pool_size=Config.STAMP_VLM_MAX_CONCURRENCY,
+                max_concurrency=Config.STAMP_VLM_MAX_CONCURRENCY,
+                requests_per_minute=Config.STAMP_VLM_REQUESTS_PER_MINUTE,
+                max_retries=Config.STAMP_VLM_MAX_RETRIES,
+                backoff=Config.STAMP_VLM_BACKOFF,
+                timeout=Config.STAMP_VLM_TIMEOUT
+            )
+        return _vlm_client
+
+def get_http_stats() -> Dict[str, Dict]:
+    """Per-host request and connection reuse counters of every client created so far"""
+    stats = {}
+    if _http_client is not None:
+        stats['default'] = _http_client.stats()
+    if _vlm_client is not None:
+        stats['vlm'] = _vlm_client.stats()
+    return stats
@@ -0,0 +1,150 @@
+"""
+Image Sizing
+Fits images to Azure OCR's dimension and file-size limits in as few JPEG encodes as possible
+"""
+
+import io
+import math
+from dataclasses import dataclass
+from PIL import Image
+
+# Typical JPEG size relative to quality 85 for scanned pages, used to predict
+# the size at another quality from a single trial encode
+QUALITY_SIZE_FACTORS = {95: 1.6, 90: 1.25, 85: 1.0, 80: 0.86, 75: 0.76, 70: 0.69, 65: 0.63, 60: 0.58, 55: 0.53, 50: 0.49}
+
+TRIAL_QUALITY = 85
+PROBE_MAX_SIDE = 1500    # Trial encodes run on a copy no larger than this
+SIZE_MARGIN = 0.9        # Aim this far under the file-size limit
+
+@dataclass
+class SizedImage:
+    data: bytes
+    width: int
+    height: int
+    resized: bool
+    quality: int = None
+    encodes: int = 0
+
+def to_rgb(image):
+    """Flatten transparency onto white so the image can be saved as JPEG"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[-1])
+        return rgb_image
+    return image
+
+def encode_jpeg(image, quality, optimize=True):
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=optimize)
+    return output.getvalue()
+
+def clamp_dimensions(width, height, min_dimension, max_dimension):
+    """Scale factor that brings both sides within [min_dimension, max_dimension]"""
+    if width < min_dimension or height < min_dimension:
+        return max(min_dimension / width, min_dimension / height)
+    if width > max_dimension or height > max_dimension:
+        return min(max_dimension / width, max_dimension / height)
+    return 1.0
+
+def estimate_bytes_per_pixel(image, quality=TRIAL_QUALITY):
+    """
+    One trial encode on a reduced copy
+
+    Downscaled copies carry more detail per pixel than the full image, so
+    the estimate errs on the large side.
+    """
+    probe = image
+    longest = max(image.size)
+    if longest > PROBE_MAX_SIDE:
+        scale = PROBE_MAX_SIDE / longest
+        probe = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+                             Image.Resampling.BILINEAR)
+    size = len(encode_jpeg(probe, quality, optimize=False))
+    return size / (probe.width * probe.height)
+
+def plan_encode(width, height, bytes_per_pixel, max_file_size, min_dimension, min_quality):
+    """
+    Pick the quality and scale predicted to land just under the size limit
+
+    Prefers the highest quality that fits at full size; only when even
+    min_quality is too large does it also shrink the image.
+
+    Returns:
+        (quality, scale)
+    """
+    target = max_file_size * SIZE_MARGIN
+    base_size = bytes_per_pixel * width * height
+
+    qualities = sorted((q for q in QUALITY_SIZE_FACTORS if q >= min_quality), reverse=True)
+    for quality in qualities:
+        if base_size * QUALITY_SIZE_FACTORS[quality] / QUALITY_SIZE_FACTORS[TRIAL_QUALITY] <= target:
+            return quality, 1.0
+
+    quality = qualities[-1]
+    predicted = base_size * QUALITY_SIZE_FACTORS[quality] / QUALITY_SIZE_FACTORS[TRIAL_QUALITY]
+    scale = math.sqrt(target / predicted)
+    # Never shrink below the minimum dimension
+    scale = max(scale, min_dimension / width, min_dimension / height)
+    return quality, min(scale, 1.0)
+
+def fit_image_for_ocr(image_data, min_dimension, max_dimension, max_file_size, min_quality=50, label="image"):
+    """
+    Fit an image to OCR limits with at most one corrective re-encode
+
+    Dimensions are clamped first. If the image then still needs re-encoding,
+    one trial encode estimates bytes per pixel, the target quality and
+    dimensions are chosen from that estimate, and the result is encoded once.
+    Only if that encode still exceeds max_file_size is it shrunk by the
+    measured overshoot and encoded a second time.
+
+    Raises:
+        Exception: If the image cannot be brought under max_file_size
+    """
+    image = Image.open(io.BytesIO(image_data))
+    original_width, original_height = image.size
+    original_size = len(image_data)
+
+    print(f"Original {label} - Dimensions: {original_width}x{original_height}, Size: {original_size / (1024*1024):.2f}MB")
+
+    scale = clamp_dimensions(original_width, original_height, min_dimension, max_dimension)
+    if scale == 1.0 and original_size <= max_file_size:
+        print("Image already within acceptable limits")
+        return SizedImage(image_data, original_width, original_height, False)
+
+    width, height = int(original_width * scale), int(original_height * scale)
+    if scale != 1.0:
+        print(f"Scaling {'up' if scale > 1 else 'down'} image by factor {scale:.2f}")
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    image = to_rgb(image)
+
+    encodes = 1
+    bytes_per_pixel = estimate_bytes_per_pixel(image)
+    quality, fit_scale = plan_encode(width, height, bytes_per_pixel, max_file_size, min_dimension, min_quality)
+
+    sized = image
+    if fit_scale < 1.0:
+        width, height = int(width * fit_scale), int(height * fit_scale)
+        sized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    data = encode_jpeg(sized, quality)
+    encodes += 1
+    print(f"Predicted encode - {width}x{height}, quality {quality}: {len(data) / (1024*1024):.2f}MB")
+
+    if len(data) > max_file_size:
+        # Corrective pass: shrink by the measured overshoot, keeping the aspect ratio
+        correction = math.sqrt(max_file_size * SIZE_MARGIN / len(data))
+        correction = max(correction, min_dimension / width, min_dimension / height)
+        width, height = int(width * correction), int(height * correction)
+        data = encode_jpeg(image.resize((width, height), Image.Resampling.LANCZOS), quality)
+        encodes += 1
+        print(f"Corrective encode - {width}x{height}, quality {quality}: {len(data) / (1024*1024):.2f}MB")
+
+        if len(data) > max_file_size:
+            raise Exception(f"Unable to reduce image size below {max_file_size / (1024*1024):.0f}MB limit. "
+                            f"Final size: {len(data) / (1024*1024):.2f}MB")
+
+    print(f"Final {label} - Dimensions: {width}x{height}, Size: {len(data) / (1024*1024):.2f}MB, "
+          f"Quality: {quality}, Encodes: {encodes}")
+    return SizedImage(data, width, height, True, quality, encodes)
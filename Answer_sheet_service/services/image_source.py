@@ -0,0 +1,156 @@
+"""
+Image Source
+Reads answer-sheet page images straight from S3 (HTTP only for non-S3 URLs),
+with parallel ranged GETs for large objects and read-ahead prefetching
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from botocore.exceptions import ClientError
+from config import Config
+from services.http_client import get_http_client
+from services.s3_service import S3Service
+
+NOT_FOUND_S3_ERRORS = {'404', 'NoSuchKey', 'NoSuchBucket'}
+DENIED_S3_ERRORS = {'403', 'AccessDenied'}
+
+class ImageSourceError(Exception):
+    """A page image could not be read"""
+
+@dataclass
+class ImageLocation:
+    url: str
+    bucket: Optional[str] = None
+    key: Optional[str] = None
+
+    @property
+    def is_s3(self) -> bool:
+        return self.key is not None
+
+class ImageSource:
+    """
+    Resolves an image URL once and reads it over a single path
+
+    S3 URLs are read with the shared pooled S3 client, with no HTTP
+    download first and no HTTP fallback when the object is missing. The
+    one exception is AccessDenied: a presigned or public URL may still be
+    readable when our credentials are not allowed. Objects of at least
+    OCR_S3_RANGE_THRESHOLD bytes are fetched as concurrent ranged GETs.
+    """
+
+    def __init__(self, s3_service: Optional[S3Service] = None):
+        self.s3_service = s3_service or S3Service()
+        self.http = get_http_client()
+        self.range_pool = ThreadPoolExecutor(max_workers=Config.OCR_S3_RANGE_WORKERS)
+
+    def resolve(self, url: str) -> ImageLocation:
+        if self.s3_service.is_configured():
+            parsed = self.s3_service.parse_s3_url(url)
+            if parsed is not None:
+                return ImageLocation(url, parsed[0], parsed[1])
+        return ImageLocation(url)
+
+    def stat(self, location: ImageLocation) -> Dict:
+        """
+        ETag and size of an S3 object (one HEAD request); empty for HTTP URLs
+
+        Raises:
+            ImageSourceError: If the object does not exist
+        """
+        if not location.is_s3:
+            return {}
+        try:
+            response = self.s3_service.client.head_object(Bucket=location.bucket, Key=location.key)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in NOT_FOUND_S3_ERRORS:
+                raise ImageSourceError(f"File not found in S3: {location.bucket}/{location.key}")
+            if code in DENIED_S3_ERRORS:
+                print(f"Access denied to S3 object {location.bucket}/{location.key}, will read it over HTTP")
+                return {'denied': True}
+            raise ImageSourceError(f"S3 error: {e}")
+        return {'etag': response['ETag'].strip('"'), 'size': response['ContentLength']}
+
+    def read(self, location: ImageLocation, info: Optional[Dict] = None) -> bytes:
+        """
+        Read the image bytes
+
+        Raises:
+            ImageSourceError: If the image cannot be read
+        """
+        info = info or {}
+        if not location.is_s3 or info.get('denied'):
+            return self._read_http(location.url)
+
+        size = info.get('size')
+        try:
+            if size and size >= Config.OCR_S3_RANGE_THRESHOLD:
+                return self._read_ranges(location, size)
+            response = self.s3_service.client.get_object(Bucket=location.bucket, Key=location.key)
+            return response['Body'].read()
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in NOT_FOUND_S3_ERRORS:
+                raise ImageSourceError(f"File not found in S3: {location.bucket}/{location.key}")
+            if code in DENIED_S3_ERRORS:
+                return self._read_http(location.url)
+            raise ImageSourceError(f"S3 error: {e}")
+
+    def _read_ranges(self, location: ImageLocation, size: int) -> bytes:
+        part_size = Config.OCR_S3_RANGE_PART_SIZE
+
+        def get_range(start):
+            end = min(start + part_size, size) - 1
+            response = self.s3_service.client.get_object(
+                Bucket=location.bucket, Key=location.key, Range=f"bytes={start}-{end}"
+            )
+            return response['Body'].read()
+
+        return b''.join(self.range_pool.map(get_range, range(0, size, part_size)))
+
+    def _read_http(self, url: str) -> bytes:
+        response = self.http.get(url, timeout=30)
+        if response.status_code != 200:
+            raise ImageSourceError(f'Failed to download image from URL: {url}. Status: {response.status_code}')
+        return response.content
+
+class Prefetcher:
+    """
+    Runs a loader over a list of items, at most `depth` items ahead of the consumer
+
+    future(i) schedules items up to i + depth and returns item i's Future, so
+    pages download while earlier ones are still in OCR, without buffering
+    the whole job in memory.
+    """
+
+    def __init__(self, loader: Callable, items: List, depth: int, workers: int):
+        self.loader = loader
+        self.items = items
+        self.depth = max(0, depth)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures: Dict[int, Future] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def future(self, index: int) -> Future:
+        with self._lock:
+            last = min(index + self.depth, len(self.items) - 1)
+            while self._next <= last:
+                self._futures[self._next] = self.executor.submit(self.loader, self.items[self._next])
+                self._next += 1
+            return self._futures.pop(index)
+
+    def close(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import threading
+import traceback
+from config import Config
+
+# A4 page size in inches, used to estimate the raster size of a page
+A4_WIDTH_IN = 8.27
+A4_HEIGHT_IN = 11.69
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue is at capacity"""
+    pass
+
+def estimate_render_memory(resident_pages, dpi):
+    """
+    Estimate peak memory for holding decoded pages at a DPI
+    
+    Args:
+        resident_pages (int): Pages decoded at the same time
+        dpi (int): Render resolution
+        
+    Returns:
+        int: Estimated bytes (RGB, 3 bytes per pixel)
+    """
+    pixels = (A4_WIDTH_IN * dpi) * (A4_HEIGHT_IN * dpi)
+    return int(pixels * 3 * max(1, resident_pages))
+
+class _ScheduledJob:
+    __slots__ = ('job_id', 'func', 'args', 'cost')
+    
+    def __init__(self, job_id, func, args, cost):
+        self.job_id = job_id
+        self.func = func
+        self.args = args
+        self.cost = cost
+
+class JobScheduler:
+    """
+    Bounded worker pool with a priority queue and memory-aware admission
+    
+    Jobs run in priority order (higher first, FIFO within a priority) on at
+    most max_concurrent worker threads. A job is only started while the
+    estimated memory of the running jobs plus its own stays within the
+    budget; a job larger than the whole budget is started once nothing else
+    is running. The head of the queue is never skipped, so large jobs are
+    not starved by smaller ones behind them.
+    """
+    
+    def __init__(self, max_concurrent=None, memory_budget=None, max_queued=None, on_queue_change=None):
+        self.max_concurrent = max_concurrent or Config.MAX_CONCURRENT_JOBS
+        self.memory_budget = memory_budget or Config.CONVERSION_MEMORY_BUDGET_MB * 1024 * 1024
+        self.max_queued = max_queued or Config.MAX_QUEUED_JOBS
+        self.on_queue_change = on_queue_change
+        
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._reserved = 0
+        self._cond = threading.Condition()
+        
+        for i in range(self.max_concurrent):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}")
+            worker.daemon = True
+            worker.start()
+    
+    def submit(self, job_id, func, args=(), cost=0, priority=0):
+        """
+        Queue a job
+        
+        Args:
+            job_id (str): Job identifier, reported in queue positions
+            func (callable): Called as func(*args) on a worker thread
+            cost (int): Estimated peak memory in bytes
+            priority (int): Higher runs first
+            
+        Returns:
+            int: 1-based position in the queue
+            
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        with self._cond:
+            if len(self._heap) >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+            
+            heapq.heappush(self._heap, (-priority, next(self._seq), _ScheduledJob(job_id, func, args, cost)))
+            positions = self._positions_locked()
+            self._cond.notify_all()
+        
+        self._publish(positions)
+        return positions[job_id]
+    
+    def _positions_locked(self):
+        return {entry[2].job_id: position for position, entry in enumerate(sorted(self._heap), 1)}
+    
+    def _publish(self, positions):
+        if self.on_queue_change:
+            try:
+                self.on_queue_change(positions)
+            except Exception as e:
+                print(f"Failed to publish queue positions: {e}")
+    
+    def _head_admissible(self):
+        if not self._heap:
+            return False
+        if self._running == 0:
+            return True
+        return self._reserved + self._heap[0][2].cost <= self.memory_budget
+    
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._head_admissible():
+                    self._cond.wait()
+                
+                job = heapq.heappop(self._heap)[2]
+                self._running += 1
+                self._reserved += job.cost
+                positions = self._positions_locked()
+            
+            self._publish(positions)
+            
+            try:
+                job.func(*job.args)
+            except Exception:
+                print(f"Scheduled job {job.job_id} failed:")
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._reserved -= job.cost
+                    self._cond.notify_all()
+    
+    def get_position(self, job_id):
+        """Return the 1-based queue position of a waiting job, or None"""
+        with self._cond:
+            return self._positions_locked().get(job_id)
+    
+    def stats(self):
+        """Current load of the scheduler"""
+        with self._cond:
+            return {
+                'running': self._running,
+                'queued': len(self._heap),
+                'max_concurrent': self.max_concurrent,
+                'max_queued': self.max_queued,
+                'reserved_memory_mb': round(self._reserved / (1024 * 1024), 1),
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1)
+            }
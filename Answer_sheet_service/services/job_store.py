@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+class MemoryJobStore:
+    """
+    In-process job store (default)
+    
+    Fast, but only visible to the worker that created the job, so it is
+    only suitable for a single-process deployment.
+    """
+    
+    def __init__(self, namespace, ttl_seconds):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._expires_at = {}
+        self._lock = threading.RLock()
+    
+    def _touch(self, job_id):
+        if self.ttl_seconds:
+            self._expires_at[job_id] = time.time() + self.ttl_seconds
+    
+    def _is_expired(self, job_id):
+        expires_at = self._expires_at.get(job_id)
+        return expires_at is not None and expires_at <= time.time()
+    
+    def create(self, job_id, data):
+        with self._lock:
+            self._jobs[job_id] = dict(data)
+            self._touch(job_id)
+    
+    def get(self, job_id):
+        with self._lock:
+            if job_id not in self._jobs or self._is_expired(job_id):
+                return None
+            return dict(self._jobs[job_id])
+    
+    def update(self, job_id, fields):
+        with self._lock:
+            if job_id not in self._jobs:
+                return False
+            self._jobs[job_id].update(fields)
+            self._touch(job_id)
+            return True
+    
+    def increment(self, job_id, field, amount=1):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job[field] = job.get(field, 0) + amount
+            self._touch(job_id)
+            return job[field]
+    
+    def delete(self, job_id):
+        with self._lock:
+            self._expires_at.pop(job_id, None)
+            return self._jobs.pop(job_id, None) is not None
+    
+    def list(self):
+        with self._lock:
+            return {
+                job_id: dict(job) for job_id, job in self._jobs.items()
+                if not self._is_expired(job_id)
+            }
+    
+    def evict_expired(self):
+        with self._lock:
+            expired = [job_id for job_id in self._jobs if self._is_expired(job_id)]
+            for job_id in expired:
+                self.delete(job_id)
+            return len(expired)
+
+class SQLiteJobStore:
+    """
+    SQLite-backed job store shared by every worker on one host
+    
+    Each job is a JSON document. Read-modify-write operations run inside
+    BEGIN IMMEDIATE transactions so concurrent workers never lose updates.
+    """
+    
+    def __init__(self, namespace, ttl_seconds, path):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._local = threading.local()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'namespace TEXT NOT NULL, job_id TEXT NOT NULL, data TEXT NOT NULL, '
+            'expires_at REAL, PRIMARY KEY (namespace, job_id))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)')
+    
+    def _connection(self):
+        """One connection per thread; autocommit so transactions are explicit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def _expires_at(self):
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+    
+    def _load(self, conn, job_id):
+        row = conn.execute(
+            'SELECT data FROM jobs WHERE namespace = ? AND job_id = ? '
+            'AND (expires_at IS NULL OR expires_at > ?)',
+            (self.namespace, job_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _modify(self, job_id, change):
+        """Apply change(job) atomically and return its result"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            job = self._load(conn, job_id)
+            if job is None:
+                conn.execute('COMMIT')
+                return None
+            result = change(job)
+            conn.execute(
+                'UPDATE jobs SET data = ?, expires_at = ? WHERE namespace = ? AND job_id = ?',
+                (json.dumps(job), self._expires_at(), self.namespace, job_id)
+            )
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def create(self, job_id, data):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO jobs (namespace, job_id, data, expires_at) VALUES (?, ?, ?, ?)',
+            (self.namespace, job_id, json.dumps(data), self._expires_at())
+        )
+    
+    def get(self, job_id):
+        return self._load(self._connection(), job_id)
+    
+    def update(self, job_id, fields):
+        return self._modify(job_id, lambda job: job.update(fields) or True) is not None
+    
+    def increment(self, job_id, field, amount=1):
+        def change(job):
+            job[field] = job.get(field, 0) + amount
+            return job[field]
+        return self._modify(job_id, change)
+    
+    def delete(self, job_id):
+        cursor = self._connection().execute(
+            'DELETE FROM jobs WHERE namespace = ? AND job_id = ?',
+            (self.namespace, job_id)
+        )
+        return cursor.rowcount > 0
+    
+    def list(self):
+        rows = self._connection().execute(
+            'SELECT job_id, data FROM jobs WHERE namespace = ? '
+            'AND (expires_at IS NULL OR expires_at > ?)',
+            (self.namespace, time.time())
+        ).fetchall()
+        return {job_id: json.loads(data) for job_id, data in rows}
+    
+    def evict_expired(self):
+        cursor = self._connection().execute(
+            'DELETE FROM jobs WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?',
+            (self.namespace, time.time())
+        )
+        return cursor.rowcount
+
+# Existence check, write and TTL refresh in one server-side step, so a job
+# deleted or expired concurrently is not recreated as a partial hash
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+if tonumber(ARGV[1]) > 0 then redis.call('EXPIRE', KEYS[1], ARGV[1]) end
+return 1
+"""
+
+_INCREMENT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local value = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if tonumber(ARGV[3]) > 0 then redis.call('EXPIRE', KEYS[1], ARGV[3]) end
+return value
+"""
+
+class RedisJobStore:
+    """
+    Redis-backed job store shared across workers and nodes
+    
+    Each job is a hash of JSON-encoded fields, so single-field updates and
+    counters (HINCRBY) are atomic on the server. Updates and counters run as
+    Lua scripts that only touch existing jobs. Keys expire via Redis TTLs.
+    """
+    
+    def __init__(self, namespace, ttl_seconds, url):
+        import redis
+        
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.client = redis.Redis.from_url(url)
+        self.prefix = f"{Config.JOB_STORE_PREFIX}:{namespace}:"
+        self._update_script = self.client.register_script(_UPDATE_SCRIPT)
+        self._increment_script = self.client.register_script(_INCREMENT_SCRIPT)
+    
+    def _key(self, job_id):
+        return f"{self.prefix}{job_id}"
+    
+    def _write(self, job_id, fields, replace=False):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        if replace:
+            pipe.delete(key)
+        pipe.hset(key, mapping={name: json.dumps(value) for name, value in fields.items()})
+        if self.ttl_seconds:
+            pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+    
+    @staticmethod
+    def _decode(raw):
+        return {
+            name.decode() if isinstance(name, bytes) else name: json.loads(value)
+            for name, value in raw.items()
+        }
+    
+    def create(self, job_id, data):
+        self._write(job_id, data, replace=True)
+    
+    def get(self, job_id):
+        raw = self.client.hgetall(self._key(job_id))
+        return self._decode(raw) if raw else None
+    
+    def update(self, job_id, fields):
+        key = self._key(job_id)
+        if not fields:
+            return bool(self.client.exists(key))
+        args = [self.ttl_seconds or 0]
+        for name, value in fields.items():
+            args.extend([name, json.dumps(value)])
+        return bool(self._update_script(keys=[key], args=args))
+    
+    def increment(self, job_id, field, amount=1):
+        return self._increment_script(keys=[self._key(job_id)], args=[field, amount, self.ttl_seconds or 0])
+    
+    def delete(self, job_id):
+        return self.client.delete(self._key(job_id)) > 0
+    
+    def list(self):
+        jobs = {}
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            raw = self.client.hgetall(key)
+            if raw:
+                jobs[key[len(self.prefix):]] = self._decode(raw)
+        return jobs
+    
+    def evict_expired(self):
+        # Redis expires keys itself
+        return 0
+
+def get_job_store(namespace):
+    """
+    Create the job store selected by JOB_STORE_BACKEND
+    
+    Args:
+        namespace (str): Separates job types sharing one backend
+        
+    Returns:
+        Job store with create/get/update/increment/delete/list/evict_expired
+    """
+    backend = Config.JOB_STORE_BACKEND.lower()
+    ttl_seconds = Config.JOB_TTL_SECONDS
+    
+    if backend == 'sqlite':
+        return SQLiteJobStore(namespace, ttl_seconds, Config.JOB_STORE_PATH)
+    if backend == 'redis':
+        return RedisJobStore(namespace, ttl_seconds, Config.JOB_STORE_REDIS_URL)
+    if backend != 'memory':
+        raise ValueError(f"Unknown JOB_STORE_BACKEND: {Config.JOB_STORE_BACKEND}")
+    
+    return MemoryJobStore(namespace, ttl_seconds)
@@ -0,0 +1,76 @@
+"""
+Line Clustering
+Groups OCR word boxes into text lines by center-y proximity
+"""
+
+from bisect import insort
+from typing import List, Dict
+
+def _median(sorted_values: List[float]) -> float:
+    """Median of an already sorted list (same arithmetic as np.median)"""
+    n = len(sorted_values)
+    mid = n // 2
+    if n % 2:
+        return sorted_values[mid]
+    return (sorted_values[mid - 1] + sorted_values[mid]) / 2
+
+def cluster_lines(items: List[Dict], y_tolerance: float) -> List[List[Dict]]:
+    """
+    Group OCR items into lines
+    
+    An item joins the line whose median center-y is closest to its own
+    center-y, within y_tolerance; ties go to the line created first. If no
+    line is close enough the item starts a new line. Lines are returned
+    ordered by median center-y, with items in insertion order.
+    
+    Items must be sorted by center_y (process_ocr_data sorts by
+    (center_y, center_x)). Because of that, a line whose median falls more
+    than y_tolerance below the current item can never be matched again and
+    is retired from the sweep, so each item is only compared against the
+    few lines still within reach instead of every line on the page. Each
+    line keeps its y-values sorted, which makes the running median O(1).
+    
+    Args:
+        items: OCR items with at least a 'center_y' key
+        y_tolerance: Maximum distance from a line's median center-y
+        
+    Returns:
+        List of line groups, each a list of items
+    """
+    groups: List[List[Dict]] = []
+    group_ys: List[List[float]] = []
+    medians: List[float] = []
+    active: List[int] = []
+    
+    for item in items:
+        y = item['center_y']
+        best_group = None
+        best_distance = float('inf')
+        still_active = []
+        
+        for index in active:
+            distance = abs(y - medians[index])
+            if distance <= y_tolerance:
+                still_active.append(index)
+                if distance < best_distance:
+                    best_group = index
+                    best_distance = distance
+            elif medians[index] > y:
+                # Only reachable with unsorted input; keep the line in play
+                still_active.append(index)
+        
+        if best_group is not None:
+            groups[best_group].append(item)
+            insort(group_ys[best_group], y)
+            medians[best_group] = _median(group_ys[best_group])
+        else:
+            groups.append([item])
+            group_ys.append([y])
+            medians.append(y)
+            still_active.append(len(groups) - 1)
+        
+        active = still_active
+    
+    # Stable sort keeps creation order for lines with equal medians
+    order = sorted(range(len(groups)), key=lambda index: medians[index])
+    return [groups[index] for index in order]
@@ -1,18 +1,32 @@
+import hashlib
 import requests
 import time
-import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image
 from config import Config
 from services.s3_service import S3Service
+from services.azure_read_engine import AzureReadError, get_read_engine
+from services.image_sizing import fit_image_for_ocr
+from services.http_client import get_http_client
+from services.image_source import ImageSource, ImageSourceError, Prefetcher
+from services.result_cache import get_result_cache, make_cache_key
+
+# Part of every OCR cache key; bump when the Read API version or the output format changes
+OCR_API_VERSION = 'v3.2'
 
 class OCRService:
     def __init__(self):
         self.subscription_key = Config.AZURE_SUBSCRIPTION_KEY
         self.endpoint = Config.AZURE_ENDPOINT
-        self.read_url = self.endpoint + "vision/v3.2/read/analyze"
+        self.read_url = self.endpoint + f"vision/{OCR_API_VERSION}/read/analyze"
         self.s3_service = S3Service()
         
+        # Shared submission/polling engine: in-flight limit and 429 backoff are process-wide
+        self.read_engine = get_read_engine(self.read_url, self.subscription_key)
+        self.http = get_http_client()
+        self.image_source = ImageSource(self.s3_service)
+        self.cache = get_result_cache('ocr') if Config.OCR_CACHE_ENABLED else None
+        
         print(f"OCR Service initialized - Endpoint: {self.endpoint}")
         print(f"Azure OCR dimension limits: {Config.MIN_DIMENSION}x{Config.MIN_DIMENSION} to {Config.MAX_DIMENSION}x{Config.MAX_DIMENSION}")
     
@@ -23,161 +37,18 @@ class OCRService:
         - File size: <= 4MB
         """
         try:
-            # Open image from bytes
-            image = Image.open(io.BytesIO(image_data))
-            original_width, original_height = image.size
-            original_size = len(image_data)
-            
-            print(f"Original image - Dimensions: {original_width}x{original_height}, Size: {original_size / (1024*1024):.2f}MB")
-            
-            # Start with original dimensions
-            new_width, new_height = original_width, original_height
-            resized = False
-            
-            # Step 1: Fix dimensions if needed
-            if original_width < Config.MIN_DIMENSION or original_height < Config.MIN_DIMENSION:
-                scale_factor = max(Config.MIN_DIMENSION / original_width, Config.MIN_DIMENSION / original_height)
-                new_width = int(original_width * scale_factor)
-                new_height = int(original_height * scale_factor)
-                resized = True
-                print(f"Scaling up image by factor {scale_factor:.2f}")
-            elif original_width > Config.MAX_DIMENSION or original_height > Config.MAX_DIMENSION:
-                scale_factor = min(Config.MAX_DIMENSION / original_width, Config.MAX_DIMENSION / original_height)
-                new_width = int(original_width * scale_factor)
-                new_height = int(original_height * scale_factor)
-                resized = True
-                print(f"Scaling down image by factor {scale_factor:.2f}")
-            
-            # Step 2: Process image and optimize file size
-            if resized or original_size > Config.MAX_FILE_SIZE:
-                # Resize image if dimensions changed
-                if resized:
-                    processed_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    print(f"Resized image dimensions: {new_width}x{new_height}")
-                else:
-                    processed_image = image
-                
-                # Convert to RGB if needed (for JPEG compatibility)
-                if processed_image.mode in ('RGBA', 'LA', 'P'):
-                    rgb_image = Image.new('RGB', processed_image.size, (255, 255, 255))
-                    if processed_image.mode == 'P':
-                        processed_image = processed_image.convert('RGBA')
-                    rgb_image.paste(processed_image, mask=processed_image.split()[-1] if processed_image.mode in ('RGBA', 'LA') else None)
-                    processed_image = rgb_image
-                
-                # Try different quality levels to get under 4MB
-                for quality in [95, 85, 75, 65, 55, 45, 35]:
-                    output = io.BytesIO()
-                    processed_image.save(output, format='JPEG', quality=quality, optimize=True)
-                    processed_data = output.getvalue()
-                    processed_size = len(processed_data)
-                    
-                    print(f"Quality {quality}: {processed_size / (1024*1024):.2f}MB")
-                    
-                    if processed_size <= Config.MAX_FILE_SIZE:
-                        print(f"Final image - Dimensions: {new_width}x{new_height}, Size: {processed_size / (1024*1024):.2f}MB, Quality: {quality}")
-                        return processed_data, new_width, new_height, True
-                
-                # If still too large, reduce dimensions further
-                print("Still too large after quality reduction, reducing dimensions...")
-                reduction_factor = 0.9
-                attempts = 0
-                max_attempts = 10
-                
-                while processed_size > Config.MAX_FILE_SIZE and attempts < max_attempts:
-                    new_width = int(new_width * reduction_factor)
-                    new_height = int(new_height * reduction_factor)
-                    
-                    # Check if dimensions are still valid
-                    if new_width < Config.MIN_DIMENSION or new_height < Config.MIN_DIMENSION:
-                        print("Cannot reduce dimensions further without going below minimum")
-                        break
-                    
-                    processed_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    
-                    # Convert to RGB if needed
-                    if processed_image.mode in ('RGBA', 'LA', 'P'):
-                        rgb_image = Image.new('RGB', processed_image.size, (255, 255, 255))
-                        if processed_image.mode == 'P':
-                            processed_image = processed_image.convert('RGBA')
-                        rgb_image.paste(processed_image, mask=processed_image.split()[-1] if processed_image.mode in ('RGBA', 'LA') else None)
-                        processed_image = rgb_image
-                    
-                    output = io.BytesIO()
-                    processed_image.save(output, format='JPEG', quality=75, optimize=True)
-                    processed_data = output.getvalue()
-                    processed_size = len(processed_data)
-                    
-                    attempts += 1
-                    print(f"Attempt {attempts}: {new_width}x{new_height}, {processed_size / (1024*1024):.2f}MB")
-                
-                if processed_size <= Config.MAX_FILE_SIZE:
-                    print(f"Final optimized image - Dimensions: {new_width}x{new_height}, Size: {processed_size / (1024*1024):.2f}MB")
-                    return processed_data, new_width, new_height, True
-                else:
-                    raise Exception(f"Unable to reduce image size below 4MB limit. Final size: {processed_size / (1024*1024):.2f}MB")
-            
-            # No processing needed
-            print("Image already within acceptable limits")
-            return image_data, original_width, original_height, False
+            sized = fit_image_for_ocr(
+                image_data,
+                min_dimension=Config.MIN_DIMENSION,
+                max_dimension=Config.MAX_DIMENSION,
+                max_file_size=Config.MAX_FILE_SIZE
+            )
+            return sized.data, sized.width, sized.height, sized.resized
             
         except Exception as e:
             print(f"Error processing image: {e}")
             raise Exception(f"Image processing failed: {str(e)}")
     
-    def download_image(self, image_url):
-        """Download image from URL (S3 or HTTP)"""
-        image_data = None
-        s3_error = None
-        
-        if 's3.amazonaws.com' in image_url:
-            print("Detected S3 URL, attempting S3 download...")
-            image_data, s3_error = self.s3_service.download_file(image_url)
-            
-            if image_data is None:
-                print(f"S3 download failed: {s3_error}")
-                print("Falling back to direct HTTP request...")
-                # Fall back to direct HTTP request
-                image_response = requests.get(image_url, timeout=30)
-                if image_response.status_code != 200:
-                    return None, f'Failed to download image from URL: {image_url}. S3 Error: {s3_error}. HTTP Status: {image_response.status_code}'
-                image_data = image_response.content
-            else:
-                print("Successfully downloaded from S3")
-        else:
-            # Regular HTTP download
-            print("Regular HTTP download...")
-            image_response = requests.get(image_url, timeout=30)
-            if image_response.status_code != 200:
-                return None, f'Failed to download image from URL: {image_url}. Status: {image_response.status_code}'
-            image_data = image_response.content
-        
-        return image_data, None
-    
-    def poll_result(self, op_url, headers, max_retries=10, retry_delay=1):
-        """Poll Azure OCR result"""
-        for attempt in range(max_retries):
-            response = requests.get(op_url, headers=headers)
-
-            if response.status_code == 429:
-                wait_time = retry_delay * (2 ** attempt)
-                print(f"Rate limited (429). Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-                continue
-
-            try:
-                result = response.json()
-            except Exception as e:
-                raise Exception(f"Failed to parse OCR response JSON: {e}")
-
-            status = result.get("status")
-            if status in ["succeeded", "failed"]:
-                return result
-
-            time.sleep(1)
-
-        raise Exception("Azure OCR polling timed out or failed after multiple retries.")
-    
     def convert_bbox_format(self, bounding_box):
         """Convert bounding box format"""
         x_coords = bounding_box[::2]
@@ -186,15 +57,72 @@ class OCRService:
         x1, y1 = max(x_coords), max(y_coords)
         return [x0, y0, x1, y1]
     
-    def extract_text_from_url(self, image_url, word_level=False):
-        """Extract text from an image URL using Azure OCR with automatic resizing"""
+    def _cache_key(self, content_id, word_level):
+        """Key for an image's OCR result: content identity plus everything that changes the output"""
+        return make_cache_key(
+            content_id, bool(word_level), OCR_API_VERSION,
+            Config.MIN_DIMENSION, Config.MAX_DIMENSION, Config.MAX_FILE_SIZE
+        )
+    
+    def _cached_result(self, key):
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached['cached'] = True
+        return cached
+    
+    def _load_page(self, image_url, word_level=False):
+        """
+        Fetch a page for OCR
+        
+        Returns {'cached_result': ...} when the OCR result is already cached,
+        otherwise {'data': image bytes, 'cache_key': key to store the result under}.
+        S3 pages are looked up by ETag before downloading, so a hit costs one
+        HEAD request instead of a download and an Azure call.
+        
+        Raises:
+            ImageSourceError: If the image cannot be read
+        """
+        location = self.image_source.resolve(image_url)
+        info = self.image_source.stat(location)
+        
+        cache_key = None
+        if self.cache is not None and info.get('etag'):
+            cache_key = self._cache_key(f"etag:{info['etag']}", word_level)
+            cached = self._cached_result(cache_key)
+            if cached is not None:
+                print(f"OCR cache hit (ETag) for {image_url}")
+                return {'cached_result': cached}
+        
+        image_data = self.image_source.read(location, info)
+        
+        if self.cache is not None and cache_key is None:
+            cache_key = self._cache_key(f"sha256:{hashlib.sha256(image_data).hexdigest()}", word_level)
+            cached = self._cached_result(cache_key)
+            if cached is not None:
+                print(f"OCR cache hit (content hash) for {image_url}")
+                return {'cached_result': cached}
+        
+        return {'data': image_data, 'cache_key': cache_key}
+    
+    def extract_text_from_url(self, image_url, word_level=False, prefetched=None):
+        """
+        Extract text from an image URL using Azure OCR with automatic resizing
+        
+        prefetched is an optional Future of _load_page for this URL, started
+        while earlier pages were still in OCR.
+        """
         try:
             print(f"Processing image from: {image_url}")
             
-            # Download image data
-            image_data, error = self.download_image(image_url)
-            if image_data is None:
-                return {'success': False, 'error': error}
+            try:
+                page = prefetched.result() if prefetched is not None else self._load_page(image_url, word_level)
+            except ImageSourceError as e:
+                return {'success': False, 'error': str(e)}
+            
+            if 'cached_result' in page:
+                return page['cached_result']
+            image_data = page['data']
+            cache_key = page['cache_key']
             
             # Resize image if necessary
             try:
@@ -212,43 +140,19 @@ class OCRService:
                     'resize_error': str(resize_error)
                 }
             
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.subscription_key,
-                "Content-Type": "application/octet-stream"
-            }
-
-            # Add retry logic for the initial POST request
-            max_retries = 10
-            retry_delay = 1
-            
-            for attempt in range(max_retries):
-                response = requests.post(self.read_url, headers=headers, data=processed_image_data)
-                
-                if response.status_code == 429:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"Rate limited (429) on initial request. Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                elif response.status_code == 202:
-                    break
-                else:
-                    return {
-                        'success': False,
-                        'error': 'Azure OCR failed',
-                        'details': response.text,
-                        'status_code': response.status_code,
-                        'resize_info': resize_info
-                    }
-            else:
-                return {
+            try:
+                result = self.read_engine.read(processed_image_data)
+            except AzureReadError as e:
+                error = {
                     'success': False,
-                    'error': 'Azure OCR failed after multiple retries',
-                    'details': 'Rate limit exceeded',
+                    'error': str(e),
                     'resize_info': resize_info
                 }
-
-            operation_url = response.headers["Operation-Location"]
-            result = self.poll_result(operation_url, headers)
+                if e.details is not None:
+                    error['details'] = e.details
+                if e.status_code is not None:
+                    error['status_code'] = e.status_code
+                return error
 
             if result["status"] != "succeeded":
                 return {
@@ -258,51 +162,60 @@ class OCRService:
                     'resize_info': resize_info
                 }
 
-            output = []
-
-            for page_result in result["analyzeResult"]["readResults"]:
-                for line in page_result["lines"]:
-                    if word_level:
-                        line_text = line["text"]
-                        if "words" in line:
-                            for idx, word in enumerate(line["words"]):
-                                output.append({
-                                    "id": idx,
-                                    "text": word["text"],
-                                    "boundingBox": self.convert_bbox_format(word["boundingBox"]),
-                                    "confidence": word.get("confidence", None),
-                                    "line_text": line_text
-                                })
-                    else:
-                        line_obj = {
-                            "text": line["text"],
-                            "boundingBox": self.convert_bbox_format(line["boundingBox"]),
-                            "confidence": None
-                        }
-                        if "words" in line:
-                            confidences = [word.get("confidence", 0) for word in line["words"] if "confidence" in word]
-                            if confidences:
-                                line_obj["confidence"] = sum(confidences) / len(confidences)
-                        output.append(line_obj)
+            output = self._format_read_result(result, word_level)
 
-            return {
+            ocr_result = {
                 "success": True, 
                 "extracted_text": output,
                 "resize_info": resize_info
             }
+            if cache_key is not None:
+                self.cache.set(cache_key, ocr_result, ttl=Config.OCR_CACHE_TTL_SECONDS)
+            return ocr_result
             
         except requests.RequestException as e:
             return {'success': False, 'error': f'Network error downloading image: {str(e)}'}
         except Exception as e:
             return {'success': False, 'error': f'OCR processing failed: {str(e)}'}
     
+    def _format_read_result(self, result, word_level=False):
+        """Flatten an Azure Read result into line (or word) objects"""
+        output = []
+
+        for page_result in result["analyzeResult"]["readResults"]:
+            for line in page_result["lines"]:
+                if word_level:
+                    line_text = line["text"]
+                    if "words" in line:
+                        for idx, word in enumerate(line["words"]):
+                            output.append({
+                                "id": idx,
+                                "text": word["text"],
+                                "boundingBox": self.convert_bbox_format(word["boundingBox"]),
+                                "confidence": word.get("confidence", None),
+                                "line_text": line_text
+                            })
+                else:
+                    line_obj = {
+                        "text": line["text"],
+                        "boundingBox": self.convert_bbox_format(line["boundingBox"]),
+                        "confidence": None
+                    }
+                    if "words" in line:
+                        confidences = [word.get("confidence", 0) for word in line["words"] if "confidence" in word]
+                        if confidences:
+                            line_obj["confidence"] = sum(confidences) / len(confidences)
+                    output.append(line_obj)
+
+        return output
+    
     def get_image_urls_from_django(self, roll_no, question_paper_uuid):
         """Fetch image URLs from Django API"""
         try:
             url = f"{Config.DJANGO_API_BASE}/roll/{roll_no}/uuid/{question_paper_uuid}/images/"
             print(f"Making request to Django API: {url}")
             
-            response = requests.get(url, timeout=30)
+            response = self.http.get(url, timeout=30)
             print(f"Django API response status: {response.status_code}")
             
             if response.status_code == 200:
@@ -346,7 +259,7 @@ class OCRService:
             try:
                 print(f"Sending webhook notification (attempt {attempt + 1}/{Config.WEBHOOK_MAX_RETRIES})")
                 
-                response = requests.post(
+                response = self.http.post(
                     Config.WEBHOOK_URL, 
                     json=data, 
                     headers=headers,
@@ -419,12 +332,27 @@ class OCRService:
             processed_count = 0
             error_count = 0
             resized_count = 0
+            cache_hits = 0
 
-            for index, image_url in images_to_process:
+            # Pages are resized and submitted concurrently; the read engine bounds
+            # in-flight Azure requests and map keeps page order. Downloads run up
+            # to OCR_PREFETCH_DEPTH pages ahead of the pages being submitted.
+            def run_ocr(position):
+                index, image_url = images_to_process[position]
                 print(f"Processing image {index + 1}/{total_images}: {image_url}")
-                
-                ocr_result = self.extract_text_from_url(image_url, word_level=word_level)
-                
+                return self.extract_text_from_url(
+                    image_url, word_level=word_level, prefetched=prefetcher.future(position)
+                )
+            
+            def load_page(entry):
+                return self._load_page(entry[1], word_level)
+            
+            workers = max(1, min(Config.OCR_SUBMIT_WORKERS, total_images))
+            with Prefetcher(load_page, images_to_process, Config.OCR_PREFETCH_DEPTH, Config.OCR_FETCH_WORKERS) as prefetcher:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    page_results = list(pool.map(run_ocr, range(total_images)))
+
+            for (index, image_url), ocr_result in zip(images_to_process, page_results):
                 result_entry = {
                     'image_index': index,
                     'image_url': image_url,
@@ -433,6 +361,8 @@ class OCRService:
                 
                 if ocr_result.get('success'):
                     processed_count += 1
+                    if ocr_result.get('cached'):
+                        cache_hits += 1
                     result_entry['status'] = 'success'
                     result_entry['text_lines_count'] = len(ocr_result.get('extracted_text', []))
                     
@@ -465,6 +395,7 @@ class OCRService:
                     'successful_ocr': processed_count,
                     'failed_ocr': error_count,
                     'images_resized': resized_count,
+                    'ocr_cache_hits': cache_hits,
                     'word_level': word_level,
                     's3_available': self.s3_service.is_configured(),
                     'status': 'completed',
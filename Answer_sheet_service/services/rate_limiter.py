@@ -0,0 +1,61 @@
+"""
+Rate Limiter
+Thread-safe token buckets shared by every request in the process
+"""
+
+import threading
+import time
+from config import Config
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens per second up to `capacity`
+    
+    acquire() blocks until enough tokens are available, so concurrent
+    callers are smoothed out to the configured rate instead of bursting
+    into the provider's rate limit.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Take `amount` tokens, waiting for the bucket to refill if needed
+        
+        Requests larger than the bucket are capped at its capacity so they
+        can still go through once the bucket is full.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
+
+def per_minute(limit: float) -> TokenBucket:
+    """Bucket allowing `limit` per minute, with up to a minute's worth in one burst"""
+    return TokenBucket(rate=limit / 60.0, capacity=limit)
+
+# OpenAI limits apply per API key, so every chunker request shares these
+OPENAI_REQUEST_LIMITER = per_minute(Config.CHUNKER_REQUESTS_PER_MINUTE)
+OPENAI_TOKEN_LIMITER = per_minute(Config.CHUNKER_TOKENS_PER_MINUTE)
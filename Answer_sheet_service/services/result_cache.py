@@ -0,0 +1,253 @@
+"""
+Result Cache
+Persistent, content-addressed cache for expensive results (LLM calls, OCR)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from config import Config
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Build a content-addressed key from JSON-serializable parts
+    
+    Any change to a part (model, prompt version, input text...) gives a new key.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SQLiteCacheBackend:
+    """
+    SQLite cache with TTL and LRU eviction
+    
+    Reads refresh an entry's last access time; once the table holds more
+    than max_entries, the least recently used entries are dropped.
+    """
+    
+    # Check the entry count every this many writes rather than on each one
+    EVICTION_INTERVAL = 100
+    
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'expires_at REAL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)')
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        
+        if row is None:
+            return None
+        
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+            return None
+        
+        conn.execute(
+            'UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?',
+            (now, namespace, key)
+        )
+        return value
+    
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[int]):
+        now = time.time()
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, value, now + ttl if ttl else None, now)
+        )
+        
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % self.EVICTION_INTERVAL == 0
+        if evict:
+            self.evict()
+    
+    def evict(self):
+        """Drop expired entries, then least recently used ones above max_entries"""
+        conn = self._connection()
+        conn.execute('DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),))
+        
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM cache WHERE rowid IN '
+                '(SELECT rowid FROM cache ORDER BY last_access ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+    
+    def count(self, namespace: str) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace = ?', (namespace,)
+        ).fetchone()[0]
+
+class RedisCacheBackend:
+    """
+    Redis cache shared across workers and nodes
+    
+    Entries expire through Redis TTLs; LRU eviction is left to the server's
+    maxmemory-policy (allkeys-lru or volatile-lru).
+    """
+    
+    def __init__(self, url: str, prefix: str):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+    
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+    
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        value = self.client.get(self._key(namespace, key))
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+    
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[int]):
+        self.client.set(self._key(namespace, key), value, ex=ttl or None)
+    
+    def evict(self):
+        pass
+    
+    def count(self, namespace: str) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}:{namespace}:*"))
+
+class ResultCache:
+    """
+    JSON value cache for one namespace, with hit/miss counters
+    
+    Cache failures are never fatal: a broken backend behaves like a miss.
+    """
+    
+    def __init__(self, namespace: str, backend, ttl: Optional[int]):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+    
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss"""
+        if self.backend is None:
+            return None
+        
+        try:
+            raw = self.backend.get(self.namespace, key)
+            value = json.loads(raw) if raw is not None else None
+        except Exception as e:
+            print(f"Result cache read failed ({self.namespace}): {e}")
+            self._count('errors')
+            raw = value = None
+        
+        if raw is None:
+            self._count('misses')
+            return None
+        
+        self._count('hits')
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Store a JSON-serializable value"""
+        if self.backend is None:
+            return
+        
+        try:
+            self.backend.set(self.namespace, key, json.dumps(value), ttl or self.ttl)
+        except Exception as e:
+            print(f"Result cache write failed ({self.namespace}): {e}")
+            self._count('errors')
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since process start"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': Config.RESULT_CACHE_BACKEND if self.backend else 'none',
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+        
+        if self.backend is not None:
+            try:
+                stats['entries'] = self.backend.count(self.namespace)
+            except Exception:
+                stats['entries'] = None
+        
+        return stats
+
+_backend = None
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+def _create_backend():
+    backend = Config.RESULT_CACHE_BACKEND.lower()
+    if backend == 'none':
+        return None
+    if backend == 'redis':
+        return RedisCacheBackend(Config.RESULT_CACHE_REDIS_URL, Config.RESULT_CACHE_PREFIX)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown RESULT_CACHE_BACKEND: {Config.RESULT_CACHE_BACKEND}")
+    return SQLiteCacheBackend(Config.RESULT_CACHE_PATH, Config.RESULT_CACHE_MAX_ENTRIES)
+
+def get_result_cache(namespace: str) -> ResultCache:
+    """
+    Return the process-wide cache for a namespace
+    
+    Caches are shared so their hit/miss counters cover every request.
+    If the backend cannot be opened, caching is disabled instead of failing.
+    """
+    global _backend
+    
+    with _caches_lock:
+        if namespace not in _caches:
+            if _backend is None:
+                try:
+                    _backend = _create_backend()
+                except Exception as e:
+                    print(f"Result cache unavailable, caching disabled: {e}")
+            _caches[namespace] = ResultCache(namespace, _backend, Config.RESULT_CACHE_TTL_SECONDS)
+        return _caches[namespace]
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every cache namespace used so far"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
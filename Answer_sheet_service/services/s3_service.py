@@ -1,23 +1,51 @@
+import io
+import random
+import threading
+import time
+from urllib.parse import unquote, urlsplit
 import boto3
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
 from config import Config
 
+# Errors that will not succeed on retry
+NON_RETRYABLE_S3_ERRORS = {'AccessDenied', 'NoSuchBucket', 'InvalidAccessKeyId', 'SignatureDoesNotMatch'}
+
+# boto3 clients are thread-safe, so every S3Service shares one pooled client
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def _get_shared_client():
+    """Create the process-wide S3 client on first use"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = boto3.client(
+                's3',
+                aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+                region_name=Config.AWS_REGION,
+                config=BotoConfig(max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS)
+            )
+        return _shared_client
+
 class S3Service:
     def __init__(self):
         self.client = None
         self.bucket = Config.S3_BUCKET
         self.region = Config.AWS_REGION
+        self.transfer_config = TransferConfig(
+            multipart_threshold=Config.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=Config.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=Config.S3_MULTIPART_CONCURRENCY
+        )
         self._initialize_client()
     
     def _initialize_client(self):
         """Initialize S3 client"""
         try:
-            self.client = boto3.client(
-                's3',
-                aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-                region_name=Config.AWS_REGION
-            )
+            self.client = _get_shared_client()
             print(f"S3 client initialized for bucket: {Config.S3_BUCKET}")
         except Exception as e:
             print(f"Warning: S3 client initialization failed: {e}")
@@ -56,6 +84,62 @@ class S3Service:
         except ClientError as e:
             raise Exception(f"S3 upload failed: {e}")
     
+    def upload_bytes(self, data, s3_key, content_type='image/jpeg'):
+        """
+        Upload an in-memory buffer to S3, retrying with backoff
+        
+        Small objects go up in a single PUT; anything above
+        S3_MULTIPART_THRESHOLD uses a concurrent multipart transfer.
+        
+        Args:
+            data (bytes): Object content
+            s3_key (str): S3 object key
+            content_type (str): MIME type of the object
+            
+        Returns:
+            str: S3 URL of uploaded object
+            
+        Raises:
+            Exception: If upload fails after all retries or client not initialized
+        """
+        if not self.client:
+            raise Exception("S3 client not initialized")
+        
+        attempts = Config.S3_UPLOAD_MAX_RETRIES + 1
+        last_error = None
+        
+        for attempt in range(attempts):
+            try:
+                if len(data) < Config.S3_MULTIPART_THRESHOLD:
+                    self.client.put_object(
+                        Bucket=self.bucket,
+                        Key=s3_key,
+                        Body=data,
+                        ContentType=content_type
+                    )
+                else:
+                    self.client.upload_fileobj(
+                        io.BytesIO(data),
+                        self.bucket,
+                        s3_key,
+                        ExtraArgs={'ContentType': content_type},
+                        Config=self.transfer_config
+                    )
+                return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{s3_key}"
+            except ClientError as e:
+                if e.response['Error']['Code'] in NON_RETRYABLE_S3_ERRORS:
+                    raise Exception(f"S3 upload failed: {e}")
+                last_error = e
+            except BotoCoreError as e:
+                last_error = e
+            
+            if attempt < attempts - 1:
+                # Exponential backoff with jitter
+                delay = Config.S3_UPLOAD_BACKOFF * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, Config.S3_UPLOAD_BACKOFF))
+        
+        raise Exception(f"S3 upload failed after {attempts} attempts: {last_error}")
+    
     def delete_objects(self, job_id):
         """
         Delete all objects in a job folder
@@ -109,24 +193,40 @@ class S3Service:
         except Exception as e:
             raise Exception(f"S3 cleanup failed: {str(e)}")
     
+    def parse_s3_url(self, s3_url):
+        """
+        Split an S3 object URL into (bucket, key); None if it is not an S3 URL
+        
+        Handles s3://bucket/key, virtual-hosted (bucket.s3[.region].amazonaws.com/key)
+        and path-style (s3[.region].amazonaws.com/bucket/key) URLs. Query strings
+        (e.g. presigned URL signatures) are ignored.
+        """
+        parsed = urlsplit(s3_url)
+        path = unquote(parsed.path.lstrip('/'))
+        if parsed.scheme == 's3':
+            return (parsed.netloc, path) if parsed.netloc and path else None
+        
+        host = parsed.hostname or ''
+        if not host.endswith('.amazonaws.com'):
+            return None
+        if '.s3.' in host or '.s3-' in host:
+            bucket = host.split('.s3.')[0] if '.s3.' in host else host.split('.s3-')[0]
+            return (bucket, path) if path else None
+        if host.startswith(('s3.', 's3-')) and '/' in path:
+            bucket, key = path.split('/', 1)
+            return (bucket, key) if key else None
+        return None
+    
     def download_file(self, s3_url):
         """Download a file from S3 given its URL"""
         if not self.client:
             return None, "S3 client not initialized"
         
         try:
-            # Parse S3 URL to extract bucket and key
-            if '.s3.amazonaws.com/' in s3_url:
-                parts = s3_url.split('.s3.amazonaws.com/')
-                bucket_name = parts[0].split('https://')[-1]
-                key = parts[1]
-            elif '.s3.' in s3_url and '.amazonaws.com/' in s3_url:
-                # Regional S3 URL format
-                parts = s3_url.split('.amazonaws.com/')
-                bucket_name = parts[0].split('https://')[-1].split('.s3.')[0]
-                key = parts[1]
-            else:
+            location = self.parse_s3_url(s3_url)
+            if location is None:
                 return None, f"Unrecognized S3 URL format: {s3_url}"
+            bucket_name, key = location
             
             print(f"Downloading from S3 - Bucket: {bucket_name}, Key: {key}")
             
@@ -145,6 +245,26 @@ class S3Service:
         except Exception as e:
             return None, f"Error downloading from S3: {str(e)}"
     
+    def get_object_bytes(self, s3_key):
+        """Read an object from the configured bucket"""
+        if not self.client:
+            raise Exception("S3 client not initialized")
+        
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=s3_key)
+            return response['Body'].read()
+        except ClientError as e:
+            raise Exception(f"S3 download failed for {s3_key}: {e}")
+    
+    def iter_object(self, s3_key, chunk_size=1024 * 1024):
+        """Yield an object from the configured bucket in chunks without buffering it whole"""
+        if not self.client:
+            raise Exception("S3 client not initialized")
+        
+        response = self.client.get_object(Bucket=self.bucket, Key=s3_key)
+        for chunk in response['Body'].iter_chunks(chunk_size):
+            yield chunk
+    
     def get_config_info(self):
         """Get S3 configuration information"""
         return {
@@ -0,0 +1,89 @@
+"""
+Stamp Checkpoint Store
+Per-page stamp detection results, so re-runs of a job only redo changed pages
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import Config
+
+def settings_fingerprint(**settings) -> str:
+    """Hash of the settings a page result depends on; results from other settings are not reused"""
+    encoded = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+class StampCheckpointStore:
+    """
+    SQLite store of finished page results keyed by (job_id, page key)
+
+    Each row records the page's S3 ETag and the settings fingerprint it was
+    processed with, so a checkpoint is only reused while both still match.
+    Writes happen as each page finishes, from any worker thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self.path = path or Config.STAMP_CHECKPOINT_PATH
+        self.ttl_seconds = Config.STAMP_CHECKPOINT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS page_checkpoints ('
+            'job_id TEXT NOT NULL, page_key TEXT NOT NULL, etag TEXT NOT NULL, '
+            'fingerprint TEXT NOT NULL, result TEXT NOT NULL, updated_at REAL NOT NULL, '
+            'PRIMARY KEY (job_id, page_key))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS page_checkpoints_updated_at ON page_checkpoints (updated_at)')
+
+    def _connection(self):
+        """One connection per thread; autocommit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def load(self, job_id: str, fingerprint: str) -> Dict[str, Dict]:
+        """
+        Checkpointed page results of a job that were produced with these settings
+
+        Returns:
+            {page_key: {'etag': ..., 'result': ...}}
+        """
+        min_updated = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        rows = self._connection().execute(
+            'SELECT page_key, etag, result FROM page_checkpoints '
+            'WHERE job_id = ? AND fingerprint = ? AND updated_at > ?',
+            (job_id, fingerprint, min_updated)
+        ).fetchall()
+        return {page_key: {'etag': etag, 'result': json.loads(result)} for page_key, etag, result in rows}
+
+    def save(self, job_id: str, page_key: str, etag: str, fingerprint: str, result: Dict):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO page_checkpoints '
+            '(job_id, page_key, etag, fingerprint, result, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, page_key, etag, fingerprint, json.dumps(result), time.time())
+        )
+
+    def delete_job(self, job_id: str) -> int:
+        """Drop every checkpoint of a job; returns the number of pages removed"""
+        cursor = self._connection().execute('DELETE FROM page_checkpoints WHERE job_id = ?', (job_id,))
+        return cursor.rowcount
+
+    def evict_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        cursor = self._connection().execute(
+            'DELETE FROM page_checkpoints WHERE updated_at <= ?', (time.time() - self.ttl_seconds,)
+        )
+        return cursor.rowcount
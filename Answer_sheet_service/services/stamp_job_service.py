@@ -0,0 +1,165 @@
+"""
+Stamp Job Service
+Runs stamp processing jobs in the background and tracks their progress
+"""
+
+import time
+import uuid
+import traceback
+from typing import Dict, Optional
+from config import Config
+from services.job_store import get_job_store
+from services.job_scheduler import JobScheduler, QueueFullError
+
+class StampJobService:
+    """
+    Background mode for StampService.process_job
+
+    Jobs are queued on a JobScheduler and their status and progress live in
+    the job store, so any worker can answer status and event-stream
+    requests. process_job still sends the completion (or error) webhook.
+    """
+
+    def __init__(self, stamp_service):
+        self.stamp_service = stamp_service
+        self.job_store = get_job_store('stamp')
+        self.scheduler = JobScheduler(
+            max_concurrent=Config.STAMP_MAX_CONCURRENT_JOBS,
+            max_queued=Config.MAX_QUEUED_JOBS,
+            on_queue_change=self._publish_queue_positions
+        )
+
+    def start_job(self, job_id: str, webhook_url: Optional[str] = None, crop_percentage: float = 0.2,
+                  institution_id: Optional[str] = None, priority: int = 0) -> Dict:
+        """
+        Queue a stamp processing job
+
+        Returns:
+            The new task record
+
+        Raises:
+            QueueFullError: If the job queue is full
+        """
+        task_id = str(uuid.uuid4())
+        self.job_store.evict_expired()
+        self.job_store.create(task_id, {
+            'task_id': task_id,
+            'job_id': job_id,
+            'status': 'queued',
+            'queue_position': None,
+            'priority': priority,
+            'created_at': time.time(),
+            'total_pages': None,
+            'pages_done': 0,
+            'pages_done_at_start': 0,
+            'stamps_found': 0,
+            'eta_seconds': None
+        })
+
+        try:
+            position = self.scheduler.submit(
+                task_id,
+                self._run_job,
+                args=(task_id, job_id, webhook_url, crop_percentage, institution_id),
+                priority=priority
+            )
+        except QueueFullError:
+            self.job_store.delete(task_id)
+            raise
+
+        task = self.job_store.get(task_id)
+        task['queue_position'] = position
+        return task
+
+    def _publish_queue_positions(self, positions):
+        """Record the queue position of every waiting job"""
+        for task_id, position in positions.items():
+            self.job_store.update(task_id, {'queue_position': position})
+
+    def _run_job(self, task_id: str, job_id: str, webhook_url: Optional[str], crop_percentage: float,
+                 institution_id: Optional[str]):
+        started_at = time.time()
+        self.job_store.update(task_id, {'status': 'processing', 'queue_position': None, 'started_at': started_at})
+
+        def on_progress(event: str, data: Dict):
+            try:
+                if event == 'started':
+                    self.job_store.update(task_id, {
+                        'total_pages': data['total_pages'],
+                        'pages_done': data['pages_done'],
+                        'pages_done_at_start': data['pages_done'],
+                        'stamps_found': data['stamps_found']
+                    })
+                elif event == 'page':
+                    if data['stamps_detected']:
+                        self.job_store.increment(task_id, 'stamps_found', data['stamps_detected'])
+                    pages_done = self.job_store.increment(task_id, 'pages_done')
+                    self._update_eta(task_id, pages_done, started_at)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not record progress for task {task_id}: {e}")
+
+        try:
+            result = self.stamp_service.process_job(
+                job_id=job_id,
+                webhook_url=webhook_url,
+                crop_percentage=crop_percentage,
+                institution_id=institution_id,
+                progress_callback=on_progress
+            )
+            self.job_store.update(task_id, {
+                'status': 'completed',
+                'eta_seconds': 0,
+                'finished_at': time.time(),
+                'result': result
+            })
+            print(f"🎉 Background processing completed for job: {job_id} (task {task_id})")
+        except Exception as e:
+            print(f"❌ Background processing failed for job: {job_id} (task {task_id}) - Error: {str(e)}")
+            print(traceback.format_exc())
+            error_response = self.stamp_service.create_error_response(job_id, str(e), webhook_url)
+            self.job_store.update(task_id, {
+                'status': 'failed',
+                'error': str(e),
+                'finished_at': time.time(),
+                'result': error_response
+            })
+
+    def _update_eta(self, task_id: str, pages_done: int, started_at: float):
+        """Estimate the remaining time from this run's page rate (checkpointed pages are free)"""
+        task = self.job_store.get(task_id)
+        if not task or not task.get('total_pages'):
+            return
+        processed = pages_done - task.get('pages_done_at_start', 0)
+        if processed <= 0:
+            return
+        seconds_per_page = (time.time() - started_at) / processed
+        remaining = max(0, task['total_pages'] - pages_done)
+        self.job_store.update(task_id, {'eta_seconds': round(seconds_per_page * remaining, 1)})
+
+    def get_task(self, task_id: str, include_result: bool = True) -> Optional[Dict]:
+        task = self.job_store.get(task_id)
+        if task is None:
+            return None
+        if not include_result:
+            task.pop('result', None)
+        if task.get('total_pages'):
+            task['progress'] = int(task['pages_done'] / task['total_pages'] * 100)
+        return task
+
+    def progress_event(self, task_id: str) -> Optional[Dict]:
+        """Compact progress snapshot for the event stream"""
+        task = self.get_task(task_id, include_result=False)
+        if task is None:
+            return None
+        return {
+            'task_id': task_id,
+            'job_id': task['job_id'],
+            'status': task['status'],
+            'queue_position': task.get('queue_position'),
+            'pages_done': task['pages_done'],
+            'total_pages': task['total_pages'],
+            'stamps_found': task['stamps_found'],
+            'progress': task.get('progress', 0),
+            'eta_seconds': task.get('eta_seconds'),
+            'error': task.get('error')
+        }
@@ -2,21 +2,90 @@ import cv2
 import os
 import shutil
 import numpy as np
-from PIL import Image
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Iterator, Union, Callable
+from functools import partial
 import base64
 import requests
 import json
-import io
+import re
 import tempfile
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import uuid
 import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 from config import Config
+from services.stamp_template_registry import get_template_registry
+from services.http_client import RetryBudget, get_http_client, get_vlm_client
+from services.stamp_checkpoint_store import StampCheckpointStore, settings_fingerprint
+
+ROLL_NUMBER_PROMPT = """Analyze this image carefully to find a student's roll number or identification number.
+
+Look for:
+1. Any text that says "Roll No", "Roll Number", "Student ID", "ID No", "Registration No", etc.
+2. Numeric sequences that appear to be student identifiers (usually 4-10 digits)
+3. Numbers written in boxes, forms, or answer sheets
+4. Any handwritten or printed numbers that could be a student ID
+
+Common formats to look for:
+- Simple numbers: 12345, 2023001234
+- Numbers with prefixes: S12345, 2023/1234
+- Numbers in formats like: 21BCE1234, CSE001, etc.
+
+Please examine the entire image thoroughly. If you find any number that could be a student identifier, respond with ONLY that number (remove any prefixes or special characters, just the digits).
+
+If you cannot find any student identification number, respond with 'NOT_FOUND'.
+
+Examples of good responses: "12345", "2023001234", "1234"
+Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
+
+MULTI_STAMP_PROMPT = """You are given {count} images. Each one is a stamp cropped from the same answer sheet page. For every image, find the student's roll number or identification number.
+
+Look for text such as "Roll No", "Roll Number", "Student ID" or "Registration No", and for numeric sequences (usually 4-10 digits) written in boxes or by hand.
+
+Respond with ONLY a JSON array of {count} strings, one per image in the order given. Each string holds just the digits of the roll number, or "NOT_FOUND" if that image has none.
+
+Example for 3 images: ["12345", "NOT_FOUND", "12345"]"""
+
+class VlmUsage:
+    """
+    VLM requests sent for one page, and how many of them got no answer
+
+    A "NOT_FOUND" reply is an answer; a failed request, an error response
+    or a missing API key is not. Pages with failures are not checkpointed,
+    so a re-run retries them.
+    """
 
-class StampService:
     def __init__(self):
+        self.requests = 0
+        self.failures = 0
+
+    def count_request(self):
+        self.requests += 1
+
+    def count_failure(self):
+        self.failures += 1
+
+    @property
+    def complete(self) -> bool:
+        return self.failures == 0
+
+# Per-process detector used by the detection pool workers
+_worker_service = None
+
+def _init_detection_worker():
+    """Pool initializer: one single-threaded OpenCV detector per process"""
+    global _worker_service
+    cv2.setNumThreads(1)
+    _worker_service = StampService(use_s3=False)
+
+def _detect_page_in_worker(image_path: str, crop_percentage: float, image_data: Optional[bytes] = None,
+                           institution_id: Optional[str] = None):
+    """Detect stamps on one page (runs in a worker process)"""
+    return _worker_service.detect_and_cut(image_path, crop_percentage, image_data, institution_id)
+
+class StampService:
+    def __init__(self, use_s3: bool = True):
         # Configuration
         self.max_content_length = Config.MAX_CONTENT_LENGTH
         self.temp_folder = Config.TEMP_DIR
@@ -28,22 +97,32 @@ class StampService:
         self.openai_api_key = os.environ.get('OPENAI_API_KEY', 'sk-proj-YOUR_ACTUAL_API_KEY_HERE')
         self.openai_api_url = "https://api.openai.com/v1/chat/completions"
         
+        # Shared keep-alive pool, rate limit and retries for VLM calls
+        self.http_client = get_vlm_client()
+        
         # S3 Configuration
         self.s3_bucket_name = Config.S3_BUCKET or "transgrade-answersheet-images"
         
-        # Initialize S3 client
-        try:
-            self.s3_client = boto3.client('s3')
-            print("✅ S3 client initialized successfully")
-        except Exception as e:
-            print(f"❌ Error initializing S3 client: {e}")
-            self.s3_client = None
+        # Initialize S3 client (detection workers do not need one)
+        self.s3_client = None
+        if use_s3:
+            try:
+                self.s3_client = boto3.client('s3')
+                print("✅ S3 client initialized successfully")
+            except Exception as e:
+                print(f"❌ Error initializing S3 client: {e}")
         
         # Allowed file extensions
         self.allowed_extensions = {'png', 'jpg', 'jpeg', 'bmp', 'tiff', 'tif'}
         
         # Default webhook URL - use the stamp-specific webhook URL from config
         self.default_webhook_url = Config.STAMP_WEBHOOK_URL
+        
+        # Per-institution stamp templates with precomputed ORB descriptors
+        self.template_registry = get_template_registry()
+        
+        # Finished pages are checkpointed so re-runs only redo new or changed pages
+        self.checkpoint_store = StampCheckpointStore() if use_s3 and Config.STAMP_CHECKPOINT_ENABLED else None
 
     def is_openai_configured(self) -> bool:
         """Check if OpenAI API is properly configured"""
@@ -76,9 +155,14 @@ class StampService:
     # ---------------------------
     # Utility Functions
     # ---------------------------
-    def load_and_preprocess(self, path: str, width=1200, do_clahe=False):
-        """Load and preprocess image"""
-        img = cv2.imread(path)
+    def load_and_preprocess(self, path: Union[str, bytes], width=1200, do_clahe=False):
+        """Load and preprocess image from a file path or encoded image bytes"""
+        if isinstance(path, (bytes, bytearray)):
+            img = cv2.imdecode(np.frombuffer(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Could not decode image bytes")
+        else:
+            img = cv2.imread(path)
         if img is None:
             raise FileNotFoundError(path)
         h, w = img.shape[:2]
@@ -94,6 +178,30 @@ class StampService:
             img = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
         return img
 
+    def load_thumbnail(self, path: Union[str, bytes], width=200):
+        """
+        Load a small version of an image for pre-screening
+        
+        IMREAD_REDUCED_COLOR_8 lets libjpeg decode JPEGs at 1/8 scale in the
+        DCT domain, so the full-resolution page is never materialized.
+        """
+        if isinstance(path, (bytes, bytearray)):
+            img = cv2.imdecode(np.frombuffer(path, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_8)
+        else:
+            img = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)
+        if img is None:
+            raise FileNotFoundError(path if isinstance(path, str) else "image bytes")
+        h, w = img.shape[:2]
+        if w > width:
+            img = cv2.resize(img, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+        return img
+
+    def prescreen_red_ratio(self, path: Union[str, bytes]) -> float:
+        """Share of red pixels on a thumbnail of the page"""
+        thumb = self.load_thumbnail(path, width=Config.STAMP_PRESCREEN_WIDTH)
+        mask = self.red_mask_from_hsv(self.to_hsv(thumb), s_thresh=80, v_thresh=60)
+        return float(np.count_nonzero(mask)) / max(1, mask.size)
+
     def to_hsv(self, img):
         """Convert BGR to HSV"""
         return cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
@@ -233,15 +341,85 @@ class StampService:
         return inter / union if union>0 else 0
 
     def nms(self, boxes: List[Tuple[int,int,int,int]], scores: List[float], iou_thresh=0.3):
-        """Non-Maximum Suppression"""
-        idxs = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        """Non-Maximum Suppression (each kept box is tested against all remaining boxes at once)"""
+        if not boxes:
+            return []
+        b = np.asarray(boxes, dtype=np.float64)
+        x1, y1 = b[:, 0], b[:, 1]
+        x2, y2 = x1 + b[:, 2], y1 + b[:, 3]
+        areas = b[:, 2] * b[:, 3]
+        order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')
         keep = []
-        while idxs:
-            i = idxs.pop(0)
-            keep.append(i)
-            idxs = [j for j in idxs if self.iou(boxes[i], boxes[j]) < iou_thresh]
+        while order.size:
+            i = order[0]
+            keep.append(int(i))
+            rest = order[1:]
+            inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+            inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+            inter = inter_w * inter_h
+            union = areas[i] + areas[rest] - inter
+            iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            order = rest[iou < iou_thresh]
         return keep
 
+    def rect_densities(self, mask, boxes: np.ndarray) -> np.ndarray:
+        """
+        Share of non-zero mask pixels inside each (x, y, w, h) box
+        
+        One integral image of the page answers every box in O(1), instead
+        of counting pixels crop by crop.
+        """
+        integral = cv2.integral((mask > 0).astype(np.uint8), sdepth=cv2.CV_32S)
+        x1, y1 = boxes[:, 0], boxes[:, 1]
+        x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        return sums / np.maximum(1, boxes[:, 2] * boxes[:, 3])
+
+    def score_candidates(self, img, hsv, gray, candidates, template_img: Optional[np.ndarray] = None,
+                         institution_id: Optional[str] = None):
+        """
+        Score all stamp candidates of a page at once
+        
+        Red ratio and edge densities come from whole-page masks summed over
+        each candidate's bounding box, so a page with many red-ink
+        candidates costs the same few full-page passes as a page with one.
+        
+        Template scores come from the institution's registered templates
+        when there are any, otherwise from template_img.
+        
+        Returns:
+            (boxes, scores) for the candidates with a usable rectangle
+        """
+        candidates = [(cnt, props) for cnt, props in candidates if min(props['rect'][1]) > 0]
+        if not candidates:
+            return [], []
+        
+        h_img, w_img = img.shape[:2]
+        boxes = np.array([props['bbox'] for _, props in candidates], dtype=np.int64)
+        boxes[:, 2] = np.minimum(boxes[:, 2], w_img - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], h_img - boxes[:, 1])
+        
+        red_ratio = self.rect_densities(self.red_mask_from_hsv(hsv, s_thresh=60, v_thresh=40), boxes)
+        edge_density = self.rect_densities(self.edges_from_gray(gray, low=50, high=150, blur_ksize=3), boxes)
+        fine_edge_density = self.rect_densities(self.edges_from_gray(gray, low=100, high=200, blur_ksize=1), boxes)
+        
+        orb_score = np.zeros(len(candidates))
+        use_registry = self.template_registry.has_templates(institution_id)
+        if use_registry or template_img is not None:
+            for i, (_, props) in enumerate(candidates):
+                crop = self.rotate_crop(img, props['rect'])
+                if crop is None or crop.size == 0:
+                    continue
+                if use_registry:
+                    orb_score[i] = self.template_registry.match_score(crop, institution_id)
+                else:
+                    orb_score[i] = self.orb_match_score(crop, template_img)
+        
+        conf = 0.6 * red_ratio + 0.2 * edge_density - 0.1 * fine_edge_density + 0.3 * orb_score
+        conf = np.where(red_ratio < 0.3, conf * 0.5, conf)
+        
+        return [tuple(int(v) for v in box) for box in boxes], [float(c) for c in conf]
+
     def crop_top_percentage(self, image: np.ndarray, crop_percentage=0.2) -> np.ndarray:
         """Crop the top percentage of an image"""
         h, w = image.shape[:2]
@@ -269,45 +447,93 @@ class StampService:
             print(f"Unexpected error downloading {s3_key}: {e}")
             return False
 
+    def list_job_images(self, job_id: str) -> List[Dict]:
+        """
+        List every image object under a job's S3 prefix, in page order
+        
+        Follows list_objects_v2 pagination, so jobs with more than 1,000
+        objects are listed completely.
+        
+        Returns:
+            List of dicts with 'key', 'etag' and 'size'
+        """
+        if not self.s3_client:
+            raise Exception("S3 client not available")
+        
+        images = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.s3_bucket_name, Prefix=f"{job_id}/"):
+            for obj in page.get('Contents', []):
+                # Skip if not an image file
+                if not self.allowed_file(os.path.basename(obj['Key'])):
+                    continue
+                images.append({
+                    'key': obj['Key'],
+                    'etag': obj.get('ETag', '').strip('"'),
+                    'size': obj.get('Size', 0)
+                })
+        
+        # Sort keys to maintain page order
+        images.sort(key=lambda image: image['key'])
+        return images
+
+    def get_image_bytes(self, s3_key: str) -> bytes:
+        """Download one S3 object into memory"""
+        response = self.s3_client.get_object(Bucket=self.s3_bucket_name, Key=s3_key)
+        return response['Body'].read()
+
+    def iter_images_from_s3(self, s3_keys: List[str], workers: Optional[int] = None,
+                            window: Optional[int] = None) -> Iterator[Tuple[int, Optional[bytes]]]:
+        """
+        Download images concurrently and yield them in page order
+        
+        At most `window` downloads are in flight or waiting to be consumed,
+        which bounds memory however many pages the job has. A failed
+        download yields None for that page.
+        
+        Yields:
+            (page index, image bytes or None)
+        """
+        workers = workers or Config.STAMP_FETCH_WORKERS
+        window = max(window or Config.STAMP_FETCH_WINDOW, workers)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            next_index = 0
+            for idx in range(len(s3_keys)):
+                while next_index < len(s3_keys) and next_index < idx + window:
+                    pending[next_index] = pool.submit(self.get_image_bytes, s3_keys[next_index])
+                    next_index += 1
+                
+                try:
+                    yield idx, pending.pop(idx).result()
+                except Exception as e:
+                    print(f"Error downloading {s3_keys[idx]}: {e}")
+                    yield idx, None
+
     def fetch_images_from_s3(self, job_id: str) -> List[str]:
         """Fetch all images from S3 for a given job_id and download them locally"""
         try:
-            if not self.s3_client:
-                raise Exception("S3 client not available")
-                
             # Create temp directory for this job
             temp_job_dir = os.path.join(self.temp_folder, job_id)
             os.makedirs(temp_job_dir, exist_ok=True)
             
-            # List objects in S3 with the job_id prefix
-            prefix = f"{job_id}/"
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.s3_bucket_name,
-                Prefix=prefix
-            )
-            
-            if 'Contents' not in response:
+            s3_keys = [image['key'] for image in self.list_job_images(job_id)]
+            if not s3_keys:
                 print(f"No files found for job_id: {job_id}")
                 return []
             
             local_paths = []
-            for obj in response['Contents']:
-                s3_key = obj['Key']
-                filename = os.path.basename(s3_key)
-                
-                # Skip if not an image file
-                if not self.allowed_file(filename):
+            for idx, image_data in self.iter_images_from_s3(s3_keys):
+                if image_data is None:
+                    print(f"Failed to download {s3_keys[idx]}")
                     continue
-                    
-                local_path = os.path.join(temp_job_dir, filename)
                 
-                if self.download_image_from_s3(s3_key, local_path):
-                    local_paths.append(local_path)
-                else:
-                    print(f"Failed to download {s3_key}")
+                local_path = os.path.join(temp_job_dir, os.path.basename(s3_keys[idx]))
+                with open(local_path, 'wb') as f:
+                    f.write(image_data)
+                local_paths.append(local_path)
             
-            # Sort paths to maintain page order
-            local_paths.sort()
             print(f"Successfully downloaded {len(local_paths)} images for job {job_id}")
             return local_paths
             
@@ -318,116 +544,208 @@ class StampService:
     # ---------------------------
     # VLM Integration Functions
     # ---------------------------
-    def encode_image_to_base64(self, image: np.ndarray) -> str:
-        """Convert OpenCV image (BGR) to base64 string for API"""
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(image_rgb)
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format='PNG')
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-    def extract_roll_number_with_vlm(self, image: np.ndarray, image_name: str) -> Optional[str]:
+    def prepare_vlm_image(self, image: np.ndarray, max_side: Optional[int] = None, image_format: Optional[str] = None,
+                          quality: Optional[int] = None, grayscale: Optional[bool] = None) -> Tuple[bytes, str]:
+        """
+        Downscale and recompress an image for a VLM request
+        
+        Upload size dominates VLM latency, so crops are shrunk to max_side on
+        their longer edge and sent as JPEG by default. Settings default to
+        the STAMP_VLM_* config; benchmarks/vlm_image_prep_benchmark.py
+        measures their effect on payload size and accuracy.
+        
+        Returns:
+            (encoded bytes, MIME type)
+        """
+        max_side = max_side or Config.STAMP_VLM_MAX_SIDE
+        image_format = (image_format or Config.STAMP_VLM_IMAGE_FORMAT).upper()
+        quality = quality or Config.STAMP_VLM_JPEG_QUALITY
+        grayscale = Config.STAMP_VLM_GRAYSCALE if grayscale is None else grayscale
+        
+        h, w = image.shape[:2]
+        if max(h, w) > max_side:
+            scale = max_side / max(h, w)
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        if image_format == 'PNG':
+            ok, buffer = cv2.imencode('.png', image)
+            mime = 'image/png'
+        else:
+            ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            mime = 'image/jpeg'
+        if not ok:
+            raise ValueError("Could not encode image for VLM request")
+        return buffer.tobytes(), mime
+
+    def encode_vlm_image(self, image: np.ndarray, **options) -> str:
+        """Prepare an image for the VLM and return it as a data URL"""
+        data, mime = self.prepare_vlm_image(image, **options)
+        return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+    def extract_roll_number_with_vlm(self, image: np.ndarray, image_name: str,
+                                     retry_budget: Optional[RetryBudget] = None,
+                                     usage: Optional[VlmUsage] = None) -> Optional[str]:
         """Use OpenAI Vision API to extract roll number from stamp image"""
         if not self.is_openai_configured():
             print(f"OpenAI API key not configured for {image_name}")
+            if usage is not None:
+                usage.count_failure()
             return None
             
         try:
-            base64_image = self.encode_image_to_base64(image)
-            print(f"Analyzing {image_name} with VLM (image size: {image.shape})")
-
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.openai_api_key}"
-            }
-
-            payload = {
-                "model": "gpt-4o",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": """Analyze this image carefully to find a student's roll number or identification number.
-
-Look for:
-1. Any text that says "Roll No", "Roll Number", "Student ID", "ID No", "Registration No", etc.
-2. Numeric sequences that appear to be student identifiers (usually 4-10 digits)
-3. Numbers written in boxes, forms, or answer sheets
-4. Any handwritten or printed numbers that could be a student ID
+            image_url = self.encode_vlm_image(image)
+            print(f"Analyzing {image_name} with VLM (image size: {image.shape}, payload: {len(image_url)} chars)")
+
+            content = [
+                {"type": "text", "text": ROLL_NUMBER_PROMPT},
+                self._image_content(image_url)
+            ]
+            roll_number = self._call_vlm(content, image_name, max_tokens=150, retry_budget=retry_budget, usage=usage)
+            if roll_number is None:
+                return None
+            
+            return self._clean_roll_number_response(roll_number, image_name)
 
-Common formats to look for:
-- Simple numbers: 12345, 2023001234
-- Numbers with prefixes: S12345, 2023/1234
-- Numbers in formats like: 21BCE1234, CSE001, etc.
+        except Exception as e:
+            print(f"Unexpected Error for {image_name}: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            if usage is not None:
+                usage.count_failure()
+            return None
 
-Please examine the entire image thoroughly. If you find any number that could be a student identifier, respond with ONLY that number (remove any prefixes or special characters, just the digits).
+    def extract_roll_numbers_from_stamps(self, crops: List[np.ndarray], page_name: str,
+                                         retry_budget: Optional[RetryBudget] = None,
+                                         usage: Optional[VlmUsage] = None) -> List[Optional[str]]:
+        """
+        Extract roll numbers from all stamp crops of a page with one VLM request
+        
+        The crops are sent as one multi-image message and the model answers
+        with a JSON array, one entry per crop. If that answer cannot be
+        parsed, each crop is retried on its own.
+        
+        Returns:
+            Roll numbers (or None) aligned with crops
+        """
+        if not crops:
+            return []
+        if len(crops) == 1:
+            return [self.extract_roll_number_with_vlm(crops[0], f"{page_name}_stamp_0_crop", retry_budget, usage)]
+        if not self.is_openai_configured():
+            print(f"OpenAI API key not configured for {page_name}")
+            if usage is not None:
+                usage.count_failure()
+            return [None] * len(crops)
+        
+        failures_before = usage.failures if usage is not None else 0
+        try:
+            print(f"Analyzing {len(crops)} stamp crops of {page_name} with one VLM request")
+            content = [{"type": "text", "text": MULTI_STAMP_PROMPT.format(count=len(crops))}]
+            for crop in crops:
+                content.append(self._image_content(self.encode_vlm_image(crop)))
+            
+            raw = self._call_vlm(content, f"{page_name}_stamps", max_tokens=50 + 30 * len(crops),
+                                 retry_budget=retry_budget, usage=usage)
+            array = re.search(r'\[.*\]', raw or '', re.DOTALL)
+            answers = json.loads(array.group(0)) if array else None
+            if not isinstance(answers, list) or len(answers) != len(crops):
+                raise ValueError(f"expected a JSON array of {len(crops)} answers, got: {raw}")
+            
+            return [
+                self._clean_roll_number_response(str(answer), f"{page_name}_stamp_{i}_crop")
+                for i, answer in enumerate(answers)
+            ]
+        except Exception as e:
+            print(f"Multi-stamp VLM request failed for {page_name}, analyzing crops one by one: {str(e)}")
+            # The per-crop requests below decide whether the page got its answers
+            if usage is not None:
+                usage.failures = failures_before
+            return [
+                self.extract_roll_number_with_vlm(crop, f"{page_name}_stamp_{i}_crop", retry_budget, usage)
+                for i, crop in enumerate(crops)
+            ]
+
+    @staticmethod
+    def _image_content(image_url: str) -> Dict:
+        """Build an image_url content part for the chat completions API"""
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": image_url,
+                "detail": Config.STAMP_VLM_IMAGE_DETAIL
+            }
+        }
 
-If you cannot find any student identification number, respond with 'NOT_FOUND'.
+    def _call_vlm(self, content: List[Dict], image_name: str, max_tokens: int = 150,
+                  retry_budget: Optional[RetryBudget] = None,
+                  usage: Optional[VlmUsage] = None) -> Optional[str]:
+        """Send one user message to the vision model and return the raw answer text"""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.openai_api_key}"
+        }
 
-Examples of good responses: "12345", "2023001234", "1234"
-Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 150,
-                "temperature": 0.1
-            }
+        payload = {
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": max_tokens,
+            "temperature": 0.1
+        }
 
+        try:
             print(f"Sending request to OpenAI for {image_name}...")
-            response = requests.post(self.openai_api_url, headers=headers, json=payload, timeout=60)
+            if usage is not None:
+                usage.count_request()
+            response = self.http_client.post(self.openai_api_url, retry_budget=retry_budget, headers=headers, json=payload)
             
             print(f"OpenAI Response Status: {response.status_code}")
             if response.status_code != 200:
                 print(f"OpenAI API Error: {response.text}")
+                if usage is not None:
+                    usage.count_failure()
                 return None
-                
-            response.raise_for_status()
 
             result = response.json()
             if 'choices' not in result or not result['choices']:
                 print(f"No choices in OpenAI response: {result}")
+                if usage is not None:
+                    usage.count_failure()
                 return None
                 
-            roll_number = result['choices'][0]['message']['content'].strip()
-            print(f"VLM Raw Response for {image_name}: '{roll_number}'")
-
-            # Clean up the response
-            if roll_number and roll_number != 'NOT_FOUND':
-                # Extract only digits from the response
-                import re
-                digits_only = re.findall(r'\d+', roll_number)
-                if digits_only:
-                    # Take the longest sequence of digits (most likely to be roll number)
-                    final_roll = max(digits_only, key=len)
-                    print(f"Extracted roll number: {final_roll}")
-                    return final_roll
-                else:
-                    print(f"No digits found in response: {roll_number}")
-                    return None
-            else:
-                print(f"Roll number not found in {image_name}")
-                return None
+            answer = result['choices'][0]['message']['content'].strip()
+            print(f"VLM Raw Response for {image_name}: '{answer}'")
+            return answer
 
         except requests.exceptions.RequestException as e:
             print(f"API Request Error for {image_name}: {str(e)}")
+            if usage is not None:
+                usage.count_failure()
             return None
         except KeyError as e:
             print(f"API Response Error for {image_name}: {str(e)}")
+            if usage is not None:
+                usage.count_failure()
             return None
-        except Exception as e:
-            print(f"Unexpected Error for {image_name}: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+
+    @staticmethod
+    def _clean_roll_number_response(roll_number: Optional[str], image_name: str) -> Optional[str]:
+        """Reduce a VLM answer to the roll number digits, or None"""
+        roll_number = (roll_number or '').strip().strip('"')
+        if roll_number and roll_number != 'NOT_FOUND':
+            # Extract only digits from the response
+            digits_only = re.findall(r'\d+', roll_number)
+            if digits_only:
+                # Take the longest sequence of digits (most likely to be roll number)
+                final_roll = max(digits_only, key=len)
+                print(f"Extracted roll number: {final_roll}")
+                return final_roll
+            else:
+                print(f"No digits found in response: {roll_number}")
+                return None
+        else:
+            print(f"Roll number not found in {image_name}")
             return None
 
     # ---------------------------
@@ -456,7 +774,7 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
                 print(f"🐛 DEBUG: Request headers: {headers}")
                 print(f"🐛 DEBUG: Request timeout: 30 seconds")
                 
-                response = requests.post(
+                response = get_http_client().post(
                     webhook_url, 
                     json=data, 
                     headers=headers,
@@ -505,11 +823,12 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
     # ---------------------------
     # Core Processing Functions
     # ---------------------------
-    def detect_stamps_in_image(self, image_path: str, template_img: Optional[np.ndarray] = None) -> Dict:
-        """Process single image using stamp detection logic"""
+    def detect_stamps_in_image(self, image_path: str, template_img: Optional[np.ndarray] = None,
+                               image_data: Optional[bytes] = None, institution_id: Optional[str] = None) -> Dict:
+        """Process single image using stamp detection logic (image_data skips reading image_path)"""
         
         # Load and preprocess
-        img = self.load_and_preprocess(image_path, width=1600, do_clahe=False)
+        img = self.load_and_preprocess(image_data if image_data is not None else image_path, width=1600, do_clahe=False)
         img_area = img.shape[0] * img.shape[1]
 
         # HSV analysis
@@ -532,41 +851,8 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
                                     min_area_ratio=0.001, max_area_ratio=0.15,
                                     aspect_range=(1.5, 4.0), solidity_min=0.4)
 
-        # Score and collect boxes
-        boxes = []
-        scores = []
-        crops = []
-        for idx, (cnt, props) in enumerate(candidates):
-            x,y,w,h = props['bbox']
-            rect = props['rect']
-            crop = self.rotate_crop(img, rect)
-            if crop is None or crop.size == 0:
-                continue
-
-            # Compute confidence score
-            crop_hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
-            crop_mask = self.red_mask_from_hsv(crop_hsv, s_thresh=60, v_thresh=40)
-            red_ratio = float(np.count_nonzero(crop_mask)) / max(1, crop_mask.size)
-
-            crop_gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-            ed = self.edges_from_gray(crop_gray, low=50, high=150, blur_ksize=3)
-            edge_density = float(np.count_nonzero(ed)) / max(1, ed.size)
-
-            fine_edges = self.edges_from_gray(crop_gray, low=100, high=200, blur_ksize=1)
-            fine_edge_density = float(np.count_nonzero(fine_edges)) / max(1, fine_edges.size)
-
-            orb_score = 0.0
-            if template_img is not None:
-                orb_score = self.orb_match_score(crop, template_img)
-
-            conf = 0.6 * red_ratio + 0.2 * edge_density - 0.1 * fine_edge_density + 0.3 * orb_score
-
-            if red_ratio < 0.3:
-                conf *= 0.5
-
-            boxes.append((x,y,w,h))
-            scores.append(conf)
-            crops.append(crop)
+        # Score all candidates from page-level masks
+        boxes, scores = self.score_candidates(img, hsv, gray, candidates, template_img, institution_id)
 
         # Apply NMS
         if boxes:
@@ -593,6 +879,195 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
             'original_image': img  # Keep this for VLM processing
         }
 
+    def detect_and_cut(self, image_path: str, crop_percentage: float = 0.2, image_data: Optional[bytes] = None,
+                       institution_id: Optional[str] = None) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Detect stamps on a page and cut the regions the VLM needs
+        
+        Only the small crops are kept, so the full page never has to leave
+        a detection worker process.
+        
+        Returns:
+            (page_result without the original image, VLM crops or None when
+            the page has no stamps)
+        """
+        source = image_data if image_data is not None else image_path
+        
+        # Cheap pre-screen: pages with almost no red ink cannot hold a stamp
+        if Config.STAMP_PRESCREEN_ENABLED:
+            red_ratio = self.prescreen_red_ratio(source)
+            if red_ratio < Config.STAMP_PRESCREEN_MIN_RED_RATIO:
+                return {
+                    'image_name': os.path.splitext(os.path.basename(image_path))[0],
+                    'image_path': image_path,
+                    'stamps_detected': 0,
+                    'detection_results': [],
+                    'prescreen_skipped': True,
+                    'prescreen_red_ratio': round(red_ratio, 6)
+                }, None
+        
+        page_result = self.detect_stamps_in_image(image_path, image_data=image_data, institution_id=institution_id)
+        page_result['prescreen_skipped'] = False
+        original_image = page_result.pop('original_image')
+        
+        if page_result['stamps_detected'] == 0:
+            return page_result, None
+        
+        stamp_crops = []
+        for detection in page_result['detection_results']:
+            x, y, w, h = detection['box']
+            crop_img = original_image[y:y+h, x:x+w]
+            # Apply crop percentage to the stamp region as well
+            stamp_crops.append(self.crop_top_percentage(crop_img, crop_percentage))
+        
+        vlm_crops = {
+            'page_crop': self.crop_top_percentage(original_image, crop_percentage).copy(),
+            'stamp_crops': [crop.copy() for crop in stamp_crops]
+        }
+        return page_result, vlm_crops
+
+    def extract_page_roll_numbers(self, page_result: Dict, vlm_crops: Dict,
+                                  retry_budget: Optional[RetryBudget] = None) -> VlmUsage:
+        """
+        Annotate a page's detections with VLM roll numbers
+        
+        One full-page answer is shared by every stamp on the page, and all
+        stamp crops go to the VLM in a single request.
+        
+        Returns:
+            VlmUsage with the requests made and whether every one was answered
+        """
+        detections = page_result['detection_results']
+        usage = VlmUsage()
+        full_page_roll = self.extract_roll_number_with_vlm(vlm_crops['page_crop'], page_result['image_name'], retry_budget, usage)
+        
+        print(f"🔍 Processing {len(detections)} stamps in {page_result['image_name']}")
+        stamp_rolls = self.extract_roll_numbers_from_stamps(vlm_crops['stamp_crops'], page_result['image_name'], retry_budget, usage)
+        
+        for stamp_idx, (detection, stamp_roll) in enumerate(zip(detections, stamp_rolls)):
+            # Use the result that found a roll number, prefer full page context
+            final_roll_number = full_page_roll or stamp_roll
+
+            # Store result
+            detection['roll_number'] = final_roll_number
+            detection['roll_from_full_page'] = full_page_roll
+            detection['roll_from_crop'] = stamp_roll
+            detection['vlm_analyzed'] = True
+            
+            print(f"✅ Completed processing stamp {stamp_idx+1} - Roll number: {final_roll_number}")
+        
+        return usage
+
+    def detect_pages(self, image_paths: List[str], crop_percentage: float = 0.2,
+                     image_source: Optional[Iterator[Tuple[int, Optional[bytes]]]] = None,
+                     institution_id: Optional[str] = None,
+                     retry_budget: Optional[RetryBudget] = None,
+                     on_page_done: Optional[Callable[[int, Dict, bool], None]] = None) -> Tuple[List[Dict], int]:
+        """
+        Detect stamps on every page and extract roll numbers
+        
+        Detection is CPU-bound and fans out over a process pool; the VLM
+        calls are I/O-bound and run on a thread pool as soon as each page's
+        detection finishes. With a single detection worker the pages are
+        detected in this process.
+        
+        Args:
+            image_paths: Page names (local paths or S3 keys), in page order
+            crop_percentage: Header share of the page sent to the VLM
+            image_source: Optional (index, bytes) iterator such as
+                          iter_images_from_s3; pages are read from
+                          image_paths when omitted
+            institution_id: Score candidates against this institution's
+                            registered stamp templates
+            retry_budget: Retries shared by all VLM calls of the job
+            on_page_done: Called with (index, result, succeeded) once a
+                          page is fully processed, from whichever thread
+                          finished it; succeeded is False if detection
+                          failed or any VLM request got no answer
+        
+        Returns:
+            (page results in page order, number of VLM requests)
+        """
+        page_results: List[Optional[Dict]] = [None] * len(image_paths)
+        vlm_futures = {}
+        detection_workers = max(1, min(Config.STAMP_DETECTION_WORKERS, len(image_paths)))
+        if image_source is None:
+            image_source = ((idx, None) for idx in range(len(image_paths)))
+        
+        def record_detection(idx: int, outcome, vlm_pool: ThreadPoolExecutor):
+            image_path = image_paths[idx]
+            try:
+                page_result, vlm_crops = outcome()
+            except Exception as e:
+                print(f"❌ Error processing {image_path}: {str(e)}")
+                page_result, vlm_crops = {'error': str(e)}, None
+            
+            page_results[idx] = page_result
+            print(f"✅ Detected {page_result.get('stamps_detected', 0)} stamps in {os.path.basename(image_path)}")
+            if vlm_crops:
+                future = vlm_pool.submit(self.extract_page_roll_numbers, page_result, vlm_crops, retry_budget)
+                vlm_futures[idx] = future
+                if on_page_done:
+                    future.add_done_callback(
+                        lambda f, idx=idx: on_page_done(
+                            idx, page_results[idx], f.exception() is None and f.result().complete
+                        )
+                    )
+            elif on_page_done:
+                on_page_done(idx, page_result, 'error' not in page_result)
+        
+        def missing_image(idx: int):
+            raise Exception(f"Could not download {image_paths[idx]}")
+        
+        with ThreadPoolExecutor(max_workers=Config.STAMP_VLM_WORKERS) as vlm_pool:
+            if detection_workers == 1:
+                for idx, image_data in image_source:
+                    image_path = image_paths[idx]
+                    print(f"🔍 Processing image {idx+1}/{len(image_paths)}: {os.path.basename(image_path)}")
+                    if image_data is None and not os.path.exists(image_path):
+                        record_detection(idx, partial(missing_image, idx), vlm_pool)
+                        continue
+                    record_detection(idx, partial(self.detect_and_cut, image_path, crop_percentage, image_data, institution_id), vlm_pool)
+            else:
+                print(f"🔍 Detecting stamps on {len(image_paths)} images with {detection_workers} processes")
+                with ProcessPoolExecutor(max_workers=detection_workers, initializer=_init_detection_worker) as detection_pool:
+                    # Pages are submitted as they arrive, with a bounded number in
+                    # flight so downloaded images do not pile up in the pool's queue
+                    futures = {}
+                    for idx, image_data in image_source:
+                        image_path = image_paths[idx]
+                        if image_data is None and not os.path.exists(image_path):
+                            record_detection(idx, partial(missing_image, idx), vlm_pool)
+                            continue
+                        
+                        futures[detection_pool.submit(_detect_page_in_worker, image_path, crop_percentage, image_data, institution_id)] = idx
+                        if len(futures) >= 2 * detection_workers:
+                            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                record_detection(futures.pop(future), future.result, vlm_pool)
+                    
+                    for future in as_completed(futures):
+                        record_detection(futures[future], future.result, vlm_pool)
+        
+        vlm_requests = 0
+        for idx, future in vlm_futures.items():
+            try:
+                vlm_requests += future.result().requests
+            except Exception as e:
+                print(f"❌ VLM extraction failed for {image_paths[idx]}: {str(e)}")
+        
+        return page_results, vlm_requests
+
+    def checkpoint_fingerprint(self, crop_percentage: float, institution_id: Optional[str]) -> str:
+        """Settings a checkpointed page result depends on"""
+        templates = [t['name'] for t in self.template_registry.list_templates(institution_id)] if institution_id else []
+        return settings_fingerprint(
+            crop_percentage=crop_percentage,
+            institution_id=institution_id,
+            templates=templates,
+            prescreen=Config.STAMP_PRESCREEN_ENABLED and Config.STAMP_PRESCREEN_MIN_RED_RATIO
+        )
+
     def group_pages_by_student(self, all_results: Dict, image_paths: List[str]) -> Dict:
         """Group pages by student based on stamp detection"""
         
@@ -640,72 +1115,74 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
 
         return student_groups
 
-    def process_job(self, job_id: str, webhook_url: Optional[str] = None, crop_percentage: float = 0.2) -> Dict:
-        """Main processing function for stamp detection job"""
+    def process_job(self, job_id: str, webhook_url: Optional[str] = None, crop_percentage: float = 0.2,
+                    institution_id: Optional[str] = None,
+                    progress_callback: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """
+        Main processing function for stamp detection job
+        
+        progress_callback, if given, receives ('started', {'total_pages',
+        'pages_done', 'stamps_found'}) once the pages are listed and
+        ('page', {'stamps_detected'}) as each remaining page finishes.
+        """
         
-        # Fetch images from S3
-        print(f"📥 Fetching images from S3 for job: {job_id}")
-        image_paths = self.fetch_images_from_s3(job_id)
+        # List images in S3; they are downloaded concurrently while detection runs
+        print(f"📥 Listing images in S3 for job: {job_id}")
+        images = self.list_job_images(job_id)
+        image_paths = [image['key'] for image in images]
         
         if not image_paths:
             raise Exception(f'No images found in S3 for job_id: {job_id}')
 
         print(f"📋 Found {len(image_paths)} images to process")
 
-        # Optional: Handle template if provided (could be another S3 object or skip for now)
-        template_img = None
-
-        # Process each image one by one
-        all_results = {}
-        pages_with_stamps = []
-
-        for idx, image_path in enumerate(image_paths):
-            try:
-                print(f"🔍 Processing image {idx+1}/{len(image_paths)}: {os.path.basename(image_path)}")
-                
-                # Detect stamps
-                page_result = self.detect_stamps_in_image(image_path, template_img)
-                all_results[image_path] = page_result
-
-                if page_result['stamps_detected'] > 0:
-                    pages_with_stamps.append((image_path, page_result))
-
-                    # Process each detected stamp with VLM one by one
-                    for stamp_idx, detection in enumerate(page_result['detection_results']):
-                        print(f"🔍 Processing stamp {stamp_idx+1}/{len(page_result['detection_results'])} in {page_result['image_name']}")
-                        
-                        # Crop top percentage of full page image for VLM analysis
-                        cropped_page = self.crop_top_percentage(page_result['original_image'], crop_percentage)
-                        full_page_roll = self.extract_roll_number_with_vlm(
-                            cropped_page, 
-                            page_result['image_name']
-                        )
-
-                        # Also analyze the stamp crop itself
-                        x, y, w, h = detection['box']
-                        crop_img = page_result['original_image'][y:y+h, x:x+w]
-                        # Apply crop percentage to the stamp region as well
-                        cropped_stamp = self.crop_top_percentage(crop_img, crop_percentage)
-
-                        stamp_name = f"{page_result['image_name']}_stamp_{stamp_idx}"
-                        stamp_roll = self.extract_roll_number_with_vlm(cropped_stamp, f"{stamp_name}_crop")
-
-                        # Use the result that found a roll number, prefer full page context
-                        final_roll_number = full_page_roll or stamp_roll
-
-                        # Store result
-                        detection['roll_number'] = final_roll_number
-                        detection['roll_from_full_page'] = full_page_roll
-                        detection['roll_from_crop'] = stamp_roll
-                        detection['vlm_analyzed'] = True
-                        
-                        print(f"✅ Completed processing stamp {stamp_idx+1} - Roll number: {final_roll_number}")
-
-                print(f"✅ Completed processing image: {page_result['image_name']}")
-
-            except Exception as e:
-                print(f"❌ Error processing {image_path}: {str(e)}")
-                all_results[image_path] = {'error': str(e)}
+        # Reuse checkpointed pages whose ETag and settings are unchanged
+        page_results: List[Optional[Dict]] = [None] * len(images)
+        fingerprint = self.checkpoint_fingerprint(crop_percentage, institution_id)
+        if self.checkpoint_store:
+            checkpoints = self.checkpoint_store.load(job_id, fingerprint)
+            for idx, image in enumerate(images):
+                checkpoint = checkpoints.get(image['key'])
+                if checkpoint and checkpoint['etag'] == image['etag']:
+                    page_results[idx] = checkpoint['result']
+        pending = [idx for idx, result in enumerate(page_results) if result is None]
+        pages_from_checkpoint = len(images) - len(pending)
+        if pages_from_checkpoint:
+            print(f"♻️ Reusing {pages_from_checkpoint} checkpointed pages, processing {len(pending)}")
+        
+        if progress_callback:
+            progress_callback('started', {
+                'total_pages': len(images),
+                'pages_done': pages_from_checkpoint,
+                'stamps_found': sum(r.get('stamps_detected', 0) for r in page_results if r)
+            })
+        
+        def page_done(pending_idx: int, result: Dict, succeeded: bool):
+            image = images[pending[pending_idx]]
+            if succeeded and self.checkpoint_store:
+                try:
+                    self.checkpoint_store.save(job_id, image['key'], image['etag'], fingerprint, result)
+                except Exception as e:
+                    print(f"⚠️ Warning: Could not checkpoint {image['key']}: {e}")
+            if progress_callback:
+                progress_callback('page', {'stamps_detected': result.get('stamps_detected', 0)})
+
+        # Detect stamps on the remaining pages and extract roll numbers, in page order
+        retry_budget = RetryBudget(Config.STAMP_VLM_RETRY_BUDGET)
+        pending_paths = [image_paths[idx] for idx in pending]
+        pending_results, vlm_requests = self.detect_pages(
+            pending_paths, crop_percentage, image_source=self.iter_images_from_s3(pending_paths),
+            institution_id=institution_id, retry_budget=retry_budget,
+            on_page_done=page_done
+        )
+        for idx, result in zip(pending, pending_results):
+            page_results[idx] = result
+        all_results = dict(zip(image_paths, page_results))
+        pages_with_stamps = [
+            (image_path, result) for image_path, result in all_results.items()
+            if result.get('stamps_detected', 0) > 0
+        ]
+        pages_skipped = sum(1 for result in page_results if result.get('prescreen_skipped'))
 
         # Group pages by student
         print(f"👥 Grouping pages by student...")
@@ -754,6 +1231,13 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
                 'pages_with_stamps': len(pages_with_stamps),
                 'total_stamps_detected': total_stamps,
                 'total_roll_numbers_extracted': len(successful_extractions),
+                'vlm_requests': vlm_requests,
+                'vlm_retries': retry_budget.spent,
+                'pages_from_checkpoint': pages_from_checkpoint,
+                'pages_skipped_by_prescreen': pages_skipped,
+                'institution_id': institution_id,
+                'template_matching': self.template_registry.has_templates(institution_id),
+                'prescreen_skip_rate': round(pages_skipped / total_pages, 3) if total_pages else 0.0,
                 'timestamp': datetime.now().isoformat(),
                 'status': 'completed',
                 'elapsed_time': 0  # You can track this if needed
@@ -827,7 +1311,7 @@ Bad responses: "Student ID: 12345", "Roll No. 12345", explanations"""
         """Test VLM extraction with a sample image from URL or S3"""
         try:
             # Download image from URL
-            response = requests.get(image_url, timeout=30)
+            response = get_http_client().get(image_url, timeout=30)
             response.raise_for_status()
             
             # Convert to OpenCV image
@@ -0,0 +1,229 @@
+"""
+Stamp Template Registry
+Per-institution stamp templates with precomputed ORB descriptors
+"""
+
+import os
+import re
+import threading
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+# FLANN index for binary (ORB) descriptors
+FLANN_INDEX_LSH = 6
+LSH_INDEX_PARAMS = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+LSH_SEARCH_PARAMS = dict(checks=50)
+
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_-]')
+
+def _safe_name(value: str, kind: str) -> str:
+    """
+    Reduce an institution id or template name to a single safe path component
+
+    Raises:
+        ValueError: If nothing usable is left
+    """
+    safe = _SAFE_NAME.sub('_', value or '')
+    if not safe.strip('_'):
+        raise ValueError(f"Invalid {kind}: {value!r}")
+    return safe
+
+@dataclass
+class StampTemplate:
+    name: str
+    keypoint_count: int
+    descriptors: np.ndarray
+    matcher: cv2.FlannBasedMatcher
+    shape: tuple
+
+class StampTemplateRegistry:
+    """
+    Stamp templates grouped by institution
+
+    Templates are stored as image files under STAMP_TEMPLATE_DIR and their
+    ORB descriptors are computed once per file version. Each template keeps
+    a trained FLANN/LSH matcher, so matching a crop only computes the
+    crop's own descriptors.
+
+    The institution directory is the source of truth: every lookup compares
+    its listing (names, sizes, mtimes) with the cached one and rebuilds only
+    the files that changed, so templates registered or removed through
+    another worker process are picked up.
+    """
+
+    def __init__(self, template_dir: Optional[str] = None, nfeatures: Optional[int] = None):
+        self.template_dir = template_dir or Config.STAMP_TEMPLATE_DIR
+        self.nfeatures = nfeatures or Config.STAMP_TEMPLATE_ORB_FEATURES
+        # institution -> (directory listing, templates built from it)
+        self._templates: Dict[str, Tuple[tuple, List[StampTemplate]]] = {}
+        # template file path -> (mtime_ns, size, template or None)
+        self._built: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        # ORB detectors are kept per thread; the shared matchers are used under the lock
+        self._local = threading.local()
+
+    def _orb(self):
+        orb = getattr(self._local, 'orb', None)
+        if orb is None:
+            orb = self._local.orb = cv2.ORB_create(self.nfeatures)
+        return orb
+
+    def _institution_dir(self, institution_id: str) -> str:
+        """
+        Raises:
+            ValueError: If the institution id does not map to a folder under template_dir
+        """
+        root = os.path.realpath(self.template_dir)
+        directory = os.path.realpath(os.path.join(root, _safe_name(institution_id, 'institution id')))
+        if os.path.dirname(directory) != root:
+            raise ValueError(f"Invalid institution id: {institution_id!r}")
+        return directory
+
+    def _build_template(self, name: str, image: np.ndarray) -> Optional[StampTemplate]:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        keypoints, descriptors = self._orb().detectAndCompute(gray, None)
+        if descriptors is None or len(keypoints) < 2:
+            return None
+
+        matcher = cv2.FlannBasedMatcher(LSH_INDEX_PARAMS, LSH_SEARCH_PARAMS)
+        matcher.add([descriptors])
+        matcher.train()
+        return StampTemplate(name=name, keypoint_count=len(keypoints), descriptors=descriptors,
+                             matcher=matcher, shape=image.shape[:2])
+
+    def _listing(self, directory: str) -> tuple:
+        if not os.path.isdir(directory):
+            return ()
+        listing = []
+        for filename in sorted(os.listdir(directory)):
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except OSError:
+                continue
+            listing.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(listing)
+
+    def _load_institution(self, institution_id: str) -> List[StampTemplate]:
+        try:
+            directory = self._institution_dir(institution_id)
+        except ValueError:
+            # An id that cannot name a folder has no templates
+            return []
+        listing = self._listing(directory)
+
+        with self._lock:
+            cached = self._templates.get(institution_id)
+            if cached is not None and cached[0] == listing:
+                return cached[1]
+
+            templates = []
+            for filename, mtime_ns, size in listing:
+                path = os.path.join(directory, filename)
+                built = self._built.get(path)
+                if built is None or built[:2] != (mtime_ns, size):
+                    image = cv2.imread(path)
+                    template = self._build_template(os.path.splitext(filename)[0], image) if image is not None else None
+                    built = self._built[path] = (mtime_ns, size, template)
+                if built[2]:
+                    templates.append(built[2])
+
+            # Forget files that are gone
+            current = {os.path.join(directory, entry[0]) for entry in listing}
+            for path in [p for p in self._built if os.path.dirname(p) == directory and p not in current]:
+                del self._built[path]
+
+            self._templates[institution_id] = (listing, templates)
+            return templates
+
+    def register(self, institution_id: str, name: str, image_data: bytes) -> Dict:
+        """
+        Store a template image and precompute its descriptors
+
+        Raises:
+            ValueError: If the image cannot be decoded or has too few features, or
+                the institution id or name is not usable as a path component
+        """
+        image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Template is not a readable image")
+
+        name = _safe_name(name, 'template name')
+        directory = self._institution_dir(institution_id)
+        template = self._build_template(name, image)
+        if template is None:
+            raise ValueError("Template has too few ORB features to match against")
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.png")
+        cv2.imwrite(path, image)
+
+        # Seed the descriptor cache so this worker does not rebuild it on the next lookup
+        stat = os.stat(path)
+        with self._lock:
+            self._built[path] = (stat.st_mtime_ns, stat.st_size, template)
+
+        return {'name': name, 'keypoints': template.keypoint_count, 'shape': list(template.shape)}
+
+    def remove(self, institution_id: str, name: str) -> bool:
+        """
+        Delete a template's <name>.png; returns False if it did not exist
+
+        Raises:
+            ValueError: If the institution id or name is not usable as a path component
+        """
+        path = os.path.join(self._institution_dir(institution_id), f"{_safe_name(name, 'template name')}.png")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def list_templates(self, institution_id: str) -> List[Dict]:
+        return [
+            {'name': t.name, 'keypoints': t.keypoint_count, 'shape': list(t.shape)}
+            for t in self._load_institution(institution_id)
+        ]
+
+    def has_templates(self, institution_id: Optional[str]) -> bool:
+        return bool(institution_id) and bool(self._load_institution(institution_id))
+
+    def match_score(self, crop: np.ndarray, institution_id: str, ratio: float = 0.75) -> float:
+        """
+        Best ORB match score of a crop against an institution's templates
+
+        Same score as StampService.orb_match_score: ratio-test matches over
+        the smaller keypoint count.
+        """
+        templates = self._load_institution(institution_id)
+        if not templates:
+            return 0.0
+
+        try:
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            keypoints, descriptors = self._orb().detectAndCompute(gray, None)
+            if descriptors is None or len(keypoints) < 2:
+                return 0.0
+
+            best = 0.0
+            for template in templates:
+                with self._lock:
+                    matches = template.matcher.knnMatch(descriptors, k=2)
+                good = sum(1 for pair in matches if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance)
+                best = max(best, good / max(1, min(len(keypoints), template.keypoint_count)))
+            return best
+        except Exception:
+            return 0.0
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_template_registry() -> StampTemplateRegistry:
+    """Process-wide template registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StampTemplateRegistry()
+        return _registry
@@ -46,7 +46,7 @@ def create_app():
         from services.s3_service import S3Service
         from services.scheduler_service import SchedulerService
         from services.vlm_service import VLMService
-        import requests
+        from services.http_client import get_http_client
 
         try:
             # Check S3 service
@@ -56,7 +56,7 @@ def create_app():
             # Check Django API
             django_status = False
             try:
-                django_health = requests.get(f'{Config.DJANGO_API_BASE_URL}/status/', timeout=Config.HEALTH_CHECK_TIMEOUT)
+                django_health = get_http_client().get(f'{Config.DJANGO_API_BASE_URL}/status/', timeout=Config.HEALTH_CHECK_TIMEOUT)
                 django_status = django_health.status_code == 200
             except:
                 pass
@@ -166,6 +166,17 @@ def create_app():
                 'error': f'Configuration check failed: {str(e)}'
             }, 500
     
+    @app.route('/apils/http-stats', methods=['GET'])
+    def http_stats():
+        """Outbound HTTP requests and keep-alive connection reuse per host"""
+        from services.http_client import get_http_stats
+        
+        return {
+            'success': True,
+            'clients': get_http_stats(),
+            'timestamp': datetime.now().isoformat()
+        }
+    
     @app.route('/apils/s3-config', methods=['GET'])
     def s3_config():
         """Get S3 configuration status"""
@@ -197,6 +208,7 @@ def create_app():
                 'health': 'GET /api/health',
                 'configuration': 'GET /api/config',
                 's3_config': 'GET /api/s3-config',
+                'http_stats': 'GET /api/http-stats',
                 'pdf_processing': {
                     'convert': 'POST /api/pdf/convert',
                     'status': 'GET /api/pdf/status/<job_id>'
@@ -287,6 +299,7 @@ if __name__ == '__main__':
     print("  GET  / - Service information")
     print("  GET  /api/health - Combined health check")
     print("  GET  /api/config - Configuration status")
+    print("  GET  /api/http-stats - Outbound HTTP connection reuse per host")
     print("  POST /api/pdf/convert - Convert PDF to images")
     print("  POST /api/ocr/process - Process images with OCR")
     print("  GET  /api/vlm/process-images/<uuid> - Process images with VLM and save")
@@ -13,6 +13,26 @@ class Config:
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.environ.get('AWS_REGION', 'ap-south-1')
+    S3_UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS', 8))
+    S3_UPLOAD_QUEUE_SIZE = int(os.environ.get('S3_UPLOAD_QUEUE_SIZE', 32))
+    S3_UPLOAD_MAX_RETRIES = int(os.environ.get('S3_UPLOAD_MAX_RETRIES', 4))
+    S3_UPLOAD_BACKOFF = float(os.environ.get('S3_UPLOAD_BACKOFF', 0.5))
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+    S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE = int(os.environ.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    S3_MULTIPART_CONCURRENCY = int(os.environ.get('S3_MULTIPART_CONCURRENCY', 4))
+    MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', 2))
+    MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 200))
+    CONVERSION_MEMORY_BUDGET_MB = int(os.environ.get('CONVERSION_MEMORY_BUDGET_MB', 2048))
+    ARCHIVE_MODE = os.environ.get('ARCHIVE_MODE', 'stream')
+    ARCHIVE_PART_SIZE = int(os.environ.get('ARCHIVE_PART_SIZE', 8 * 1024 * 1024))
+    ARCHIVE_FETCH_WORKERS = int(os.environ.get('ARCHIVE_FETCH_WORKERS', 4))
+
+    JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'memory')
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join('temp', 'jobs.sqlite3'))
+    JOB_STORE_REDIS_URL = os.environ.get('JOB_STORE_REDIS_URL', 'redis://localhost:6379/0')
+    JOB_STORE_PREFIX = os.environ.get('JOB_STORE_PREFIX', 'question-paper')
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 24 * 60 * 60))
 
     AZURE_SUBSCRIPTION_KEY = os.environ.get('AZURE_SUBSCRIPTION_KEY')
     AZURE_ENDPOINT = os.environ.get('AZURE_ENDPOINT')
@@ -24,4 +44,11 @@ class Config:
     RUBRIC_GENERATION_API_URL = os.environ.get('RUBRIC_GENERATION_API_URL')
     PROCESS_RUBRIC_API_URL = os.environ.get('PROCESS_RUBRIC_API_URL')
 
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 20))
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+    HTTP_MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST', 16))
+    HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 30))
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))
+    HTTP_BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.5))
+    
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -1,9 +1,10 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 import uuid as uuid_module
 import os
 import logging
 
 from services.pdf_service import PDFService
+from services.job_scheduler import QueueFullError
 
 logger = logging.getLogger(__name__)
 pdf_bp = Blueprint('pdf', __name__)
@@ -23,6 +24,7 @@ def convert_question_paper():
     - format: (optional) Image format JPEG/PNG (default: JPEG)
     - quality: (optional) JPEG quality 1-100 (default: 85)
     - upload_to_s3: (optional) Whether to upload to S3 (default: true)
+    - priority: (optional) Higher priority jobs start first (default: 0)
     """
     try:
         # Check if file is present
@@ -102,10 +104,18 @@ def convert_question_paper():
         
         upload_to_s3 = request.form.get('upload_to_s3', 'true').lower() == 'true'
         
+        try:
+            priority = int(request.form.get('priority', 0))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Priority must be a valid integer'
+            }), 400
+        
         # Create conversion job
         try:
-            job_id = pdf_service.create_job(
-                job_uuid, file, dpi, img_format, quality, upload_to_s3
+            job_id, queue_position = pdf_service.create_job(
+                job_uuid, file, dpi, img_format, quality, upload_to_s3, priority
             )
             
             response_data = {
@@ -113,6 +123,7 @@ def convert_question_paper():
                 'message': 'Question paper conversion started',
                 'job_id': job_id,
                 'status': 'queued',
+                'queue_position': queue_position,
                 'type': 'question_paper',
                 'upload_to_s3': upload_to_s3
             }
@@ -123,6 +134,12 @@ def convert_question_paper():
             logger.info(f"Started PDF conversion job {job_id}")
             return jsonify(response_data), 202
             
+        except QueueFullError as e:
+            logger.warning(f"Rejected conversion job {job_uuid}: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 503
         except Exception as e:
             logger.error(f"Failed to create conversion job: {str(e)}")
             return jsonify({
@@ -172,7 +189,7 @@ def get_status(job_id):
 
 @pdf_bp.route('/download/<job_id>', methods=['GET'])
 def download_images(job_id):
-    """Download converted images as ZIP (local backup)"""
+    """Download converted images as ZIP (local archive, or streamed from S3)"""
     try:
         # Validate UUID format
         try:
@@ -186,6 +203,14 @@ def download_images(job_id):
         zip_path = pdf_service.get_download_path(job_id)
         
         if zip_path is None:
+            stream = pdf_service.iter_download(job_id)
+            if stream is not None:
+                return Response(
+                    stream_with_context(stream),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={job_id}_question_paper_images.zip'}
+                )
+            
             job_status = pdf_service.get_job_status(job_id)
             if job_status is None:
                 return jsonify({
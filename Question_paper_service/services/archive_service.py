@@ -0,0 +1,204 @@
+import logging
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# S3 requires every part except the last to be at least 5MB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class S3MultipartWriter:
+    """
+    Write-only file object that streams its content into an S3 multipart upload
+    
+    Data is buffered until a full part is available, so at most one part is
+    held in memory. Archives smaller than one part are sent with a single PUT.
+    The object is not seekable, which makes zipfile write data descriptors
+    instead of rewinding to patch local headers.
+    """
+    
+    def __init__(self, s3_service, s3_key, content_type='application/zip', part_size=None):
+        self.client = s3_service.client
+        self.bucket = s3_service.bucket
+        self.s3_key = s3_key
+        self.content_type = content_type
+        self.part_size = max(part_size or Config.ARCHIVE_PART_SIZE, MIN_PART_SIZE)
+        self.closed = False
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = None
+        self._position = 0
+    
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def _upload_part(self, data):
+        """Send one part, starting the multipart upload on first use"""
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.s3_key,
+                ContentType=self.content_type
+            )
+            self._upload_id = response['UploadId']
+        
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.s3_key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+    
+    def close(self):
+        """Flush the remaining buffer and complete the upload"""
+        if self.closed:
+            return
+        self.closed = True
+        
+        if self._upload_id is None:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.s3_key,
+                Body=bytes(self._buffer),
+                ContentType=self.content_type
+            )
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.s3_key,
+                UploadId=self._upload_id,
+                MultipartUpload={'Parts': self._parts}
+            )
+        
+        self._buffer = bytearray()
+    
+    def abort(self):
+        """Discard the upload so no orphaned parts are left in the bucket"""
+        self.closed = True
+        self._buffer = bytearray()
+        
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.s3_key,
+                    UploadId=self._upload_id
+                )
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload for {self.s3_key}: {e}")
+
+class StreamingArchive:
+    """
+    ZIP_STORED archive built incrementally as pages are produced
+    
+    Pages are already compressed images, so they are stored rather than
+    deflated. The archive streams into S3 when an s3_key is given and is
+    written to local_path otherwise. add() is safe to call from several threads.
+    """
+    
+    def __init__(self, s3_service=None, s3_key=None, local_path=None):
+        if s3_key:
+            self._sink = S3MultipartWriter(s3_service, s3_key)
+        else:
+            self._sink = open(local_path, 'wb')
+        self._zip = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_STORED)
+        self._lock = threading.Lock()
+    
+    def add(self, filename, data):
+        """Append one file to the archive"""
+        with self._lock:
+            self._zip.writestr(filename, data)
+    
+    def close(self):
+        """Write the central directory and finish the upload or file"""
+        with self._lock:
+            self._zip.close()
+            self._sink.close()
+    
+    def abort(self):
+        """Stop writing and discard any partial multipart upload"""
+        with self._lock:
+            if isinstance(self._sink, S3MultipartWriter):
+                self._sink.abort()
+            else:
+                self._sink.close()
+
+class _ChunkSink:
+    """Write-only sink that collects zipfile output between yields"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _prefetch(entries, workers):
+    """Run each entry's loader ahead of time, yielding (filename, data) in order"""
+    entries = iter(entries)
+    pending = deque()
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for filename, load in entries:
+            pending.append((filename, pool.submit(load)))
+            if len(pending) >= workers:
+                name, future = pending.popleft()
+                yield name, future.result()
+        
+        while pending:
+            name, future = pending.popleft()
+            yield name, future.result()
+
+def iter_zip_stream(entries, workers=None):
+    """
+    Build a ZIP_STORED archive on the fly and yield it chunk by chunk
+    
+    Args:
+        entries: Iterable of (filename, loader) where loader() returns the file bytes
+        workers (int): Loaders run concurrently this far ahead of the writer
+        
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    sink = _ChunkSink()
+    
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zipf:
+        for filename, data in _prefetch(entries, workers or Config.ARCHIVE_FETCH_WORKERS):
+            zipf.writestr(filename, data)
+            yield sink.drain()
+    
+    yield sink.drain()
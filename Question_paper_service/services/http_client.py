@@ -0,0 +1,157 @@
+"""
+HTTP Client
+Shared keep-alive HTTP clients for every outbound call (Azure, Django,
+rubric APIs, OpenAI), with per-host concurrency limits and connection reuse stats
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+from config import Config
+
+# Retried by the transport adapter for idempotent methods. 429 is left to
+# callers, which handle Azure's rate limits themselves.
+ADAPTER_RETRY_STATUS_CODES = (502, 503, 504)
+
+class HostStats:
+    """
+    Per-host request counters
+
+    Combined with the urllib3 pools' connection counts they show how many
+    requests reused a kept-alive connection instead of opening a new one.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, error: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'errors': 0})
+            stats['requests'] += 1
+            if error:
+                stats['errors'] += 1
+
+    def report(self, adapter: HTTPAdapter) -> Dict[str, Dict]:
+        opened: Dict[str, int] = {}
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened[pool.host] = opened.get(pool.host, 0) + pool.num_connections
+
+        with self._lock:
+            snapshot = {host: dict(stats) for host, stats in self._stats.items()}
+
+        report = {}
+        for host, stats in snapshot.items():
+            connections = opened.get(urlsplit(f"//{host}").hostname, 0)
+            reused = max(0, stats['requests'] - connections)
+            report[host] = {
+                **stats,
+                'connections_opened': connections,
+                'connections_reused': reused,
+                'reuse_rate': round(reused / stats['requests'], 3) if stats['requests'] else 0.0
+            }
+        return report
+
+class HttpClient:
+    """
+    Keep-alive requests.Session shared by every service in the process
+
+    Connections are pooled per host and reused across requests. Each host
+    gets its own concurrency limit, so a slow endpoint cannot use up every
+    connection. The adapter retries connection errors and 502/503/504 on
+    idempotent methods with exponential backoff (honoring Retry-After).
+    POST requests are only retried when the connection could not be
+    established. Callers keep their own timeouts; the client default
+    applies when they pass none.
+    """
+
+    def __init__(self, pool_connections: int, pool_maxsize: int, max_per_host: int,
+                 max_retries: int, backoff: float, timeout: float):
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=ADAPTER_RETRY_STATUS_CODES,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.host_stats = HostStats()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        with self._slots(host):
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                self.host_stats.record(host, error=True)
+                raise
+        self.host_stats.record(host)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request('HEAD', url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.host_stats.report(self.adapter)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Process-wide client for Azure, Django and rubric API calls"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                max_per_host=Config.HTTP_MAX_PER_HOST,
+                max_retries=Config.HTTP_MAX_RETRIES,
+                backoff=Config.HTTP_BACKOFF,
+                timeout=Config.HTTP_TIMEOUT
+            )
+        return _http_client
+
+_openai_clients: Dict[str, object] = {}
+_openai_clients_lock = threading.Lock()
+
+def get_openai_client(api_key: str):
+    """Shared OpenAI SDK client per API key, so its connection pool outlives a single request"""
+    import openai
+
+    with _openai_clients_lock:
+        if api_key not in _openai_clients:
+            _openai_clients[api_key] = openai.OpenAI(api_key=api_key)
+        return _openai_clients[api_key]
+
+def get_http_stats() -> Dict[str, Dict]:
+    """Per-host request and connection reuse counters of the shared client"""
+    if _http_client is None:
+        return {}
+    return {'default': _http_client.stats()}
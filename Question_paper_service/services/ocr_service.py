@@ -1,13 +1,13 @@
 import requests
 import time
-import io
 import logging
-from PIL import Image
 from datetime import datetime
 import uuid as uuid_module
 
 from config import Config
+from services.http_client import get_http_client
 from services.s3_service import S3Service
+from services.image_sizing import fit_image_for_ocr
 
 logger = logging.getLogger(__name__)
 
@@ -178,7 +178,7 @@ class OCRService:
             }
             
             # Send OCR request
-            response = requests.post(
+            response = get_http_client().post(
                 self.read_url, 
                 headers=headers, 
                 data=processed_image_data, 
@@ -198,7 +198,7 @@ class OCRService:
             
             for attempt in range(30):  # Wait up to 30 seconds
                 try:
-                    result_response = requests.get(
+                    result_response = get_http_client().get(
                         operation_url, 
                         headers={"Ocp-Apim-Subscription-Key": self.subscription_key},
                         timeout=10
@@ -240,73 +240,14 @@ class OCRService:
     def _resize_image_for_ocr(self, image_data, filename):
         """Resize image to fit Azure OCR requirements"""
         try:
-            image = Image.open(io.BytesIO(image_data))
-            original_width, original_height = image.size
-            original_size = len(image_data)
-            
-            logger.debug(f"Processing: {filename} - {original_width}x{original_height}, "
-                        f"{original_size / (1024*1024):.2f}MB")
-            
-            # Check if resize is needed
-            needs_resize = (
-                original_width < self.limits['min_dimension'] or 
-                original_height < self.limits['min_dimension'] or 
-                original_width > self.limits['max_dimension'] or 
-                original_height > self.limits['max_dimension'] or 
-                original_size > self.limits['max_file_size']
+            sized = fit_image_for_ocr(
+                image_data,
+                min_dimension=self.limits['min_dimension'],
+                max_dimension=self.limits['max_dimension'],
+                max_file_size=self.limits['max_file_size'],
+                label=filename
             )
-            
-            if not needs_resize:
-                return image_data
-            
-            # Calculate new dimensions
-            if (original_width < self.limits['min_dimension'] or 
-                original_height < self.limits['min_dimension']):
-                scale = max(
-                    self.limits['min_dimension'] / original_width, 
-                    self.limits['min_dimension'] / original_height
-                )
-            elif (original_width > self.limits['max_dimension'] or 
-                  original_height > self.limits['max_dimension']):
-                scale = min(
-                    self.limits['max_dimension'] / original_width, 
-                    self.limits['max_dimension'] / original_height
-                )
-            else:
-                scale = 0.8  # Reduce size for file size issues
-            
-            new_width = int(original_width * scale)
-            new_height = int(original_height * scale)
-            
-            # Resize image
-            resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to RGB if needed
-            if resized_image.mode in ('RGBA', 'LA', 'P'):
-                rgb_image = Image.new('RGB', resized_image.size, (255, 255, 255))
-                if resized_image.mode == 'P':
-                    resized_image = resized_image.convert('RGBA')
-                rgb_image.paste(
-                    resized_image, 
-                    mask=resized_image.split()[-1] if resized_image.mode in ('RGBA', 'LA') else None
-                )
-                resized_image = rgb_image
-            
-            # Save to bytes with quality adjustment
-            output = io.BytesIO()
-            quality = 85
-            while quality > 30:
-                output.seek(0)
-                output.truncate()
-                resized_image.save(output, format='JPEG', quality=quality, optimize=True)
-                if len(output.getvalue()) <= self.limits['max_file_size']:
-                    break
-                quality -= 10
-            
-            logger.debug(f"Resized {filename}: {new_width}x{new_height}, "
-                        f"{len(output.getvalue()) / (1024*1024):.2f}MB")
-            
-            return output.getvalue()
+            return sized.data
             
         except Exception as e:
             raise Exception(f"Error processing image {filename}: {str(e)}")
@@ -323,7 +264,7 @@ class OCRService:
             
             logger.info(f"Sending OCR data to Django API for UUID: {question_paper_uuid}")
             
-            response = requests.post(
+            response = get_http_client().post(
                 self.django_config['process_endpoint'],
                 json=payload,
                 headers=headers,
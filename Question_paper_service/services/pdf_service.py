@@ -1,11 +1,12 @@
+import io
 import os
 import time
 import uuid
-import zipfile
 import threading
 import shutil
 import gc
 import logging
+from functools import partial
 from pdf2image import convert_from_path
 from PIL import Image
 from PyPDF2 import PdfReader
@@ -13,6 +14,10 @@ from werkzeug.utils import secure_filename
 
 from config import Config
 from services.s3_service import S3Service
+from services.upload_queue import S3UploadQueue
+from services.archive_service import StreamingArchive, iter_zip_stream
+from services.job_store import get_job_store
+from services.job_scheduler import JobScheduler, QueueFullError, estimate_render_memory
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +26,16 @@ class PDFService:
     
     def __init__(self):
         self.s3_service = S3Service()
-        self.conversion_jobs = {}
+        self.job_store = get_job_store('conversion')
+        self._progress_lock = threading.Lock()
+        self.scheduler = JobScheduler(on_queue_change=self._publish_queue_positions)
     
-    def create_job(self, job_uuid, pdf_file, dpi=None, img_format=None, quality=None, upload_to_s3=True):
-        """Create a new PDF conversion job"""
+    def create_job(self, job_uuid, pdf_file, dpi=None, img_format=None, quality=None, upload_to_s3=True, priority=0):
+        """Create a new PDF conversion job and queue it on the job scheduler
+        
+        Returns (job_uuid, 1-based queue position from the scheduler).
+        Raises QueueFullError if the conversion queue is full.
+        """
         # Set defaults
         dpi = dpi or Config.DEFAULT_DPI
         img_format = img_format or Config.DEFAULT_FORMAT
@@ -46,12 +57,19 @@ class PDFService:
         pdf_path = os.path.join(Config.TEMP_DIR, filename)
         pdf_file.save(pdf_path)
         
+        # Conversion holds one batch of decoded pages at a time
+        page_count = self._get_pdf_page_count(pdf_path) or Config.BATCH_SIZE
+        memory_cost = estimate_render_memory(min(page_count, Config.BATCH_SIZE), dpi)
+        
         # Initialize job
-        self.conversion_jobs[job_uuid] = {
+        self.job_store.evict_expired()
+        self.job_store.create(job_uuid, {
             'status': 'queued',
             'progress': 0,
             'pdf_path': pdf_path,
             'created_at': time.time(),
+            'priority': priority,
+            'queue_position': None,
             'upload_to_s3': upload_to_s3,
             'type': 'question_paper',
             'parameters': {
@@ -60,146 +78,188 @@ class PDFService:
                 'quality': quality
             },
             's3_folder': f"s3://{self.s3_service.bucket}/question-paper/{job_uuid}/" if upload_to_s3 else None
-        }
+        })
         
-        # Start conversion in background
-        thread = threading.Thread(
-            target=self._convert_pdf_to_images,
-            args=(pdf_path, job_uuid, dpi, img_format, quality, upload_to_s3)
-        )
-        thread.daemon = True
-        thread.start()
+        try:
+            queue_position = self.scheduler.submit(
+                job_uuid,
+                self._convert_pdf_to_images,
+                args=(pdf_path, job_uuid, dpi, img_format, quality, upload_to_s3),
+                cost=memory_cost,
+                priority=priority
+            )
+        except QueueFullError:
+            self.job_store.delete(job_uuid)
+            os.remove(pdf_path)
+            raise
         
-        logger.info(f"Created PDF conversion job {job_uuid}")
-        return job_uuid
+        logger.info(f"Queued PDF conversion job {job_uuid} at position {queue_position}")
+        return job_uuid, queue_position
+    
+    def _publish_queue_positions(self, positions):
+        """Record the queue position of every waiting job"""
+        for job_id, position in positions.items():
+            self.job_store.update(job_id, {'queue_position': position})
     
     def _convert_pdf_to_images(self, pdf_path, job_id, dpi, img_format, quality, upload_to_s3):
-        """Convert PDF to images in background thread"""
+        """Convert PDF to images in background thread
+        
+        Pages are encoded in memory and handed to a bounded upload queue, so
+        S3 transfers run concurrently with rendering and no page is written
+        to disk. Depending on ARCHIVE_MODE the ZIP_STORED archive streams into
+        an S3 multipart upload as pages arrive, or is built on download.
+        """
         try:
-            self.conversion_jobs[job_id]['status'] = 'processing'
-            self.conversion_jobs[job_id]['progress'] = 0
+            self.job_store.update(job_id, {
+                'status': 'processing',
+                'progress': 0,
+                'processed_pages': 0,
+                'queue_position': None,
+                'started_at': time.time()
+            })
             
-            output_folder = os.path.join(Config.TEMP_DIR, f"{job_id}_question_paper_images")
-            os.makedirs(output_folder, exist_ok=True)
+            os.makedirs(Config.TEMP_DIR, exist_ok=True)
             
             # Get total page count
             total_pages = self._get_pdf_page_count(pdf_path)
             if total_pages:
-                self.conversion_jobs[job_id]['total_pages'] = total_pages
+                self.job_store.update(job_id, {'total_pages': total_pages})
             
             start_time = time.time()
-            processed_pages = 0
             page_start = 1
             s3_urls = []
+            pending_uploads = []
+            upload = upload_to_s3 and self.s3_service.is_configured()
+            content_type = 'image/jpeg' if img_format == 'JPEG' else 'image/png'
+            archive_mode = Config.ARCHIVE_MODE
+            zip_path = None
+            zip_s3_key = None
+            archive = None
             
-            # Process PDF in batches
-            while True:
-                try:
-                    # Convert batch
-                    pages = convert_from_path(
-                        pdf_path,
-                        dpi=dpi,
-                        first_page=page_start,
-                        last_page=page_start + Config.BATCH_SIZE - 1,
-                        fmt=img_format,
-                        thread_count=2
-                    )
-                    
-                    if not pages:
-                        break
-                    
-                    # Save images and upload to S3
-                    for i, page in enumerate(pages):
-                        page_num = page_start + i
-                        filename = f"page_{page_num:04d}.{img_format.lower()}"
-                        filepath = os.path.join(output_folder, filename)
+            # The ZIP is built as pages arrive; in lazy mode it is only
+            # built from S3 when it is downloaded
+            if upload and archive_mode == 'stream':
+                zip_s3_key = self.s3_service.get_question_paper_key(job_id, f"{job_id}_question_paper_images.zip")
+                archive = StreamingArchive(self.s3_service, s3_key=zip_s3_key)
+            elif not upload:
+                archive_mode = 'stream'
+                zip_path = os.path.join(Config.TEMP_DIR, f"{job_id}_question_paper_images.zip")
+                archive = StreamingArchive(local_path=zip_path)
+            self.job_store.update(job_id, {'archive_mode': archive_mode})
+            
+            try:
+                with S3UploadQueue(self.s3_service) as upload_queue:
+                    # Process PDF in batches
+                    while True:
+                        try:
+                            # Convert batch
+                            pages = convert_from_path(
+                                pdf_path,
+                                dpi=dpi,
+                                first_page=page_start,
+                                last_page=page_start + Config.BATCH_SIZE - 1,
+                                thread_count=2
+                            )
+                        
+                            if not pages:
+                                break
                         
-                        # Save image with appropriate format and quality
-                        self._save_image(page, filepath, img_format, quality)
+                            # Encode images in memory and queue them for upload
+                            for i, page in enumerate(pages):
+                                page_num = page_start + i
+                                filename = f"page_{page_num:04d}.{img_format.lower()}"
+                            
+                                image_data = self._encode_image(page, img_format, quality)
+                                if archive:
+                                    archive.add(filename, image_data)
+                            
+                                if not upload:
+                                    self._mark_page_done(job_id, total_pages)
+                                    continue
+                            
+                                s3_key = self.s3_service.get_question_paper_key(job_id, filename)
+                                upload_future = upload_queue.submit(image_data, s3_key, content_type)
+                                upload_future.add_done_callback(lambda _f: self._mark_page_done(job_id, total_pages))
+                                pending_uploads.append((page_num, filename, s3_key, upload_future))
                         
-                        # Upload to S3 if enabled
-                        if upload_to_s3 and self.s3_service.is_configured():
-                            try:
-                                content_type = 'image/jpeg' if img_format == 'JPEG' else 'image/png'
-                                s3_url = self.s3_service.upload_question_paper_file(
-                                    filepath, job_id, filename, content_type
-                                )
-                                s3_urls.append({
-                                    'page': page_num,
-                                    'filename': filename,
-                                    'url': s3_url,
-                                    's3_key': f"question-paper/{job_id}/{filename}"
-                                })
-                            except Exception as s3_error:
-                                logger.error(f"S3 upload failed for {filename}: {s3_error}")
-                                # Continue processing even if S3 upload fails
+                            # Clear memory
+                            for page in pages:
+                                page.close()
+                            del pages
+                            gc.collect()
                         
-                        processed_pages += 1
+                            page_start += Config.BATCH_SIZE
                         
-                        # Update progress
-                        if total_pages:
-                            progress = int((processed_pages / total_pages) * 90)  # 90% for processing
-                            self.conversion_jobs[job_id]['progress'] = progress
-                    
-                    # Clear memory
-                    for page in pages:
-                        page.close()
-                    del pages
-                    gc.collect()
-                    
-                    page_start += Config.BATCH_SIZE
-                    
-                except Exception as e:
-                    if "Image list is empty" in str(e):
-                        break
-                    else:
-                        raise e
+                        except Exception as e:
+                            if "Image list is empty" in str(e):
+                                break
+                            else:
+                                raise e
+            except Exception:
+                if archive:
+                    archive.abort()
+                raise
             
-            # Update progress to 95% before creating ZIP
-            self.conversion_jobs[job_id]['progress'] = 95
+            # Leaving the upload queue waits for every page upload to finish
+            for page_num, filename, s3_key, upload_future in pending_uploads:
+                try:
+                    s3_urls.append({
+                        'page': page_num,
+                        'filename': filename,
+                        'url': upload_future.result(),
+                        's3_key': s3_key
+                    })
+                except Exception as s3_error:
+                    logger.error(f"S3 upload failed for {filename}: {s3_error}")
+                    # Continue processing even if S3 upload fails
             
-            # Create ZIP file
-            zip_path = self._create_zip_file(output_folder, job_id)
+            processed_pages = self.job_store.get(job_id)['processed_pages']
+            
+            # Update progress to 95% before finishing the ZIP
+            self.job_store.update(job_id, {'progress': 95})
             
-            # Upload ZIP and original PDF to S3 if enabled
             zip_s3_url = None
+            if archive:
+                try:
+                    archive.close()
+                    if zip_s3_key:
+                        zip_s3_url = self.s3_service.get_s3_url(zip_s3_key)
+                except Exception as s3_error:
+                    logger.error(f"S3 upload failed for ZIP: {s3_error}")
+                    archive.abort()
+                    zip_s3_key = None
+            
+            # Upload original PDF to S3 if enabled
             original_pdf_s3_url = None
             
-            if upload_to_s3 and self.s3_service.is_configured():
+            if upload:
                 try:
-                    zip_s3_url = self.s3_service.upload_question_paper_file(
-                        zip_path, job_id, f"{job_id}_question_paper_images.zip", 'application/zip'
-                    )
                     original_pdf_s3_url = self.s3_service.upload_question_paper_file(
                         pdf_path, job_id, "original.pdf", 'application/pdf'
                     )
                 except Exception as s3_error:
-                    logger.error(f"S3 upload failed for ZIP/PDF: {s3_error}")
+                    logger.error(f"S3 upload failed for original PDF: {s3_error}")
             
             # Update job status
             elapsed_time = time.time() - start_time
-            self.conversion_jobs[job_id].update({
+            self.job_store.update(job_id, {
                 'status': 'completed',
                 'progress': 100,
                 'processed_pages': processed_pages,
                 'elapsed_time': round(elapsed_time, 2),
                 'zip_path': zip_path,
-                'output_folder': output_folder,
+                'zip_s3_key': zip_s3_key,
                 's3_uploaded': upload_to_s3 and len(s3_urls) > 0,
                 's3_images': s3_urls,
                 'zip_s3_url': zip_s3_url,
                 'original_pdf_s3_url': original_pdf_s3_url
             })
             
-            # Clean up local folder (keep ZIP for local download)
-            if os.path.exists(output_folder):
-                shutil.rmtree(output_folder)
-            
             logger.info(f"Successfully completed PDF conversion job {job_id}")
             
         except Exception as e:
             logger.error(f"PDF conversion failed for job {job_id}: {str(e)}")
-            self.conversion_jobs[job_id].update({
+            self.job_store.update(job_id, {
                 'status': 'error',
                 'error': str(e)
             })
@@ -213,32 +273,29 @@ class PDFService:
             logger.warning(f"Could not get page count for {pdf_path}: {e}")
             return None
     
-    def _save_image(self, page, filepath, img_format, quality):
-        """Save PIL Image with appropriate format and quality"""
+    def _encode_image(self, page, img_format, quality):
+        """Encode PIL Image to bytes with appropriate format and quality"""
+        buffer = io.BytesIO()
         if img_format == 'JPEG':
-            page.save(filepath, 'JPEG', quality=quality, optimize=True)
+            page.save(buffer, 'JPEG', quality=quality, optimize=True)
         else:
-            page.save(filepath, img_format, optimize=True)
+            page.save(buffer, img_format, optimize=True)
+        return buffer.getvalue()
     
-    def _create_zip_file(self, output_folder, job_id):
-        """Create ZIP file from output folder"""
-        zip_path = os.path.join(Config.TEMP_DIR, f"{job_id}_question_paper_images.zip")
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(output_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, file)
-        
-        return zip_path
+    def _mark_page_done(self, job_id, total_pages):
+        """Count a finished page; 90% of progress is for processing"""
+        # The lock keeps progress writes in the same order as the counter
+        with self._progress_lock:
+            processed_pages = self.job_store.increment(job_id, 'processed_pages')
+            if processed_pages is not None and total_pages:
+                self.job_store.update(job_id, {'progress': int((processed_pages / total_pages) * 90)})
     
     def get_job_status(self, job_id):
         """Get job status"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
         
-        job = self.conversion_jobs[job_id].copy()
-        
         # Remove sensitive file paths from response
         job.pop('pdf_path', None)
         job.pop('zip_path', None)
@@ -248,10 +305,9 @@ class PDFService:
     
     def get_download_path(self, job_id):
         """Get ZIP download path for completed job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
-        
-        job = self.conversion_jobs[job_id]
         if job['status'] != 'completed':
             return None
         
@@ -261,12 +317,35 @@ class PDFService:
         
         return None
     
+    def iter_download(self, job_id):
+        """Stream the images ZIP of a completed job that has no local archive
+        
+        Returns a generator of ZIP bytes, or None if nothing can be served.
+        """
+        job = self.job_store.get(job_id)
+        if not job or job['status'] != 'completed' or not self.s3_service.is_configured():
+            return None
+        
+        # Archive streamed to S3 during conversion
+        if job.get('zip_s3_key'):
+            return self.s3_service.iter_object(job['zip_s3_key'])
+        
+        # Lazy mode: build the archive from the uploaded pages
+        s3_images = job.get('s3_images')
+        if s3_images:
+            entries = [
+                (image['filename'], partial(self.s3_service.download_file, image['s3_key']))
+                for image in s3_images
+            ]
+            return iter_zip_stream(entries)
+        
+        return None
+    
     def get_s3_info(self, job_id):
         """Get S3 information for a job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
-        
-        job = self.conversion_jobs[job_id]
         if job['status'] != 'completed' or not job.get('s3_uploaded'):
             return None
         
@@ -282,11 +361,10 @@ class PDFService:
     
     def cleanup_job(self, job_id):
         """Clean up local job files"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return False
         
-        job = self.conversion_jobs[job_id]
-        
         try:
             # Clean up local files
             pdf_path = job.get('pdf_path')
@@ -301,7 +379,7 @@ class PDFService:
                 shutil.rmtree(output_folder)
             
             # Remove from jobs
-            del self.conversion_jobs[job_id]
+            self.job_store.delete(job_id)
             
             logger.info(f"Cleaned up local files for job {job_id}")
             return True
@@ -312,10 +390,9 @@ class PDFService:
     
     def cleanup_s3_job(self, job_id):
         """Clean up S3 files for a job"""
-        if job_id not in self.conversion_jobs:
+        job = self.job_store.get(job_id)
+        if job is None:
             return None
-        
-        job = self.conversion_jobs[job_id]
         if not job.get('s3_uploaded'):
             return None
         
@@ -330,10 +407,11 @@ class PDFService:
     def list_jobs(self):
         """List all jobs with their status"""
         jobs_summary = {}
-        for job_id, job in self.conversion_jobs.items():
+        for job_id, job in self.job_store.list().items():
             jobs_summary[job_id] = {
                 'status': job['status'],
                 'progress': job.get('progress', 0),
+                'queue_position': job.get('queue_position'),
                 'created_at': job.get('created_at'),
                 'processed_pages': job.get('processed_pages', 0),
                 'upload_to_s3': job.get('upload_to_s3', False),
@@ -1,11 +1,39 @@
 import boto3
+import io
 import os
+import random
+import threading
+import time
 import logging
-from botocore.exceptions import ClientError, NoCredentialsError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Errors that will not succeed on retry
+NON_RETRYABLE_S3_ERRORS = {'AccessDenied', 'NoSuchBucket', 'InvalidAccessKeyId', 'SignatureDoesNotMatch'}
+
+# boto3 clients are thread-safe, so S3Service instances with the same
+# credentials share one pooled client
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+def _get_shared_client(access_key, secret_key, region):
+    """Return the process-wide S3 client for a set of credentials"""
+    key = (access_key, secret_key, region)
+    with _shared_clients_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = boto3.client(
+                's3',
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region,
+                config=BotoConfig(max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS)
+            )
+        return _shared_clients[key]
+
 class S3Service:
     """Service for handling S3 operations"""
     
@@ -14,14 +42,18 @@ class S3Service:
         self.bucket = self.config['bucket']
         self.region = self.config['region']
         self.client = None
+        self.transfer_config = TransferConfig(
+            multipart_threshold=Config.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=Config.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=Config.S3_MULTIPART_CONCURRENCY
+        )
         
         try:
             if self._has_credentials():
-                self.client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.config['access_key'],
-                    aws_secret_access_key=self.config['secret_key'],
-                    region_name=self.region
+                self.client = _get_shared_client(
+                    self.config['access_key'],
+                    self.config['secret_key'],
+                    self.region
                 )
                 logger.info(f"S3 client initialized for bucket: {self.bucket}")
             else:
@@ -74,6 +106,52 @@ class S3Service:
             logger.error(f"S3 upload failed for {s3_key}: {e}")
             raise Exception(f"S3 upload failed: {e}")
     
+    def upload_bytes(self, data, s3_key, content_type='application/octet-stream'):
+        """Upload an in-memory buffer to S3, retrying with exponential backoff
+        
+        Small objects go up in a single PUT; anything above
+        S3_MULTIPART_THRESHOLD uses a concurrent multipart transfer.
+        """
+        if not self.is_configured():
+            raise Exception("S3 client not initialized")
+        
+        attempts = Config.S3_UPLOAD_MAX_RETRIES + 1
+        last_error = None
+        
+        for attempt in range(attempts):
+            try:
+                if len(data) < Config.S3_MULTIPART_THRESHOLD:
+                    self.client.put_object(
+                        Bucket=self.bucket,
+                        Key=s3_key,
+                        Body=data,
+                        ContentType=content_type
+                    )
+                else:
+                    self.client.upload_fileobj(
+                        io.BytesIO(data),
+                        self.bucket,
+                        s3_key,
+                        ExtraArgs={'ContentType': content_type},
+                        Config=self.transfer_config
+                    )
+                return self.get_s3_url(s3_key)
+            except ClientError as e:
+                if e.response['Error']['Code'] in NON_RETRYABLE_S3_ERRORS:
+                    logger.error(f"S3 upload failed for {s3_key}: {e}")
+                    raise Exception(f"S3 upload failed: {e}")
+                last_error = e
+            except BotoCoreError as e:
+                last_error = e
+            
+            if attempt < attempts - 1:
+                delay = Config.S3_UPLOAD_BACKOFF * (2 ** attempt)
+                logger.warning(f"S3 upload attempt {attempt + 1} failed for {s3_key}, retrying in {delay:.1f}s: {last_error}")
+                time.sleep(delay + random.uniform(0, Config.S3_UPLOAD_BACKOFF))
+        
+        logger.error(f"S3 upload failed for {s3_key} after {attempts} attempts: {last_error}")
+        raise Exception(f"S3 upload failed after {attempts} attempts: {last_error}")
+    
     def download_file(self, s3_key):
         """Download a file from S3 and return as bytes"""
         if not self.is_configured():
@@ -86,6 +164,15 @@ class S3Service:
             logger.error(f"S3 download failed for {s3_key}: {e}")
             raise Exception(f"Failed to download {s3_key} from S3: {e}")
     
+    def iter_object(self, s3_key, chunk_size=1024 * 1024):
+        """Yield an object from S3 in chunks without buffering it whole"""
+        if not self.is_configured():
+            raise Exception("S3 client not initialized")
+        
+        response = self.client.get_object(Bucket=self.bucket, Key=s3_key)
+        for chunk in response['Body'].iter_chunks(chunk_size):
+            yield chunk
+    
     def list_objects(self, prefix=''):
         """List objects in S3 bucket with given prefix"""
         if not self.is_configured():
@@ -200,6 +287,10 @@ class S3Service:
         s3_key = f"question-paper/{job_id}/{filename}"
         return self.upload_file(file_path, s3_key, content_type)
     
+    def get_question_paper_key(self, job_id, filename):
+        """Build the S3 key for a file in the question-paper folder structure"""
+        return f"question-paper/{job_id}/{filename}"
+    
     def get_bucket_info(self):
         """Get S3 bucket information"""
         return {
@@ -6,6 +6,7 @@ from datetime import datetime
 import re
 
 from config import Config
+from services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +54,7 @@ class SchedulerService:
             logger.info(f"Fetching QP data - URL: {url}")
             logger.info(f"Request headers: {headers}")
             
-            response = requests.get(url, headers=headers, timeout=self.request_timeout)
+            response = get_http_client().get(url, headers=headers, timeout=self.request_timeout)
             
             logger.info(f"Django API response status: {response.status_code}")
             logger.info(f"Django API response headers: {dict(response.headers)}")
@@ -120,7 +121,7 @@ class SchedulerService:
             logger.info(f"VLM description length: {len(vlm_description)}")
             logger.info(f"VLM description preview: {vlm_description[:200]}...")
             
-            response = requests.post(
+            response = get_http_client().post(
                 self.rubric_generation_api_url,
                 json=payload,
                 headers=headers,
@@ -288,7 +289,7 @@ class SchedulerService:
             logger.info(f"Input data keys: {list(payload['input_data'].keys())}")
             logger.info(f"Django response keys: {list(payload['input_data']['django_response'].keys())}")
             
-            response = requests.post(
+            response = get_http_client().post(
                 self.process_rubric_api_url,
                 json=payload,
                 headers=headers,
@@ -496,7 +497,7 @@ class SchedulerService:
             # Check Django API connectivity
             django_status = False
             try:
-                django_health = requests.get(f'{self.django_api_base_url}/status/', timeout=5)
+                django_health = get_http_client().get(f'{self.django_api_base_url}/status/', timeout=5)
                 django_status = django_health.status_code == 200
             except:
                 pass
@@ -504,7 +505,7 @@ class SchedulerService:
             # Check Rubric API connectivity
             rubric_status = False
             try:
-                rubric_health = requests.get(f'{self.rubric_generation_api_url.replace("/generate-rubric", "/health")}', timeout=5)
+                rubric_health = get_http_client().get(f'{self.rubric_generation_api_url.replace("/generate-rubric", "/health")}', timeout=5)
                 rubric_status = rubric_health.status_code == 200
             except:
                 pass
@@ -512,7 +513,7 @@ class SchedulerService:
             # Check Process Rubric API connectivity
             process_rubric_status = False
             try:
-                process_rubric_health = requests.get(f'{self.process_rubric_api_url.replace("/process-rubric/", "/health/")}', timeout=5)
+                process_rubric_health = get_http_client().get(f'{self.process_rubric_api_url.replace("/process-rubric/", "/health/")}', timeout=5)
                 process_rubric_status = process_rubric_health.status_code == 200
             except:
                 pass
@@ -0,0 +1,84 @@
+import queue
+import threading
+from concurrent.futures import Future
+from config import Config
+
+class S3UploadQueue:
+    """
+    Bounded in-memory upload queue drained by a pool of worker threads
+    
+    Producers hand over encoded bytes with submit() and get a Future for the
+    S3 URL back. When the queue is full submit() blocks, which keeps the
+    number of pages held in memory bounded if S3 falls behind rendering.
+    All workers share the S3Service's pooled client.
+    """
+    
+    def __init__(self, s3_service, workers=None, max_queued=None):
+        self.s3_service = s3_service
+        self._queue = queue.Queue(maxsize=max_queued or Config.S3_UPLOAD_QUEUE_SIZE)
+        self._closed = False
+        self._workers = []
+        
+        for i in range(workers or Config.S3_UPLOAD_WORKERS):
+            worker = threading.Thread(target=self._worker_loop, name=f"s3-upload-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+    
+    def submit(self, data, s3_key, content_type='image/jpeg'):
+        """
+        Queue a buffer for upload
+        
+        Args:
+            data (bytes): Object content
+            s3_key (str): S3 object key
+            content_type (str): MIME type of the object
+            
+        Returns:
+            Future: Resolves to the S3 URL, or raises the upload error
+        """
+        if self._closed:
+            raise Exception("Upload queue is closed")
+        
+        future = Future()
+        self._queue.put((data, s3_key, content_type, future))
+        return future
+    
+    def _worker_loop(self):
+        """Upload queued buffers until a stop sentinel is received"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                
+                data, s3_key, content_type, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                
+                try:
+                    future.set_result(self.s3_service.upload_bytes(data, s3_key, content_type))
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+    
+    def close(self, wait=True):
+        """Stop accepting uploads and let the workers drain the queue"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        for _ in self._workers:
+            self._queue.put(None)
+        
+        if wait:
+            for worker in self._workers:
+                worker.join()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -8,9 +8,9 @@ import time
 import re
 from typing import List, Dict, Optional
 from botocore.exceptions import ClientError, NoCredentialsError
-from openai import OpenAI
 
 from config import Config
+from services.http_client import get_http_client, get_openai_client
 from services.s3_service import S3Service
 
 logger = logging.getLogger(__name__)
@@ -33,7 +33,7 @@ class VLMService:
         
         try:
             if self.openai_api_key:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
+                self.openai_client = get_openai_client(self.openai_api_key)
                 logger.info("OpenAI client initialized successfully")
             else:
                 self.openai_client = None
@@ -62,7 +62,7 @@ class VLMService:
             # Check Django API connectivity
             django_status = False
             try:
-                django_health = requests.get(
+                django_health = get_http_client().get(
                     f'{Config.DJANGO_API_BASE_URL}/status/', 
                     timeout=Config.HEALTH_CHECK_TIMEOUT
                 )
@@ -302,7 +302,7 @@ Return ONLY a JSON object with this exact format:
             
             logger.info(f"Sending VLM data to Django API for UUID: {question_paper_uuid}")
             
-            response = requests.post(
+            response = get_http_client().post(
                 Config.DJANGO_PROCESS_ENDPOINT,
                 json=payload,
                 headers=headers,